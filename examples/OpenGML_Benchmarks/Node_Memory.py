@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created By  : Martin Timms
+# Created Date: 18th October 2026
+# License: BSD-3-Clause License
+# Organisation: OpenGML.org/
+# Project: https://github.com/Electro-resonance/OpenGML
+# Description: Memory benchmark for GML trees
+#
+# Builds nested polygon crystals of increasing depth with add_polygon and
+# reports the memory allocated per singularity, measured with tracemalloc.
+# No window is opened so the benchmark can run on a headless machine.
+# =============================================================================
+
+import sys
+import tracemalloc
+
+sys.path.append("../../src/OpenGML")  # AddOpenGML path
+
+from GML import *
+from GML_3D import *
+
+
+def build_crystal_2D(levels):
+    rootNode = create_bindu()
+    rootNode.add_polygon("Crystal", 6, 0, 8, 200, CYAN, levels, 0.4)
+    return rootNode
+
+def build_crystal_3D(levels):
+    rootNode = create_bindu_3D()
+    rootNode.add_octohedron("Crystal", diameter=8, freq=[200, 200], colour=CYAN, offset_angle=[0, 0])
+    nodes = rootNode.children1
+    for level in range(1, levels):
+        children = []
+        for node in nodes:
+            children.extend(node.add_octohedron("Crystal", diameter=8, freq=[200*0.4**level, 200*0.4**level],
+                                                colour=CYAN, offset_angle=[0, 0]))
+        nodes = children
+    return rootNode
+
+def measure(build_function, levels):
+    """
+    Return the number of singularities and the bytes allocated per singularity
+    """
+    tracemalloc.start()
+    start = tracemalloc.take_snapshot()
+    rootNode = build_function(levels)
+    end = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in end.compare_to(start, 'filename'))
+    count = rootNode.oscillators()+1
+    return [count, allocated/count]
+
+
+if __name__ == '__main__':
+    GML_Use_Headless((800, 800))
+    for [title, build_function, max_levels] in [["2D hexagon crystal", build_crystal_2D, 6],
+                                                ["3D octahedron crystal", build_crystal_3D, 5]]:
+        print(title)
+        for levels in range(1, max_levels+1):
+            [count, per_node] = measure(build_function, levels)
+            print("  levels %d: %8d singularities, %6.0f bytes per singularity" % (levels, count, per_node))
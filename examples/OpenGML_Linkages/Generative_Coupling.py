@@ -15,7 +15,7 @@ sys.path.append("../../src/OpenGML")  # AddOpenGML path
 import GML_App_2D as app2d
 from GML import *
 from GML_3D import *
-from GML_Bond import GML_Bond
+from GML_Bond import GML_Bond, BondNetwork
 from colour_functions import * #RGB definitions of Colours
 from prime_functions import * #Prime number functions
 from gl_text_drawing import *
@@ -50,6 +50,7 @@ def recursive_bonds(singularities, depth, prob=0.5, coupling=0.01):
     return bonds
 
 bonds = []
+network = BondNetwork()
 linkage_enable=True
 
 def rand_direction():
@@ -62,7 +63,7 @@ def populate_demo(demo_num=0):
     """
     Function to create a simple OpenGML tree
     """
-    global bonds
+    global bonds, network
     diameter=8 #Size of the singularity drawn
     freq_mult=4 #Determines the size of the circle that the singularities rotate
 
@@ -92,6 +93,12 @@ def populate_demo(demo_num=0):
     # Create recursive connections between the singularities
     bonds=recursive_bonds(singularities, 1, prob=0.5, coupling=0.000005)
 
+    # Register the bonds with the world of the tree so symmetry breaking
+    # and headless sweeps (GML_Sweep) can find them
+    rootNode.world.bonds[:] = bonds
+
+    # Solve all of the bonds together each frame
+    network = BondNetwork(bonds)
     print("Created bonds=",len(bonds))
 
     #Print a text version of the tree
@@ -108,13 +115,12 @@ def key_callback(key,dt):
     :param dt: Time in seconds since last key press
     :return:
     """
-    global bonds, linkage_enable
+    global linkage_enable
     if(dt < 0.02):
         return
     if (key=='w'):
             #Apply bond linkage as a force between singularities
-            for bond in bonds:
-                bond.update()
+            network.update()
     if (key=='e'):
         #Toggle linkage
         linkage_enable=not linkage_enable
@@ -125,11 +131,10 @@ def runtime_callback(rootNode):
     :param rootNode:
     :return:
     """
-    global bonds, linkage_enable
+    global linkage_enable
     if(linkage_enable==True):
         # Apply bond linkage as a force between singularities
-        for bond in bonds:
-            bond.update()
+        network.update()
 
 
 if __name__ == '__main__':
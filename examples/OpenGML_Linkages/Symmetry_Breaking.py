@@ -51,6 +51,9 @@ def recursive_bonds(singularities, depth, prob=0.5, coupling=0.01):
     return bonds
 
 bonds = []
+bond_coupling = 0.000005
+network = bnds.BondNetwork()
+breaker = None
 linkage_enable=True
 
 def rand_direction():
@@ -63,7 +66,7 @@ def populate_demo(demo_num=0):
     """
     Function to create a simple OpenGML tree
     """
-    global bonds
+    global bonds, network, breaker
     diameter=8 #Size of the singularity drawn
     freq_mult=4 #Determines the size of the circle that the singularities rotate
 
@@ -91,10 +94,19 @@ def populate_demo(demo_num=0):
                 singularities.append(corner2)
 
     # Create recursive connections between the singularities
-    bonds=recursive_bonds(singularities, 1, prob=0.5, coupling=0.000005)
+    bonds=recursive_bonds(singularities, 1, prob=0.5, coupling=bond_coupling)
 
+    # Register the bonds with the world of the tree so symmetry breaking
+    # and headless sweeps (GML_Sweep) can find them
+    rootNode.world.bonds[:] = bonds
+
+    # Solve all of the bonds together each frame
+    network = bnds.BondNetwork(bonds)
     print("Created bonds=",len(bonds))
 
+    # Symmetry break the whole tree in one pass each frame
+    breaker = SymmetryBreaker(rootNode, 10)
+
     #Print a text version of the tree
     rootNode.print_tree()
     #Print the GML geometry as text
@@ -109,13 +121,12 @@ def key_callback(key,dt):
     :param dt: Time in seconds since last key press
     :return:
     """
-    global bonds, linkage_enable
+    global linkage_enable
     if(dt < 0.02):
         return
     if (key=='w'):
             #Apply bond linkage as a force between singularities
-            for bond in bonds:
-                bond.update()
+            network.update()
     if (key=='e'):
         #Toggle linkage
         linkage_enable=not linkage_enable
@@ -126,12 +137,17 @@ def runtime_callback(rootNode):
     :param rootNode:
     :return:
     """
-    global bonds, linkage_enable
+    global linkage_enable
     if(linkage_enable==True):
         # Apply bond linkage as a force between singularities
-        for bond in bonds:
-            bond.update()
-    symmetry_breaking(rootNode,10)
+        network.update()
+    breaker.step()
+    # Bonds copied to new singularities by the symmetry breaking join the
+    # network, with the same settings as the other bonds
+    for bond in rootNode.world.bonds[len(network):]:
+        bond.coupling = bond_coupling
+        bond.lock_frequency = True
+        network.add(bond)
 
 
 if __name__ == '__main__':
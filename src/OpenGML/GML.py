@@ -14,16 +14,28 @@ import sys
 sys.path.append("../../src/Algorithms_3rdparty")  # AddOpenGML path
 
 import math
+import numpy as np
 
 #from blit_functions import *
 from graphics_helper import GraphicsHelperBaseClass
-from blit_functions import BlitGraphicsHelper
-from pygame_functions import PygameGraphicsHelper
+try:
+    from blit_functions import BlitGraphicsHelper
+except ImportError:
+    # Kivy is not installed, trees can still be rendered headless
+    BlitGraphicsHelper = GraphicsHelperBaseClass
+try:
+    from pygame_functions import PygameGraphicsHelper
+except ImportError:
+    PygameGraphicsHelper = None
+from headless_functions import HeadlessGraphicsHelper
 import trig_tables as trig
 from colour_functions import *
 from euclidean_functions import euclidean_bjorklund,euclidean_form_string,euclidean_rhythm_string
 from prime_functions import is_prime
 import GML_Bond
+import GML_Flat
+import GML_Spatial
+import GML_Serialise
 
 
 def GML_init():
@@ -32,96 +44,159 @@ def GML_init():
     """
     trig.create_tables()
 
-def GML_resize():
-    GMLBaseClass.screen_width, GMLBaseClass.screen_height = GMLBaseClass.graphics_helper.screen_get_screen_size()
+class GMLWorld(object):
+    """
+    A scene holding the settings, counters, bonds and graphics helper
+    shared by the singularities of its trees. Trees in different worlds
+    run, pause and draw independently, so several worlds can be stepped
+    at the same time in separate threads.
+    """
+
+    def __init__(self, graphics_helper=None):
+        """
+        :param graphics_helper: Graphics helper to draw with, by default
+        the Kivy blit helper
+        """
+        self.osc_count = 0
+        self.run_count = 0
+        self.reverse = False
+        self.pause = False
+        self.draw_mode = 0
+        self.screen_width = 0
+        self.screen_height = 0
+        self.oscillator_speed = 1
+        if (graphics_helper is None):
+            graphics_helper = BlitGraphicsHelper()
+        self.graphics_helper = graphics_helper
+        self.mode_3d = False
+        self.bonds = []
+        self.pos_scale = 1
+        self.topology_version = 0
+        self.frame_id = 0
+
+    def resize(self):
+        """
+        Read the screen size from the graphics helper
+        """
+        self.screen_width, self.screen_height = self.graphics_helper.screen_get_screen_size()
+
+    def use_pygame(self):
+        """
+        Draw with PyGame
+        """
+        self.graphics_helper = PygameGraphicsHelper()
+
+    def use_headless(self, size=(800, 800)):
+        """
+        Render into an offscreen NumPy framebuffer instead of a window
+        """
+        self.graphics_helper = HeadlessGraphicsHelper()
+        self.graphics_helper.init(None, size)
+        self.resize()
+        return self.graphics_helper
+
+# World used by trees created without one
+default_world = GMLWorld()
 
-def GML_graphics_helper():
-    return GMLBaseClass.graphics_helper
+def GML_resize(world=None):
+    if (world is None):
+        world = default_world
+    world.resize()
 
-def GML_screen_get_mid_position():
-    return GMLBaseClass.graphics_helper.screen_get_mid_position()
+def GML_graphics_helper(world=None):
+    if (world is None):
+        world = default_world
+    return world.graphics_helper
 
-def GML_Use_PyGame():
-    GMLBaseClass.graphics_helper=PygameGraphicsHelper()
+def GML_screen_get_mid_position(world=None):
+    return GML_graphics_helper(world).screen_get_mid_position()
+
+def GML_Use_PyGame(world=None):
+    if (world is None):
+        world = default_world
+    world.use_pygame()
+
+def GML_Use_Headless(size=(800, 800), world=None):
+    """
+    Render into an offscreen NumPy framebuffer instead of a window
+    """
+    if (world is None):
+        world = default_world
+    return world.use_headless(size)
 
 class GMLBaseClass(object):
     """
     Base class for all GML trees of any dimension
     """
-    osc_count = 0
-    run_count = 0
-    reverse = False
-    pause = False
-    draw_mode = 0
-    screen_width = 0
-    screen_height = 0
-    oscillator_speed = 1
-    graphics_helper = BlitGraphicsHelper()
-    mode_3d=False
-    bonds=[]
-    pos_scale = 1
+    # Settings shared by a tree live in its GMLWorld, nodes have no __dict__
+    __slots__ = ()
 
     def set_reverse(self, rev):
         """
         Change the phase direction for rotating singularities
         """
-        GMLBaseClass.reverse = rev
+        self.world.reverse = rev
 
     def set_pause(self, pau):
         """
         Pause/unpause the singularity phase rotation
         """
-        GMLBaseClass.pause = pau
+        self.world.pause = pau
 
     def set_draw_mode(self, draw_m):
         """
         Set drawing mode
         """
-        GMLBaseClass.draw_mode = draw_m
+        self.world.draw_mode = draw_m
         #print(draw_m)
 
     def set_oscillator_speed(self, new_speed):
         """
         Set overall oscillator speeds
         """
-        GMLBaseClass.oscillator_speed = new_speed
+        self.world.oscillator_speed = new_speed
 
     def oscillators(self):
         """
-        Return a count of the number of oscillators
+        Return a count of the number of oscillators in the tree
+        holding this singularity, read from the cached node count
         """
-        return GMLBaseClass.osc_count-1 # Subtract one as Bindu does not count
+        root_node = self
+        while (root_node.parent != None):
+            root_node = root_node.parent
+        return root_node.node_count-1 # Subtract one as Bindu does not count
 
     def reset_run_counter(self):
         """
         Reset a count of the running oscillators
         """
-        GMLBaseClass.run_count = 0
+        self.world.run_count = 0
 
     def reset_osc_count(self):
         """
         Reset the counter containing total number of
         oscillators in the tree
         """
-        GMLBaseClass.osc_count = 0
+        self.world.osc_count = 0
 
     def run_counter(self):
         """
         Returns the current number of oscillators running
         """
-        return GMLBaseClass.run_count
+        return self.world.run_count
 
     def increment_draw_mode(self, inc, rootGML):
         """
         Increment (or decrement) the draw mode
         """
-        self.draw_mode += inc
-        if(self.draw_mode < 0):
-            self.draw_mode = 8
-        elif(self.draw_mode > 8):
-            self.draw_mode = 0
+        draw_mode = self.world.draw_mode + inc
+        if(draw_mode < 0):
+            draw_mode = 8
+        elif(draw_mode > 8):
+            draw_mode = 0
+        self.world.draw_mode = draw_mode
         if(rootGML != None):
-            rootGML.set_draw_mode(self.draw_mode)
+            rootGML.set_draw_mode(draw_mode)
 
     def add_bond(self, singularity1, singularity2, color=BLACK, thickness=1):
         """
@@ -130,9 +205,11 @@ class GMLBaseClass(object):
         :param s2: The second singularity.
         :param color: The color of the bond.
         :param thickness: The thickness of the bond.
+        :return: The new GML_Bond
         """
-        bond = Bond(singularity1, singularity2, color, thickness)
-        self.bonds.append(bond)
+        bond = GML_Bond.GML_Bond(singularity1, singularity2, color=color, thickness=thickness)
+        self.world.bonds.append(bond)
+        return bond
 
     def apply_phase_offset(self, offset, offset_vector):
         """
@@ -160,14 +237,33 @@ class GML_2D(GMLBaseClass):  # , NodeMixin):  # Add Node feature
     """
     The 2D instance of a GML nested tree of oscillators
     """
-
-    def __init__(self, name, diameter, colour, freq, phase, area=None, parent=None, child=None, mode3D=False):
+    # Fixed attribute slots keep large trees compact. Rarely used fields
+    # (cursor, edges, pathway) are allocated on first use.
+    __slots__ = ('name', 'diameter', 'colour', 'mode_3d', 'bindu', 'freq', 'orbit_radius',
+                 'phase', 'start_phase', '_cursor_phase', 'phase_step',
+                 'pos_dirty', 'pos_frame', 'pos_stamp', 'parent_stamp',
+                 'pos', 'mypos', 'mypos2', '_cursor_pos', 'parent', 'visited', 'children1',
+                 'image_base', 'relay_flag', 'relay_hysteresis', 'area',
+                 'is_spiral', 'spiral_rate', 'spiral_mode', 'spiral_rotates',
+                 'is_pendulum', 'is_angle', 'angle_offset', 'identifier', 'probability',
+                 'oscillator_speed_node', '_edges', 'preserve_edges', '_pathway',
+                 'flat_engine', 'spatial', 'world',
+                 '_node_count', '_max_depth', '_min_freq', '_max_freq', '_bounding_radius')
+
+    def __init__(self, name, diameter, colour, freq, phase, area=None, parent=None, child=None, mode3D=False, world=None):
         """
         Initialise a GML_2D object which could be a parent or child
+        :param world: GMLWorld of the tree, by default that of the parent,
+        or default_world for a new root
         """
         super(GML_2D, self).__init__()
         global id_base
-        self.count = 0
+        if (world is None):
+            if (parent != None):
+                world = parent.world
+            else:
+                world = default_world
+        self.world = world
         self.name = name
         self.diameter = diameter
         self.colour = colour
@@ -176,26 +272,31 @@ class GML_2D(GMLBaseClass):  # , NodeMixin):  # Add Node feature
         self.orbit_radius = [0, 0]
         self.phase = [0, 0]
         self.start_phase = [0, 0]
-        self.cursor_phase = [0, 0]
+        self._cursor_phase = None
+        self.phase_step = [0, 0]
+        self.pos_dirty = True
+        self.pos_frame = -1
+        self.pos_stamp = 0
+        self.parent_stamp = -1
+        self.parent = None
+        self.children1 = []
         self.set_singularity_parameters(freq,phase)
-        self.mypos = [GMLBaseClass.screen_width
-                      / 2, GMLBaseClass.screen_height/2, 0]
-        self.mypos2 = [GMLBaseClass.screen_width
-                       / 2, GMLBaseClass.screen_height/2, 0]
-        self.cursor_pos = [GMLBaseClass.screen_width
-                           / 2, GMLBaseClass.screen_height/2, 0]
+        self.mypos = [self.world.screen_width
+                      / 2, self.world.screen_height/2, 0]
+        # mypos and mypos2 are only ever replaced, never changed in place
+        self.mypos2 = self.mypos
+        self._cursor_pos = None
 
         self.parent = parent
         self.visited = False
-        self.children1 = []
-        self.image_ids = [id_base+1, id_base+2, id_base+3, id_base+4, id_base+5,
-                          id_base+6, id_base+7, id_base+8]
+        self.image_base = id_base
         id_base+=10
         if child:  # set children only if given
-            self.children = children
+            self.children1 = list(child)
+            self.calc_aggregates()
         if (parent != None):
             parent.add_child(self)
-        GMLBaseClass.osc_count += 1
+        self.world.osc_count += 1
         self.relay_flag = False
         self.relay_hysteresis = 0
         self.area = area
@@ -209,9 +310,139 @@ class GML_2D(GMLBaseClass):  # , NodeMixin):  # Add Node feature
         self.identifier = -1
         self.probability = 1
         self.oscillator_speed_node=1
-        self.edges=[]
         self.preserve_edges=False
-        self.pathway=[]
+        self._edges=None
+        self._pathway=None
+        self.flat_engine=None
+        self.spatial=None
+
+    @property
+    def image_ids(self):
+        """
+        The eight sprite cache ids of this singularity
+        """
+        return range(self.image_base+1, self.image_base+9)
+
+    @property
+    def node_count(self):
+        """
+        Number of singularities in this subtree, including this one
+        """
+        return self._node_count
+
+    @property
+    def max_depth(self):
+        """
+        Number of levels below this singularity (0 for a leaf)
+        """
+        return self._max_depth
+
+    @property
+    def freq_range(self):
+        """
+        [min, max] of freq[0] over this subtree
+        """
+        return [self._min_freq, self._max_freq]
+
+    @property
+    def bounding_radius(self):
+        """
+        Furthest any descendant can be from this singularity, the largest
+        sum of orbit radii down the tree (before pos_scale is applied)
+        """
+        return self._bounding_radius
+
+    def calc_aggregates(self):
+        """
+        Recalculate the cached subtree statistics of this singularity
+        from those of its children
+        """
+        self._node_count = 1
+        self._max_depth = 0
+        self._min_freq = self.freq[0]
+        self._max_freq = self.freq[0]
+        self._bounding_radius = 0
+        for child_node in self.children1:
+            if (child_node != None):
+                self._node_count += child_node._node_count
+                self._max_depth = max(self._max_depth, child_node._max_depth+1)
+                self._min_freq = min(self._min_freq, child_node._min_freq)
+                self._max_freq = max(self._max_freq, child_node._max_freq)
+                self._bounding_radius = max(self._bounding_radius,
+                                            child_node.orbit_radius[0]+child_node._bounding_radius)
+
+    def propagate_aggregates(self):
+        """
+        Recalculate the cached statistics of this singularity and then
+        of each parent up to the root, after a child is removed or a
+        frequency changes
+        """
+        node = self
+        while (node != None):
+            node.calc_aggregates()
+            node = node.parent
+
+    def rebuild_aggregates(self):
+        """
+        Recalculate the cached statistics of the whole subtree, children
+        before parents, after bulk changes made without the setters
+        """
+        for node in reversed(list(self.iter_nodes(float("inf")))):
+            node.calc_aggregates()
+        if (self.parent != None):
+            self.parent.propagate_aggregates()
+
+    @property
+    def cursor_phase(self):
+        """
+        Cursor phase, which follows the start phase until the cursor is first used
+        """
+        if(self._cursor_phase is None):
+            self._cursor_phase = [self.start_phase[0], self.start_phase[1]]
+        return self._cursor_phase
+
+    @cursor_phase.setter
+    def cursor_phase(self, value):
+        self._cursor_phase = value
+
+    @property
+    def cursor_pos(self):
+        """
+        Cartesian position of the cursor, the screen centre until calculated
+        """
+        if(self._cursor_pos is None):
+            return [self.world.screen_width/2, self.world.screen_height/2, 0]
+        return self._cursor_pos
+
+    @cursor_pos.setter
+    def cursor_pos(self, value):
+        self._cursor_pos = value
+
+    @property
+    def edges(self):
+        """
+        Polytope face edges, allocated on first use
+        """
+        if(self._edges is None):
+            self._edges = []
+        return self._edges
+
+    @edges.setter
+    def edges(self, value):
+        self._edges = value
+
+    @property
+    def pathway(self):
+        """
+        Trail of past positions, allocated on first use
+        """
+        if(self._pathway is None):
+            self._pathway = []
+        return self._pathway
+
+    @pathway.setter
+    def pathway(self, value):
+        self._pathway = value
 
     def set_singularity_parameters(self,freq,phase):
         """
@@ -229,7 +460,10 @@ class GML_2D(GMLBaseClass):  # , NodeMixin):  # Add Node feature
         self.orbit_radius[0] = abs(freq)
         self.phase[0] = phase
         self.start_phase[0] = phase
-        self.cursor_phase[0] = phase
+        if(self._cursor_phase is not None):
+            self._cursor_phase[0] = phase
+        self.pos_dirty = True
+        self.propagate_aggregates()
 
     def set_phase(self,phase):
         """
@@ -239,7 +473,9 @@ class GML_2D(GMLBaseClass):  # , NodeMixin):  # Add Node feature
         """
         self.phase[0] = phase
         self.start_phase[0] = phase
-        self.cursor_phase[0] = phase
+        if(self._cursor_phase is not None):
+            self._cursor_phase[0] = phase
+        self.pos_dirty = True
 
     def apply_phase_offset(self, offset, offset_vector):
         """
@@ -252,6 +488,7 @@ class GML_2D(GMLBaseClass):  # , NodeMixin):  # Add Node feature
             self.phase[0] -= 360
         while (self.phase[0] < -360):
             self.phase[0] += 360
+        self.pos_dirty = True
 
     def set_freq(self, freq):
         """
@@ -261,6 +498,8 @@ class GML_2D(GMLBaseClass):  # , NodeMixin):  # Add Node feature
         """
         self.freq[0] = (100)/freq+0.1
         self.orbit_radius[0] = abs(freq)
+        self.pos_dirty = True
+        self.propagate_aggregates()
 
 
     def set_identifier(self, id):
@@ -287,14 +526,7 @@ class GML_2D(GMLBaseClass):  # , NodeMixin):  # Add Node feature
         Returns a list of identifiers, frequencies and
         cursor phases
         """
-        limit -= 1
-        list1 = [[self.identifier, self.freq[0], self.cursor_phase[0]]]
-        if(limit > 0):
-            for child_node in self.children1:
-                if (child_node != None):
-                    list1.extend(child_node.read_identifiers(limit))
-        #print(list1)
-        return list1
+        return [[node.identifier, node.freq[0], node.cursor_phase[0]] for node in self.iter_nodes(limit)]
 
     def update_area(self, new_area):
         """
@@ -315,6 +547,20 @@ class GML_2D(GMLBaseClass):  # , NodeMixin):  # Add Node feature
         Add a child to the current tree node.
         """
         self.children1.append(node)
+        self.world.topology_version += 1
+        # Fold the new subtree into the cached statistics of each ancestor
+        depth = node._max_depth+1
+        radius = node.orbit_radius[0]+node._bounding_radius
+        parent = self
+        while (parent != None):
+            parent._node_count += node._node_count
+            parent._max_depth = max(parent._max_depth, depth)
+            parent._min_freq = min(parent._min_freq, node._min_freq)
+            parent._max_freq = max(parent._max_freq, node._max_freq)
+            parent._bounding_radius = max(parent._bounding_radius, radius)
+            depth += 1
+            radius += parent.orbit_radius[0]
+            parent = parent.parent
 
     #def remove_child(self, node):
         """
@@ -334,17 +580,80 @@ class GML_2D(GMLBaseClass):  # , NodeMixin):  # Add Node feature
         """
         return self.orbit_radius[0]
 
+    def iter_nodes(self, limit=100):
+        """
+        Generator walking the tree depth first (pre-order) without recursion,
+        in the same order as the recursive walks. Nodes up to limit levels
+        deep are visited (this node counts as the first level). The children
+        of a node are read after it has been yielded.
+        """
+        stack = [[self, limit]]
+        while (len(stack) > 0):
+            [node, node_limit] = stack.pop()
+            yield node
+            node_limit -= 1
+            if(node_limit > 0):
+                children = node.children1
+                for index in range(len(children)-1, -1, -1):
+                    if (children[index] != None):
+                        stack.append([children[index], node_limit])
+
+    def iter_levels(self, limit=100):
+        """
+        Generator walking the tree breadth first, yielding a list of the
+        nodes at each level, starting with [self]
+        """
+        level = [self]
+        while (len(level) > 0):
+            yield level
+            limit -= 1
+            if(limit <= 0):
+                return
+            level = [child_node for node in level for child_node in node.children1 if child_node != None]
+
     def clear_visited(self):
         """
         Clear a flag showing this node has been visited
         """
         self.visited = False
 
+    def invalidate_position(self):
+        """
+        Mark the cached position as stale so the next calc_mypos recomputes it.
+        Descendants notice through the parent stamp.
+        """
+        self.pos_dirty = True
+
+    def position_cached(self):
+        """
+        Return True if mypos is still valid: the phase has not changed, the
+        position was calculated in the current frame and the parent has not
+        moved since
+        """
+        if (self.pos_dirty == True or self.pos_frame != self.world.frame_id):
+            return False
+        if (self.parent == None):
+            return True
+        return self.parent.pos_stamp == self.parent_stamp
+
+    def mark_position_valid(self):
+        """
+        Stamp a freshly calculated position with the current frame
+        """
+        self.pos_dirty = False
+        self.pos_frame = self.world.frame_id
+        self.pos_stamp += 1
+        if (self.parent != None):
+            self.parent_stamp = self.parent.pos_stamp
+
     def calc_mypos(self):
         """
         Sum the positions dependent on phases to calculate
-        the position of this singularity
+        the position of this singularity. The result is cached until
+        the phase or a parent position changes, or a new frame starts.
         """
+        if(self.position_cached() == True):
+            return
         #radians=self.phase/180*math.pi
         #print("Calc:"+str(self.phase))
         if(self.is_spiral == False):
@@ -377,39 +686,46 @@ class GML_2D(GMLBaseClass):  # , NodeMixin):  # Add Node feature
             self.pos = [self.orbit_radius[0]*spiral_amount*trig.fast_cos_deg(
                 spiral_angle), self.orbit_radius[0]*spiral_amount*trig.fast_sin_deg(spiral_angle),0]
         if(self.parent == None):
-            self.mypos = [GMLBaseClass.screen_width
-                          / 2, GMLBaseClass.screen_height/2,0]
+            self.mypos = [self.world.screen_width
+                          / 2, self.world.screen_height/2,0]
         else:
             self.mypos = self.parent.mypos
-        self.mypos = [self.mypos[0]+self.pos[0]/self.pos_scale, self.mypos[1]+self.pos[1]/self.pos_scale, self.mypos[2]]
+        self.mypos = [self.mypos[0]+self.pos[0]/self.world.pos_scale, self.mypos[1]+self.pos[1]/self.world.pos_scale, self.mypos[2]]
+        self.mark_position_valid()
 
     def nearest(self, test_pos, max_distance, limit):
         """
-        Recursive function to find the singularity nearest to a
-        given cartesian position
+        Find the singularity nearest to a given cartesian position
         """
-        limit -= 1
-        self.calc_mypos()
         if(self.parent == None):
             best_node = self
         else:
             best_node = self.parent
-        distance = (math.sqrt(
-            ((self.mypos[0] - test_pos[0])**2) + ((self.mypos[1] - test_pos[1])**2)))
+        for node in self.iter_nodes(limit):
+            node.calc_mypos()
+            distance = (math.sqrt(
+                ((node.mypos[0] - test_pos[0])**2) + ((node.mypos[1] - test_pos[1])**2)))
+            if(distance < max_distance):
+                best_node = node
+                max_distance = distance
+        return [best_node, max_distance]
 
-        if(distance < max_distance):
-            best_node = self
-            max_distance = distance
+    def spatial_index(self, limit=100, dims=2):
+        """
+        Return a KD-tree index of the singularity positions below this node.
+        The index is rebuilt at most once per frame, or when the tree changes.
+        :param limit: Depth limit as used by run1
+        :param dims: 2 to index x,y screen positions, 3 to include z
+        """
+        if (self.spatial is None or self.spatial.dims != dims or self.spatial.is_current(limit) == False):
+            self.spatial = GML_Spatial.GML_Spatial(self, limit, dims)
+        return self.spatial
 
-        if(limit > 0):
-            for child_node in self.children1:
-                if (child_node != None):
-                    [new_node, max] = child_node.nearest(
-                        test_pos, max_distance, limit)
-                    if(max < max_distance):
-                        best_node = new_node
-                        max_distance = max
-        return [best_node, max_distance]
+    def nearest_indexed(self, test_pos, max_distance, limit):
+        """
+        Sub-linear equivalent of nearest using the per frame spatial index
+        """
+        return self.spatial_index(limit).nearest(test_pos, max_distance)
 
     def angleTo(self, test_pos):
         """
@@ -447,43 +763,25 @@ class GML_2D(GMLBaseClass):  # , NodeMixin):  # Add Node feature
 
     def frequency_list(self, limit):
         """
-        Iterate, building a list of frequencies
+        Iterate, building a sorted list of frequencies
         """
-        res = []
-        limit -= 1
-        if(limit > 0):
-            for child_node in self.children1:
-                if (child_node != None):
-                    res = res+child_node.frequency_list(limit)
-        res.append(1.0 / self.freq[0])
-        res.sort()
-        return res
+        return sorted(1.0 / node.freq[0] for node in self.iter_nodes(limit))
 
     def periods_list(self, limit):
         """
-        Iterate, building a list of periods (1/f)
+        Iterate, building a sorted list of periods (1/f)
         """
-        res = []
-        limit -= 1
-        if(limit > 0):
-            for child_node in self.children1:
-                if (child_node != None):
-                    res = res+child_node.periods_list(limit)
-        res.append(self.freq[0])
-        res.sort()
-        return res
+        return sorted(node.freq[0] for node in self.iter_nodes(limit))
 
     def adjacient_ratio_list(self, limit):
         """
-        Iterate, building a list of adjacent frequencies
+        Iterate, building a sorted list of the frequency
+        ratios of each child to its parent
         """
         res = []
-        limit -= 1
-        if(limit > 0):
-            for child_node in self.children1:
-                if (child_node != None):
-                    res.append((1.0/child_node.freq[0]) / (1.0/self.freq[0]))
-                    res = res+child_node.adjacient_ratio_list(limit)
+        for node in self.iter_nodes(limit):
+            if(node is not self):
+                res.append((1.0/node.freq[0]) / (1.0/node.parent.freq[0]))
         res.sort()
         return res
 
@@ -491,118 +789,210 @@ class GML_2D(GMLBaseClass):  # , NodeMixin):  # Add Node feature
         """
         Iterate, drawing captured photo areas
         """
-        if(self.area != None and GMLBaseClass.draw_mode != 7 and GMLBaseClass.draw_mode != 2):
-            self.graphics_helper.plot_rotated_centre_blit(
-                self.area, self.mypos, self.start_phase[0]-self.phase[0], True, 0.8)
-        limit -= 1
-        if(limit > 0):
-            for child_node in self.children1:
-                if (child_node != None):
-                    child_node.run1_areas(limit)
+        if(self.world.draw_mode == 7 or self.world.draw_mode == 2):
+            return
+        for node in self.iter_nodes(limit):
+            if(node.area != None):
+                node.world.graphics_helper.plot_rotated_centre_blit(
+                    node.area, node.mypos, node.start_phase[0]-node.phase[0], True, 0.8)
 
 
     def increment_phase(self):
-        if (GMLBaseClass.reverse == True):
-            self.phase[0] -= self.freq[0] * GMLBaseClass.oscillator_speed * self.oscillator_speed_node
-        else:
-            self.phase[0] += self.freq[0] * GMLBaseClass.oscillator_speed * self.oscillator_speed_node
+        self.phase_step[0] = self.freq[0] * self.world.oscillator_speed * self.oscillator_speed_node
+        if (self.world.reverse == True):
+            self.phase_step[0] = -self.phase_step[0]
+        self.phase[0] += self.phase_step[0]
         if (self.phase[0] > 360):
             self.phase[0] -= 360
         elif (self.phase[0] < -360):
             self.phase[0] += 360
+        self.pos_dirty = True
 
     def run1(self, limit, inverse_gml=False):
         """
         Perform one iteration of the GML tree, calculating
         new phase positions for all singularity points in the GML tree
         """
-        GMLBaseClass.run_count += 1
-        if(GMLBaseClass.pause != True):
-            self.increment_phase()
-        self.calc_mypos()
         if(self.parent == None):
-            self.mypos2 = [GMLBaseClass.screen_width
-                           / 2, GMLBaseClass.screen_height/2,0]
+            self.world.frame_id += 1
+        if(self.flat_engine is not None):
+            self.flat_engine.run1(limit)
+            return
+        pause = self.world.pause
+        for node in self.iter_nodes(limit):
+            self.world.run_count += 1
+            if(pause != True):
+                node.increment_phase()
+            node.calc_mypos()
+            node.draw_node()
+
+    def draw_node(self):
+        """
+        Draw this singularity from its current mypos
+        """
+        if(self.parent == None):
+            self.mypos2 = [self.world.screen_width
+                           / 2, self.world.screen_height/2,0]
             #print("Mypos",self.mypos)
         else:
             self.mypos2 = self.parent.mypos
 
 
         max_r = 0
-        if(GMLBaseClass.draw_mode >= 7):
+        if(self.world.draw_mode >= 7):
             for child_node in self.children1:
                 if (child_node != None):
                     if(child_node.orbit_radius[0] > max_r):
                         max_r = child_node.orbit_radius[0]  # *0.67
 
+        self.draw1(max_r)
+
+    def step_phases(self, limit):
+        """
+        Advance the phases of the GML tree by one simulation tick
+        without drawing. Used with GML_Clock so the simulation runs
+        at a fixed rate whatever the frame rate.
+        """
+        if(self.parent == None):
+            self.world.frame_id += 1
+            if(self.flat_engine is not None):
+                self.flat_engine.step(limit)
+                return
+        for node in self.iter_nodes(limit):
+            if(self.world.pause != True):
+                node.increment_phase()
+            else:
+                node.phase_step = [0, 0]
+
+    def render1(self, limit, alpha=1.0):
+        """
+        Draw the GML tree without advancing it. The phases are
+        interpolated alpha (0 to 1) of the way from the previous
+        simulation tick to the current one.
+        """
+        if(self.parent == None):
+            self.world.frame_id += 1
+        if(self.flat_engine is not None):
+            self.flat_engine.render1(limit, alpha)
+            return
+        for node in self.iter_nodes(limit):
+            self.world.run_count += 1
+            current_phase = [node.phase[0], node.phase[1]]
+            node.phase[0] -= (1-alpha)*node.phase_step[0]
+            node.phase[1] -= (1-alpha)*node.phase_step[1]
+            node.pos_dirty = True
+            node.calc_mypos()
+            node.draw_node()
+            # Restore the simulated phase, the children use the drawn mypos
+            node.phase[0] = current_phase[0]
+            node.phase[1] = current_phase[1]
+            node.pos_dirty = True
+
+    def draw1(self, max_r):
+        """
+        Draw this singularity using the already calculated mypos, mypos2
+        and pos. max_r is the largest child orbit radius (draw modes 7 and 8)
+        """
         #self.pathway.extend([self.mypos[0],self.mypos[1],self.mypos[2]])
         #while(len(self.pathway)>63):
         #    self.pathway.pop(0)
         #    self.pathway.pop(0)
         #    self.pathway.pop(0)
         #    print(self.pathway)
-        #self.graphics_helper.plot_lines_3D(self.pathway,self.colour, 1.0)
+        #self.world.graphics_helper.plot_lines_3D(self.pathway,self.colour, 1.0)
 
-        self.graphics_helper.draw_singularity(self.image_ids[0],
+        self.world.graphics_helper.draw_singularity(self.image_ids[0],
                                               self.image_ids[1],
                                               self.mypos, self.mypos2,
-                                              self.orbit_radius[0]/GMLBaseClass.pos_scale, self.phase[0], self.angle_offset,
-                                              self.colour,GMLBaseClass.draw_mode,
+                                              self.orbit_radius[0]/self.world.pos_scale, self.phase[0], self.angle_offset,
+                                              self.colour,self.world.draw_mode,
                                               self.is_spiral,self.spiral_rotates,self.spiral_mode,self.spiral_rate,
                                               max_r)
 
-        newpos = [self.mypos2[0]+self.pos[0]/GMLBaseClass.pos_scale, self.mypos2[1]+self.pos[1]/GMLBaseClass.pos_scale,self.mypos2[2]+self.pos[2]/GMLBaseClass.pos_scale]
+        newpos = [self.mypos2[0]+self.pos[0]/self.world.pos_scale, self.mypos2[1]+self.pos[1]/self.world.pos_scale,self.mypos2[2]+self.pos[2]/self.world.pos_scale]
         #pygame.draw.line(screen,self.colour, self.mypos ,newpos,1)
         self.mypos2 = newpos
 
         #Draw the singularity
-        if(GMLBaseClass.draw_mode >= 3):
-            self.graphics_helper.create_circle(self.image_ids[2], self.mypos2, self.diameter/GMLBaseClass.pos_scale, 0, self.colour, [0, 0, 0], 200,
+        if(self.world.draw_mode >= 3):
+            self.world.graphics_helper.create_circle(self.image_ids[2], self.mypos2, self.diameter/self.world.pos_scale, 0, self.colour, [0, 0, 0], 200,
                                                    False, 0)
         #print("Mypos",self.mypos)
         #Draw the orbit circle
         #pygame.draw.circle(screen,self.colour, self.mypos , self.diameter, 0)
-        limit -= 1
-        if(limit > 0):
-            for child_node in self.children1:
-                if (child_node != None):
-                    child_node.run1(limit)
+
+    def compile_flat(self):
+        """
+        Pack this tree into a flat structure of arrays engine so that run1
+        advances every singularity using vectorised numpy passes.
+        The nodes become thin views onto the engine arrays.
+        """
+        self.flat_engine = GML_Flat.GML_Flat(self)
+        return self.flat_engine
+
+    def positions_at(self, times, limit=100, tick_rate=None, from_start=False):
+        """
+        Evaluate the positions of the tree at one or many times in a single
+        vectorised pass, without running the simulation. Phases advance
+        linearly in time so this respects reverse, pause and the global
+        and per node oscillator speeds.
+        :param times: scalar or array of times, in ticks (calls of run1)
+        unless tick_rate is given in which case they are in seconds
+        :param from_start: Measure time from the start phases (as after
+        reset_phases) rather than from the current phases
+        :return: [nodes, phases, positions] with the nodes in level order,
+        phases of shape times.shape+(nodes, 2) and positions of shape
+        times.shape+(nodes, 3)
+        """
+        times = np.asarray(times, dtype=np.float64)
+        if(tick_rate is not None):
+            times = times*tick_rate
+        engine = self.flat_engine
+        if(engine is None):
+            engine = GML_Flat.GML_Flat(self, bind_views=False)
+        [phases, positions] = engine.positions_at(times, limit, from_start)
+        return [engine.nodes[:positions.shape[-2]], phases, positions]
+
+    def state_at(self, t, limit=100, tick_rate=None, from_start=False):
+        """
+        Return [nodes, phases, positions] of the tree at a single time t
+        (see positions_at)
+        """
+        return self.positions_at(float(t), limit, tick_rate, from_start)
+
+    def release_flat(self):
+        """
+        Return to the recursive run1 and give the nodes back their own lists
+        """
+        if(self.flat_engine is not None):
+            self.flat_engine.release()
+            self.flat_engine = None
 
     def reset_phases(self, limit):
         """
         Reset phases to their starting state and re-compute
         the positions
         """
-        self.phase[0] = self.start_phase[0]
-        self.calc_mypos()
-        limit -= 1
-        if(limit > 0):
-            for child_node in self.children1:
-                if (child_node != None):
-                    child_node.reset_phases(limit)
+        for node in self.iter_nodes(limit):
+            node.phase[0] = node.start_phase[0]
+            node.pos_dirty = True
+            node.calc_mypos()
 
     def update_positions(self, limit):
         """
         Update all nested positions
         """
-        self.calc_mypos()
-        limit -= 1
-        if(limit > 0):
-            for child_node in self.children1:
-                if (child_node != None):
-                    child_node.update_positions(limit)
+        for node in self.iter_nodes(limit):
+            node.calc_mypos()
 
     def reset_child_cursors(self, limit):
         """
         Visit children and reset their cursors to their initial
         phase positions in order to synchronise clocks
         """
-        limit -= 1
-        if(limit > 0):
-            for child_node in self.children1:
-                if (child_node != None):
-                    child_node.reset_cursor()
-                    child_node.reset_child_cursors(limit)
+        for node in self.iter_nodes(limit):
+            if(node is not self):
+                node.reset_cursor()
 
     def set_cursor(self, new_phase):
         """
@@ -697,8 +1087,8 @@ class GML_2D(GMLBaseClass):  # , NodeMixin):  # Add Node feature
             new_pos = [self.orbit_radius[0]*spiral_amount*trig.fast_cos_deg(
                 spiral_angle), self.orbit_radius[0]*spiral_amount*trig.fast_sin_deg(spiral_angle),0]
         if(self.parent == None):
-            parent = [GMLBaseClass.screen_width
-                      / 2, GMLBaseClass.screen_height/2]
+            parent = [self.world.screen_width
+                      / 2, self.world.screen_height/2]
             #best_node=self
         else:
             parent = self.parent.mypos
@@ -1011,44 +1401,80 @@ class GML_2D(GMLBaseClass):  # , NodeMixin):  # Add Node feature
 
     def remove_all_children(self):
         """
-        Remove all children from this node and count how many removed
-        :return:
+        Remove all children from this node and count how many removed.
+        The children keep their own subtrees and become separate roots.
+        :return: Number of singularities removed
         """
+        removed = self._node_count-1
         for child in self.children1:
-            child.remove_all_children()
-            self.children1.remove(child)
-            GMLBaseClass.osc_count -= 1
-
+            if (child != None):
+                child.parent = None
+        # Clear in place, other code may hold a reference to the list
+        del self.children1[:]
+        self.world.osc_count -= removed
+        self.world.topology_version += 1
+        self.propagate_aggregates()
+        return removed
+
+    def child_index(self, node):
+        """
+        Position of node in the list of children, or -1. Matched by
+        identity so only the siblings are scanned.
+        """
+        children = self.children1
+        for index in range(len(children)):
+            if (children[index] is node):
+                return index
+        return -1
+
+    def detach(self):
+        """
+        Remove this singularity and its subtree from its parent, going
+        straight through the parent link. The subtree is kept intact and
+        its cached statistics stay valid, so it can be added elsewhere.
+        :return: The former parent, or None if this was already a root
+        """
+        parent = self.parent
+        if (parent == None):
+            return None
+        index = parent.child_index(self)
+        if (index >= 0):
+            del parent.children1[index]
+        self.parent = None
+        self.world.osc_count -= self._node_count
+        self.world.topology_version += 1
+        parent.propagate_aggregates()
+        return parent
 
     def remove_child(self,remove_node):
         """
+        Remove a singularity anywhere below this one together with its
+        subtree. The parent links are followed upwards to check the node
+        belongs to this tree rather than searching the tree for it.
         :param remove_node:
-        :param decrement:
-        :return:
+        :return: True if removed
         """
-        for child in self.children1:
-            if(child==remove_node):
-                remove_node.remove_all_children()
-                self.children1.remove(remove_node)
-                GMLBaseClass.osc_count -= 1
-                return True
-            if (len(child.children1) > 0):
-                removed=child.remove_child(remove_node)
-                if(removed==True):
-                    return True
-        return
+        node = remove_node.parent
+        while (node != None and node is not self):
+            node = node.parent
+        if (node == None):
+            return
+        remove_node.detach()
+        return True
 
     def decrement(self):
         """
         Decrement one from number of phase singularities on this circle.
+        Removes the last leaf in depth first order, the node smallest_child(-1)
+        finds, by following the last child down rather than walking the tree.
         :return:
         """
         if (self.children1 != None):
             if (len(self.children1)>0):
-                smallest_node=self.smallest_child(-1)
-                #self.children1.pop(0)
-                #self.children1.remove(smallest_node)
-                self.remove_child(smallest_node)
+                smallest_node=self
+                while (len(smallest_node.children1) > 0):
+                    smallest_node=smallest_node.children1[-1]
+                smallest_node.detach()
 
     def balance_phases(self):
         """
@@ -1066,6 +1492,7 @@ class GML_2D(GMLBaseClass):  # , NodeMixin):  # Add Node feature
                 #print("Diff=",difference)
                 if(abs(difference)<179):
                     self.children1[0].phase[0] += (179 - abs(difference)) / 2 #0.9 # (difference-180)/2
+                    self.children1[0].pos_dirty = True
                 return
             if (num_children >= 2):
                 optimum_angle=360/num_children - 0.005
@@ -1102,6 +1529,8 @@ class GML_2D(GMLBaseClass):  # , NodeMixin):  # Add Node feature
 
                     if (diff2 > 1.5 * optimum_angle):
                             self.children1[iter3].phase[0] -= 1
+                for child in self.children1:
+                    child.pos_dirty = True
 
 
 
@@ -1109,51 +1538,43 @@ class GML_2D(GMLBaseClass):  # , NodeMixin):  # Add Node feature
         """
         Print a text tree layout
         """
-        if (self.mode_3d == False):
-            str2 = str1+self.name+" " + \
-                str(round(self.freq[0], 3))+" "+str(round(self.phase[0], 2))
-        else:
-            str2 = str1+self.name+" " + \
-                str(round(self.freq[0], 3))+","+str(round(self.freq[1], 3))+ " " + \
-                str(round(self.phase[0], 2))+","+ str(round(self.phase[1], 2))+ " "
-        print(str2)
-        if(len(self.children1) > 0):
-            count = 0
-            last = len(self.children1)-1
-            for child_node in self.children1:
-                if(count != last):
-                    str3 = str1.replace("-", " ").replace("+", " ")+"|--"
-                else:
-                    str3 = str1.replace("-", " ").replace("+", " ")+"+--"
-                child_node.print_tree(str3)
-                count += 1
-        else:
-            print(str1.replace("-", " ").replace("+", " "))
-        pass
+        stack = [[self, str1]]
+        while (len(stack) > 0):
+            [node, str1] = stack.pop()
+            if (node.mode_3d == False):
+                str2 = str1+node.name+" " + \
+                    str(round(node.freq[0], 3))+" "+str(round(node.phase[0], 2))
+            else:
+                str2 = str1+node.name+" " + \
+                    str(round(node.freq[0], 3))+","+str(round(node.freq[1], 3))+ " " + \
+                    str(round(node.phase[0], 2))+","+ str(round(node.phase[1], 2))+ " "
+            print(str2)
+            indent = str1.replace("-", " ").replace("+", " ")
+            if(len(node.children1) > 0):
+                last = len(node.children1)-1
+                for count in range(last, -1, -1):
+                    if(count != last):
+                        stack.append([node.children1[count], indent+"|--"])
+                    else:
+                        stack.append([node.children1[count], indent+"+--"])
+            else:
+                print(indent)
 
     def dimensions(self, dim=0):
         """
         Return maximum number of dimendsions used
         """
-        max_dim = dim
-        for child_node in self.children1:
-            dim1 = child_node.dimensions(dim+1)
-            if(dim1 > max_dim):
-                max_dim = dim1
-        return max_dim
+        return dim+self._max_depth
 
     def x_child_projection(self, limit, colour, x):
         """
         Project children onto one axis
         """
         #self.calc_mypos()
-        limit -= 1
-        if(limit > 0):
-            if (len(self.children1) == 0):
+        for node in self.iter_nodes(limit-1):
+            if (limit > 1 and len(node.children1) == 0):
                 #Reached a child
-                self.graphics_helper.create_circle(self.image_ids[3], [self.mypos[0], x], self.diameter, 0, colour, [0, 0, 0], 200, False, 0)
-            for child_node in self.children1:
-                child_node.x_child_projection(limit, colour, x)
+                node.world.graphics_helper.create_circle(node.image_ids[3], [node.mypos[0], x], node.diameter, 0, colour, [0, 0, 0], 200, False, 0)
         return
 
     def y_child_projection(self, limit, colour, y):
@@ -1161,13 +1582,10 @@ class GML_2D(GMLBaseClass):  # , NodeMixin):  # Add Node feature
         Project children onto one axis
         """
         #self.calc_mypos()
-        limit -= 1
-        if(limit > 0):
-            if (len(self.children1) == 0):
+        for node in self.iter_nodes(limit-1):
+            if (limit > 1 and len(node.children1) == 0):
                 #Reached a child
-                self.graphics_helper.create_circle(self.image_ids[4],[self.mypos[0], y], self.diameter, 0, colour, [0, 0, 0], 200, False, 0)
-            for child_node in self.children1:
-                child_node.y_child_projection(limit, colour, y)
+                node.world.graphics_helper.create_circle(node.image_ids[4],[node.mypos[0], y], node.diameter, 0, colour, [0, 0, 0], 200, False, 0)
         return
 
     def max_min_freq(self, limit, min1, max1):
@@ -1175,17 +1593,11 @@ class GML_2D(GMLBaseClass):  # , NodeMixin):  # Add Node feature
         Return max min frequency
         """
         #self.calc_mypos()
-        limit -= 1
-        if(limit > 0):
-            #if(self.bindu==False):
-            min1 = min(min1, self.freq[0])
-            max1 = max(max1, self.freq[0])
-            for child_node in self.children1:
-                min_max = child_node.max_min_freq(limit, min1, max1)
-                if(min_max is not None):
-                    min1 = min_max[0]
-                    max1 = min_max[1]
-            return [min1, max1]
+        if(limit > 1):
+            for node in self.iter_nodes(limit-1):
+                #if(node.bindu==False):
+                min1 = min(min1, node.freq[0])
+                max1 = max(max1, node.freq[0])
         return [min1, max1]
 
     def depth_projection(self, limit, colour, dist, vertical):
@@ -1193,18 +1605,17 @@ class GML_2D(GMLBaseClass):  # , NodeMixin):  # Add Node feature
         Project children onto one axis
         """
         #self.calc_mypos()
-        limit -= 1
-        if(limit > 0):
-            for child_node in self.children1:
-                child_node.depth_projection(limit, colour, dist, vertical)
-        else:
-            if (vertical == True):
-                pos = [self.mypos[0], dist,0]
-                image_num = 6
-            else:
-                pos = [dist, self.mypos[1],0]
-                image_num = 7
-            self.graphics_helper.create_circle(self.image_ids[image_num], pos, self.diameter, 0, colour, [0, 0, 0], 200,
+        levels = list(self.iter_levels(limit))
+        if(len(levels) >= limit):
+            #Draw the nodes at the depth limit
+            for node in levels[-1]:
+                if (vertical == True):
+                    pos = [node.mypos[0], dist,0]
+                    image_num = 6
+                else:
+                    pos = [dist, node.mypos[1],0]
+                    image_num = 7
+                node.world.graphics_helper.create_circle(node.image_ids[image_num], pos, node.diameter, 0, colour, [0, 0, 0], 200,
                                                    False, 0)
         return
 
@@ -1229,6 +1640,19 @@ class GML_2D(GMLBaseClass):  # , NodeMixin):  # Add Node feature
         if(image is not None):
             cv2.imshow('frame', image)
 
+    def save(self, path):
+        """
+        Save the tree below this node to a versioned binary .npy file
+        which can be reloaded with load_gml
+        """
+        GML_Serialise.save_tree(self, path)
+
+    def save_json(self, path):
+        """
+        Export the tree below this node as JSON, reloaded with load_gml_json
+        """
+        GML_Serialise.save_json(self, path)
+
     def gml_to_text(self, limit):
         """
         Function to convert GML to text revealing
@@ -1335,10 +1759,10 @@ class GML_2D(GMLBaseClass):  # , NodeMixin):  # Add Node feature
 
                 for freq_key in gml_freq_dictionary:
                     if(polygons==True):
-                        self.graphics_helper.plot_lines(gml_freq_dictionary[freq_key], [
+                        self.world.graphics_helper.plot_lines(gml_freq_dictionary[freq_key], [
                                 0.8, 0.2+depth/10, 0.8], transparency=0.2, line_width=line_width, avg_height=avg_height, stipple=stipple,polygons=polygons)
                     else:
-                        self.graphics_helper.plot_lines(gml_freq_dictionary[freq_key], [
+                        self.world.graphics_helper.plot_lines(gml_freq_dictionary[freq_key], [
                             0.8, 0.2 + depth / 10, 0.8], transparency=0.9, line_width=line_width, avg_height=avg_height,
                                                         stipple=stipple, polygons=polygons)
 
@@ -1349,15 +1773,31 @@ class GML_2D(GMLBaseClass):  # , NodeMixin):  # Add Node feature
         return
 
 #This is outside the class to create the top level root node
-def create_bindu(reset_count=True):
+def load_gml(path, mmap_mode="r", world=None):
+    """
+    Load a GML_2D or GML_3D tree saved with save
+    :param world: GMLWorld for the tree, default_world if not given
+    :return: The root node
+    """
+    return GML_Serialise.load_tree(path, mmap_mode, world)
+
+def load_gml_json(path, world=None):
+    """
+    Load a GML tree exported with save_json
+    :return: The root node
+    """
+    return GML_Serialise.load_json(path, world)
+
+def create_bindu(reset_count=True, world=None):
     """
     Create the Bindu point at the centre and top of the
     GML tree
+    :param world: GMLWorld for the tree, default_world if not given
     """
     parent_node = None
     bindu_node = GML_2D(
-        'Bindu', 0.001, [255, 255, 255], 0, 0, None, parent=parent_node)
+        'Bindu', 0.001, [255, 255, 255], 0, 0, None, parent=parent_node, world=world)
     if(reset_count == True):
         bindu_node.reset_osc_count()
-        GMLBaseClass.osc_count += 1
+        bindu_node.world.osc_count += 1
     return bindu_node
\ No newline at end of file
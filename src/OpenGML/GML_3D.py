@@ -10,6 +10,7 @@
 
 import numpy as np
 from GML import *
+import GML_Flat
 from polytopic_geometry import basic_vertices_to_edge_sequence
 from polytopic_geometry import vertices_to_edge_sequence
 
@@ -17,9 +18,15 @@ class GML_3D(GML_2D):  # , NodeMixin):  # Add Node feature
     """
     The 3D instance of a GML nested tree of oscillators
     """
+    __slots__ = ('edge_cache', 'batched_engine')
+    # Relative change in the pairwise vertex distances of a frequency group
+    # above which its cached convex hull edges are recalculated
+    edge_cache_tolerance = 1e-3
 
-    def __init__(self, name, diameter, colour, freq, phase, area=None, parent=None, child=None, mode3D=True):
-        super(GML_3D, self).__init__(name, diameter, colour, freq, phase, area=area, parent=parent, child=child, mode3D=True)
+    def __init__(self, name, diameter, colour, freq, phase, area=None, parent=None, child=None, mode3D=True, world=None):
+        super(GML_3D, self).__init__(name, diameter, colour, freq, phase, area=area, parent=parent, child=child, mode3D=True, world=world)
+        self.edge_cache = None # Allocated when hull edges are first cached
+        self.batched_engine = None # Unbound GML_Flat kept by update_positions_batched
 
 
     def set_singularity_parameters(self,freq,phase):
@@ -40,7 +47,10 @@ class GML_3D(GML_2D):  # , NodeMixin):  # Add Node feature
             self.orbit_radius[dimension] = abs(freq[dimension])
             self.phase[dimension] = phase[dimension]
             self.start_phase[dimension] = phase[dimension]
-            self.cursor_phase[dimension] = phase[dimension]
+            if (self._cursor_phase is not None):
+                self._cursor_phase[dimension] = phase[dimension]
+        self.pos_dirty = True
+        self.propagate_aggregates()
 
     def set_freq(self, freq):
         """
@@ -51,6 +61,8 @@ class GML_3D(GML_2D):  # , NodeMixin):  # Add Node feature
         for dimension in range(0, 2):
             self.freq[dimension] = (100) / freq[dimension] + 0.1
             self.orbit_radius[dimension] = abs(freq[dimension])
+        self.pos_dirty = True
+        self.propagate_aggregates()
 
     def apply_phase_offset(self, offset=None, offset_vector=None):
         """
@@ -74,14 +86,18 @@ class GML_3D(GML_2D):  # , NodeMixin):  # Add Node feature
                 self.phase[0] -= 360
             while (self.phase[0] < -360):
                 self.phase[0] += 360
+        self.pos_dirty = True
 
     def calc_mypos(self):
         """
         Sum the positions dependent on phases to calculate
-        the position of this singularity
+        the position of this singularity. The result is cached until
+        the phase or a parent position changes, or a new frame starts.
         """
         if (self.is_spiral == True):
-            return super.calc_mypos() #Use 2D calclulation for spirals
+            return super(GML_3D, self).calc_mypos() #Use 2D calclulation for spirals
+        if (self.position_cached() == True):
+            return
         #self.pos = [self.orbit_radius[0]*trig.fast_cos_deg(
         #   self.phase[0]), self.orbit_radius[0]*trig.fast_sin_deg(self.phase[0]),0]
         sin_theta = trig.fast_sin_deg(-self.phase[0])
@@ -96,11 +112,36 @@ class GML_3D(GML_2D):  # , NodeMixin):  # Add Node feature
 
 
         if(self.parent == None):
-            self.mypos = [GMLBaseClass.screen_width
-                          / 2, GMLBaseClass.screen_height/2,0]
+            self.mypos = [self.world.screen_width
+                          / 2, self.world.screen_height/2,0]
         else:
             self.mypos = self.parent.mypos
         self.mypos = [self.mypos[0]+self.pos[0], self.mypos[1]+self.pos[1], self.mypos[2]+self.pos[2]]
+        self.mark_position_valid()
+
+    def update_positions_batched(self, limit=100):
+        """
+        Batched equivalent of update_positions. The theta/phi phases and orbit
+        radii of the whole tree are passed through one numpy kernel and the
+        absolute positions are accumulated a level at a time.
+        Results match the per-node calc_mypos path to within 1e-3 of the orbit
+        radius per nesting level, the difference being the resolution of the
+        trig tables used by calc_mypos.
+        Without a compiled flat engine an unbound one is kept between calls,
+        recompiled when the topology changes and otherwise refreshed with
+        the phases and orbit radii of the nodes.
+        """
+        engine = self.flat_engine
+        if(engine is None):
+            engine = self.batched_engine
+            if(engine is None or engine.topology_version != self.world.topology_version):
+                engine = GML_Flat.GML_Flat(self, bind_views=False)
+                self.batched_engine = engine
+            else:
+                engine.read_node_state()
+        count = engine.update_positions(limit)
+        engine.write_positions(count)
+        return count
 
     def add_spherical_coords(self,name, coords, diameter=1, freq=[1,1], colour=[255,255,255], offset_angle=[0,0]):
         """
@@ -462,6 +503,44 @@ class GML_3D(GML_2D):  # , NodeMixin):  # Add Node feature
         if (len(nodes) > 0):
             return nodes
 
+    def edge_signature(self, line_points):
+        """
+        Pairwise distances between the vertices of a frequency group. These are
+        unchanged by rotation and translation so a rigidly rotating polytope
+        keeps the same signature from frame to frame.
+        """
+        points = np.array(line_points, dtype=np.float64).reshape(-1, 3)
+        return np.linalg.norm(points[:, None, :]-points[None, :, :], axis=-1)
+
+    def cached_edge_sequence(self, freq_key, line_points, plot_mode):
+        """
+        Return the convex hull edge sequence for a frequency group, only
+        recalculating the hull when children were added or removed or the
+        relative geometry of the group changed by more than edge_cache_tolerance
+        :param freq_key: Frequency group of the child singularities
+        :param line_points: Flat list of x,y,z vertex positions
+        :param plot_mode: 0 for the exact cdd hull, 1 for the scipy hull
+        :return: Edge sequence as returned by the polytopic_geometry functions
+        """
+        child_count = len(self.children1)
+        signature = self.edge_signature(line_points)
+        key = (freq_key, plot_mode)
+        if (self.edge_cache is None):
+            self.edge_cache = {}
+        entry = self.edge_cache.get(key)
+        if (entry is not None and entry[0] == child_count and entry[1].shape == signature.shape):
+            scale = max(np.max(entry[1]), 1e-12)
+            if (np.max(np.abs(signature-entry[1])) <= self.edge_cache_tolerance*scale):
+                return entry[2]
+        if (entry is not None and entry[0] != child_count):
+            self.edge_cache = {}
+        if (plot_mode == 0):
+            edges = vertices_to_edge_sequence(line_points)
+        else:
+            edges = basic_vertices_to_edge_sequence(line_points)
+        self.edge_cache[key] = [child_count, signature, edges]
+        return edges
+
     def gml_line_plot(self, limit, match_frequency=True, fuzzy_match=False, depth=0, line_width=1.0, stipple=False, polygons=False, plot_mode=0):
         """
         Function to plot lines from centre point to the phase singularities.
@@ -527,8 +606,14 @@ class GML_3D(GML_2D):  # , NodeMixin):  # Add Node feature
                 if (self.preserve_edges==True):
                     plot_mode=2 #Use edges provided for polytope
                 for freq_key in gml_freq_dictionary:
-                        self.graphics_helper.plot_lines_3D(gml_freq_dictionary[freq_key], [
-                               0.8, 0.2+depth/10, 0.8], 0.9, line_width=line_width, stipple=stipple,polygons=polygons,edge_sequence=self.edges,plot_mode=plot_mode)
+                        edges = self.edges
+                        group_plot_mode = plot_mode
+                        if (plot_mode == 0 or plot_mode == 1):
+                            #Reuse the hull topology while the group only rotates
+                            edges = self.cached_edge_sequence(freq_key, gml_freq_dictionary[freq_key], plot_mode)
+                            group_plot_mode = 2
+                        self.world.graphics_helper.plot_lines_3D(gml_freq_dictionary[freq_key], [
+                               0.8, 0.2+depth/10, 0.8], 0.9, line_width=line_width, stipple=stipple,polygons=polygons,edge_sequence=edges,plot_mode=group_plot_mode)
 
                 for child_node in self.children1:
                     if (child_node != None):
@@ -539,26 +624,28 @@ class GML_3D(GML_2D):  # , NodeMixin):  # Add Node feature
 
     def increment_phase(self):
         for dims in range(0, 2):
-            if (GMLBaseClass.reverse == True):
-                self.phase[dims] -= self.freq[dims] * GMLBaseClass.oscillator_speed * self.oscillator_speed_node
-            else:
-                self.phase[dims] += self.freq[dims] * GMLBaseClass.oscillator_speed * self.oscillator_speed_node
+            self.phase_step[dims] = self.freq[dims] * self.world.oscillator_speed * self.oscillator_speed_node
+            if (self.world.reverse == True):
+                self.phase_step[dims] = -self.phase_step[dims]
+            self.phase[dims] += self.phase_step[dims]
             if (self.phase[dims] > 360):
                 self.phase[dims] -= 360
             elif (self.phase[dims] < -360):
                 self.phase[dims] += 360
+        self.pos_dirty = True
 
 
 
-def create_bindu_3D(reset_count=True):
+def create_bindu_3D(reset_count=True, world=None):
     """
     Create the Bindu point at the centre and top of the
     GML tree
+    :param world: GMLWorld for the tree, default_world if not given
     """
     parent_node = None
     bindu_node = GML_3D(
-        'Bindu', 0.001, [255, 255, 255], [0,0], [0,0], None, parent=parent_node, mode3D=True)
+        'Bindu', 0.001, [255, 255, 255], [0,0], [0,0], None, parent=parent_node, mode3D=True, world=world)
     if(reset_count == True):
         bindu_node.reset_osc_count()
-        GMLBaseClass.osc_count += 1
-    return bindu_node
\ No newline at end of file
+        bindu_node.world.osc_count += 1
+    return bindu_node
\ No newline at end of file
@@ -31,6 +31,7 @@ from time import sleep
 
 from Sonic_GML import *
 from GML import *
+from GML_Clock import GML_Clock
 from graphics_helper import *
 from blit_functions import *
 from colour_functions import * #RGB definitions of Colours
@@ -54,6 +55,7 @@ class GML_App_2D(App):
         self.sonic_enabled=sonic_enabled
         self.set_title(title)
         self.FPS = 50 # Frames per second setting
+        self.sim_clock = GML_Clock(self.FPS) # Simulation ticks per second
         self.display=(800,800)
         self.populate(populate_callback)
         #Start on demo 0
@@ -86,6 +88,7 @@ class GML_App_2D(App):
         self.dt_key_press=0
         self.runtime_callback=None
         self.last_redraw = Clock.get_time()
+        self.canvas_topology = -1
 
     def on_window_resize(self, window, width, height):
         """
@@ -94,7 +97,7 @@ class GML_App_2D(App):
         """
         print("width", width)
         print("height", height)
-        self.rootNode.graphics_helper.init(Window)
+        self.rootNode.world.graphics_helper.init(Window)
         GML_resize()
         self.redraw = True
 
@@ -122,7 +125,7 @@ class GML_App_2D(App):
 
     def initial_rotation_speed(self,speed):
         if(speed==0):
-            self.running_speed = self.rootNode.oscillator_speed
+            self.running_speed = self.rootNode.world.oscillator_speed
             self.rootNode.set_oscillator_speed(0)
             self.rootNode.set_pause(True)
         else:
@@ -182,7 +185,7 @@ class GML_App_2D(App):
         if (self.sonic_enabled == True):
             self.sonic_thread = Thread(target=self.thread_sonic_player, args=(1,))
             self.sonic_thread.start()
-            self.sonic = Sonic_GML()
+            self.sonic = Sonic_GML(self.rootNode.world)
 
         #Clock.schedule_interval(self.update, 0.01 / 60.0)
         #self.update(0.0)
@@ -224,7 +227,7 @@ class GML_App_2D(App):
             self.pause=not(self.pause)
             self.rootNode.set_pause(self.pause)
             if(self.pause==True):
-                self.running_speed=self.rootNode.oscillator_speed
+                self.running_speed=self.rootNode.world.oscillator_speed
                 self.rootNode.set_oscillator_speed(0)
             else:
                 self.rootNode.set_oscillator_speed(self.running_speed)
@@ -278,15 +281,15 @@ class GML_App_2D(App):
         elif keycode[1] == '8':
             self.tempo -= 1
         elif keycode[1] == 'k':
-            GMLBaseClass.pos_scale += 0.1
+            self.rootNode.world.pos_scale += 0.1
             self.redraw = True
         elif keycode[1] == 'm':
-            GMLBaseClass.pos_scale -= 0.1
+            self.rootNode.world.pos_scale -= 0.1
             self.redraw = True
         elif keycode[1] == 'o':
-            GMLBaseClass.pos_scale += 0.1
+            self.rootNode.world.pos_scale += 0.1
         elif keycode[1] == 'p':
-            GMLBaseClass.pos_scale -= 0.1
+            self.rootNode.world.pos_scale -= 0.1
 
         GML_graphics_helper().key_pressed(keycode[1])
         if(self.key_callback is not None):
@@ -312,9 +315,6 @@ class GML_App_2D(App):
         if(GML_graphics_helper().update_help_state()==False):
             return self.button1
 
-        # Clear on subsequent for replotting of updated GML trees
-        self.button1.canvas.clear()
-
         if(self.redraw == True):
             self.rootNode = self.populate_function(self.demo_select)
             self.rootNode.print_tree()
@@ -322,9 +322,19 @@ class GML_App_2D(App):
             print("GML geometry text representation: ",
                   self.rootNode.gml_to_text(100))
             self.redraw = False
+            self.canvas_topology = -1
+
+        # Only clear the persistent node sprites when the tree changes
+        if(self.canvas_topology != self.rootNode.world.topology_version):
+            GML_graphics_helper().reset_layers()
+            self.canvas_topology = self.rootNode.world.topology_version
+        GML_graphics_helper().begin_frame()
+        frame_canvas = GML_graphics_helper().canvas
 
         #Redraw the tree with phase rotations
-        self.rootNode.run1(20) #Animate the GML
+        #Advance the GML in fixed ticks and draw between the last two
+        alpha = self.sim_clock.advance(dt, lambda: self.rootNode.step_phases(20))
+        self.rootNode.render1(20, alpha)
 
         if(self.sonic_enabled==True):
             self.sonic.circle_notes()
@@ -355,15 +365,17 @@ class GML_App_2D(App):
 
         if(self.text1==None):
             self.text1=FreeDrawText()
-        self.text1.drawText(self.button1.canvas,40,70,"Defined Clocks: "+str(self.rootNode.oscillators()),24)
-        self.text1.drawText(self.button1.canvas,40,100,"Dimensions: "+str(self.rootNode.dimensions()),24)
+        self.text1.drawText(frame_canvas,40,70,"Defined Clocks: "+str(self.rootNode.oscillators()),24)
+        self.text1.drawText(frame_canvas,40,100,"Dimensions: "+str(self.rootNode.dimensions()),24)
         if (self.sonic_enabled == True):
-            self.text1.drawText(self.button1.canvas, 40, 450,"Tempo: "+str(int(self.tempo)), 18)
-            self.sonic.drawText(self.text1, self.button1.canvas, 470, x=40)
+            self.text1.drawText(frame_canvas, 40, 450,"Tempo: "+str(int(self.tempo)), 18)
+            self.sonic.drawText(self.text1, frame_canvas, 470, x=40)
 
         if(self.runtime_callback is not None):
             self.runtime_callback(self.rootNode)
 
+        GML_graphics_helper().end_frame()
+
         return self.button1
 
     def thread_sonic_player(self, name):
@@ -29,6 +29,7 @@ from time import sleep
 
 from Sonic_GML import *
 from GML_3D import *
+from GML_Clock import GML_Clock
 
 
 class GML_App_3D():
@@ -41,6 +42,7 @@ class GML_App_3D():
         self.display=(800,800)
         self.screen = pygame.display.set_mode(self.display, DOUBLEBUF | OPENGL |RESIZABLE)
         self.fpsClock = pygame.time.Clock()
+        self.sim_clock = GML_Clock(self.FPS) # Simulation ticks per second
         self.sysfont = pygame.font.get_default_font()
         #print('system font :', self.sysfont)
         self.plan_mode=plan_mode
@@ -87,7 +89,7 @@ class GML_App_3D():
 
     def initial_rotation_speed(self,speed):
         if(speed==0):
-            self.running_speed = self.rootNode.oscillator_speed
+            self.running_speed = self.rootNode.world.oscillator_speed
             self.rootNode.set_oscillator_speed(0)
             self.rootNode.set_pause(True)
         else:
@@ -144,11 +146,11 @@ class GML_App_3D():
         if (self.sonic_enabled == True):
             self.sonic_thread = Thread(target=self.thread_sonic_player, args=(1,))
             self.sonic_thread.start()
-            self.sonic = Sonic_GML()
+            self.sonic = Sonic_GML(self.rootNode.world)
 
         done = False
         while not done:
-            self.fpsClock.tick(self.FPS)
+            dt = self.fpsClock.tick(self.FPS)/1000.0
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     done = True
@@ -198,7 +200,7 @@ class GML_App_3D():
                 if((pygame.time.get_ticks()-mode_change)>80):
                     self.pause = not (self.pause)
                     if (self.pause == True):
-                        self.running_speed = self.rootNode.oscillator_speed
+                        self.running_speed = self.rootNode.world.oscillator_speed
                         self.rootNode.set_oscillator_speed(0)
                     else:
                         self.rootNode.set_oscillator_speed(self.running_speed)
@@ -300,7 +302,10 @@ class GML_App_3D():
                 self.rootNode.gml_line_plot(100, polygons=False, plot_mode=1)  #Points
 
 
-            self.rootNode.run1(100) #Animate the GML
+            #Advance the GML in fixed ticks and draw between the last two
+            alpha = self.sim_clock.advance(dt, lambda: self.rootNode.step_phases(100))
+            self.rootNode.render1(100, alpha)
+            GML_graphics_helper().flush() #Draw the retained lines and polygons
 
             GML_graphics_helper().drawText(10, 10, "Defined Clocks: " + str(self.rootNode.oscillators()), 16)
             GML_graphics_helper().drawText(10, 30, "Dimensions: " + str(self.rootNode.dimensions()), 16)
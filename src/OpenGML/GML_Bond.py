@@ -67,4 +67,134 @@ class GML_Bond:
 
         # Apply the force to each singularity
         self.singularity1.apply_force(force1, dt)
-        self.singularity2.apply_force(force2, dt)
\ No newline at end of file
+        self.singularity2.apply_force(force2, dt)
+
+
+def wrapped_phase_differences(phase1, phase2, phase_offset):
+    """
+    Vectorised form of the phase difference in GML_Bond.update. phase1 is
+    raised by whole turns until it is at least 180 degrees above phase2.
+    :return: array of phase differences (phase1 - phase2 + offset - 360)
+    """
+    diff = phase1 - phase2
+    turns = np.maximum(np.ceil((180 - diff) / 360), 0)
+    return diff + turns * 360 + phase_offset - 360
+
+class BondNetwork:
+    """
+    A set of bonds updated together. The bond endpoints are held as index
+    arrays into a list of singularities and the coupling, phase offset and
+    frequency lock of each bond as arrays, so the forces of every bond are
+    found with a few array operations rather than a Python loop.
+    All bonds see the phases from the start of the update (a Jacobi step),
+    whereas calling GML_Bond.update in turn lets each bond see the phases
+    moved by the bonds before it.
+    """
+    def __init__(self, bonds=None):
+        """
+        :param bonds: Optional list of GML_Bond objects to add
+        """
+        self.singularities = []
+        self.index_of = {}
+        self.bond1 = []
+        self.bond2 = []
+        self.coupling_list = []
+        self.phase_offset_list = []
+        self.lock_list = []
+        self.compiled = False
+        if (bonds is not None):
+            for bond in bonds:
+                self.add(bond)
+
+    def __len__(self):
+        return len(self.bond1)
+
+    def singularity_index(self, singularity):
+        """
+        Index of a singularity in the network, adding it if new
+        """
+        key = id(singularity)
+        index = self.index_of.get(key)
+        if (index is None):
+            index = len(self.singularities)
+            self.index_of[key] = index
+            self.singularities.append(singularity)
+        return index
+
+    def add_bond(self, singularity1, singularity2, phase_offset=0.0, coupling=0.1, lock_frequency=False):
+        """
+        Add a bond between two singularities, with the same parameters as GML_Bond
+        :return: Index of the bond
+        """
+        self.bond1.append(self.singularity_index(singularity1))
+        self.bond2.append(self.singularity_index(singularity2))
+        self.phase_offset_list.append(phase_offset)
+        self.coupling_list.append(coupling)
+        self.lock_list.append(lock_frequency)
+        self.compiled = False
+        return len(self.bond1) - 1
+
+    def add(self, bond):
+        """
+        Add an existing GML_Bond
+        :return: Index of the bond
+        """
+        return self.add_bond(bond.singularity1, bond.singularity2, bond.phase_offset, bond.coupling, bond.lock_frequency)
+
+    def compile(self):
+        """
+        Pack the bond parameters into arrays
+        """
+        self.endpoint1 = np.array(self.bond1, dtype=np.int64)
+        self.endpoint2 = np.array(self.bond2, dtype=np.int64)
+        self.coupling = np.array(self.coupling_list, dtype=np.float64)
+        self.phase_offset = np.array(self.phase_offset_list, dtype=np.float64)
+        self.lock_frequency = np.array(self.lock_list, dtype=bool)
+        self.any_locked = bool(np.any(self.lock_frequency))
+        self.compiled = True
+
+    def phases(self):
+        """
+        Current phase[0] of every singularity in the network
+        """
+        return np.array([singularity.phase[0] for singularity in self.singularities], dtype=np.float64)
+
+    def frequencies(self):
+        """
+        Current freq[0] of every singularity in the network
+        """
+        return np.array([singularity.freq[0] for singularity in self.singularities], dtype=np.float64)
+
+    def forces(self, phase=None, freq=None):
+        """
+        Net phase offset on each singularity from all of the bonds
+        :param phase: Phases to use, by default the current ones
+        :param freq: Frequencies to use, by default the current ones
+        :return: array with one total force per singularity
+        """
+        if (self.compiled == False):
+            self.compile()
+        if (phase is None):
+            phase = self.phases()
+        phase_diff = wrapped_phase_differences(phase[self.endpoint1], phase[self.endpoint2], self.phase_offset)
+        if (self.any_locked == True):
+            if (freq is None):
+                freq = self.frequencies()
+            freq_diff = freq[self.endpoint1] - freq[self.endpoint2]
+            phase_diff += np.where(self.lock_frequency, freq_diff * 360, 0)
+        coupled_phase = self.coupling * phase_diff
+        net = np.zeros(len(self.singularities), dtype=np.float64)
+        np.add.at(net, self.endpoint1, coupled_phase)
+        np.add.at(net, self.endpoint2, -coupled_phase)
+        return net
+
+    def update(self, dt=0):
+        """
+        Apply every bond once, as calling GML_Bond.update on each bond
+        but with one apply_force call per singularity
+        """
+        if (len(self.bond1) == 0):
+            return
+        net = self.forces()
+        for index in np.flatnonzero(net).tolist():
+            self.singularities[index].apply_force(float(net[index]), dt)
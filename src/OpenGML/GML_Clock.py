@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created By  : Martin Timms
+# Created Date: 18th October 2026
+# License: BSD-3-Clause License
+# Organisation: OpenGML.org/
+# Project: https://github.com/Electro-resonance/OpenGML
+# Description: Fixed timestep simulation clock
+# Real elapsed time is collected in an accumulator and the simulation is
+# advanced in whole ticks of a fixed length, so phases evolve at the same
+# rate in real time whatever the frame rate or render cost. The fraction
+# of a tick left over is returned so the renderer can interpolate between
+# the last two simulation states.
+# =============================================================================
+
+
+class GML_Clock(object):
+    """
+    Accumulator based fixed timestep clock
+    """
+
+    def __init__(self, tick_rate=50, max_substeps=16):
+        """
+        :param tick_rate: Simulation ticks per second. One tick advances
+        each phase by freq*oscillator_speed as one run1 call does.
+        :param max_substeps: Most ticks run for one advance call. If the
+        simulation cannot keep up the extra time is dropped rather than
+        letting the backlog grow. None removes the limit.
+        """
+        self.max_substeps = max_substeps
+        self.set_tick_rate(tick_rate)
+        self.reset()
+
+    def set_tick_rate(self, tick_rate):
+        """
+        Change the number of simulation ticks per second
+        """
+        self.tick_rate = tick_rate
+        self.tick_period = 1.0/tick_rate
+
+    def reset(self):
+        """
+        Restart the clock from tick zero with an empty accumulator
+        """
+        self.accumulator = 0.0
+        self.ticks = 0
+        self.substeps = 0
+        self.dropped_time = 0.0
+
+    def time(self):
+        """
+        Simulated time in seconds
+        """
+        return self.ticks*self.tick_period
+
+    def alpha(self):
+        """
+        Fraction of a tick accumulated since the last one (0 to 1)
+        """
+        return self.accumulator/self.tick_period
+
+    def advance(self, dt, step_function):
+        """
+        Add dt seconds of real time and run step_function once for each
+        whole tick that has elapsed
+        :param dt: Elapsed real time in seconds since the previous call
+        :param step_function: Called with no arguments to advance one tick
+        :return: Interpolation factor between the previous and current tick
+        """
+        if (dt > 0):
+            self.accumulator += dt
+        self.substeps = 0
+        while (self.accumulator >= self.tick_period):
+            if (self.max_substeps is not None and self.substeps >= self.max_substeps):
+                dropped = self.accumulator-(self.accumulator % self.tick_period)
+                self.dropped_time += dropped
+                self.accumulator -= dropped
+                break
+            step_function()
+            self.accumulator -= self.tick_period
+            self.ticks += 1
+            self.substeps += 1
+        return self.alpha()
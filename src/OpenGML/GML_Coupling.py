@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created By  : Martin Timms
+# Created Date: 18th October 2026
+# License: BSD-3-Clause License
+# Organisation: OpenGML.org/
+# Project: https://github.com/Electro-resonance/OpenGML
+# Description: Sparse coupling matrices for large bond graphs
+# The bonds between singularities are held as a symmetric scipy.sparse CSR
+# matrix K, where K[i, j] is the coupling strength between singularity i
+# and singularity j. The phase velocity added by the bonds
+#   sum_j K[i, j] sin(theta_j - theta_i)
+#     = cos(theta_i) (K sin(theta))_i - sin(theta_i) (K cos(theta))_i
+# is then two sparse matrix vector products, so memory and time grow with
+# the number of bonds rather than the square of the number of singularities.
+# Builders are provided for random (Erdos-Renyi), prime frequency ratio and
+# nearest frequency topologies. None of them loop over every pair.
+# =============================================================================
+
+import math
+import numpy as np
+import scipy.sparse
+from prime_functions import generate_primes
+
+
+def random_pairs(count, probability, rng):
+    """
+    Sample each of the count*(count-1)/2 pairs i < j independently with the
+    given probability. The gaps between the chosen pairs are geometric, so
+    only the chosen pairs are ever generated.
+    :param rng: numpy Generator
+    :return: [rows, cols] index arrays with rows < cols
+    """
+    total = count*(count-1)//2
+    if (total == 0 or probability <= 0):
+        return [np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)]
+    if (probability >= 1):
+        linear = np.arange(total, dtype=np.int64)
+    else:
+        chunks = []
+        position = -1
+        expected = int(total*probability+5*math.sqrt(total*probability)+16)
+        while (position < total):
+            gaps = rng.geometric(probability, size=expected)
+            linear = position+np.cumsum(gaps)
+            chunks.append(linear)
+            position = int(linear[-1])
+        linear = np.concatenate(chunks)
+        linear = linear[linear < total]
+    # Map the linear index of the strict upper triangle back to (row, col)
+    n = count
+    rows = n-2-np.floor(np.sqrt(-8.0*linear+4.0*n*(n-1)-7)/2.0-0.5).astype(np.int64)
+    cols = linear+rows+1-n*(n-1)//2+(n-rows)*(n-rows-1)//2
+    return [rows, cols]
+
+def symmetric_matrix(count, rows, cols, coupling):
+    """
+    Symmetric CSR matrix with coupling at (rows, cols) and (cols, rows).
+    A pair given more than once is bonded once, with its first coupling.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    coupling = np.broadcast_to(np.asarray(coupling, dtype=np.float64), rows.shape)
+    low = np.minimum(rows, cols)
+    high = np.maximum(rows, cols)
+    [keys, first] = np.unique(low*count+high, return_index=True)
+    first = first[low[first] != high[first]]
+    low = low[first]
+    high = high[first]
+    data = coupling[first]
+    return scipy.sparse.csr_matrix((np.concatenate([data, data]),
+                                    (np.concatenate([low, high]), np.concatenate([high, low]))),
+                                   shape=(count, count))
+
+def frequencies(singularities):
+    """
+    freq[0] of each singularity as an array
+    """
+    return np.array([singularity.freq[0] for singularity in singularities], dtype=np.float64)
+
+def erdos_renyi(singularities, probability, coupling=0.1, seed=None):
+    """
+    Bond each pair of singularities with the given probability
+    :param seed: Seed or numpy Generator for reproducible graphs
+    :return: CouplingMatrix
+    """
+    rng = np.random.default_rng(seed)
+    [rows, cols] = random_pairs(len(singularities), probability, rng)
+    return CouplingMatrix(singularities, symmetric_matrix(len(singularities), rows, cols, coupling))
+
+def prime_ratio(singularities, coupling=0.1, max_prime=7, tolerance=1e-3):
+    """
+    Bond pairs of singularities whose frequencies are in the ratio p/q where
+    p and q are 1 or primes up to max_prime, e.g. 2/1, 3/2, 7/5. Only
+    frequencies of the same sign (the same direction of rotation) are bonded.
+    :param tolerance: Relative tolerance of the ratio
+    :return: CouplingMatrix
+    """
+    freq = frequencies(singularities)
+    order = np.argsort(freq, kind="stable")
+    sorted_freq = freq[order]
+    factors = [1]+generate_primes(max_prime+1)
+    ratios = sorted(set([p/q for p in factors for q in factors if p > q]))
+    row_chunks = []
+    col_chunks = []
+    for ratio in ratios:
+        # For each singularity find those with frequency ratio times its own.
+        # The window bounds swap over for negative frequencies.
+        target = freq*ratio
+        low = np.searchsorted(sorted_freq, np.minimum(target*(1-tolerance), target*(1+tolerance)), side="left")
+        high = np.searchsorted(sorted_freq, np.maximum(target*(1-tolerance), target*(1+tolerance)), side="right")
+        counts = high-low
+        if (np.sum(counts) == 0):
+            continue
+        rows = np.repeat(np.arange(len(freq)), counts)
+        starts = np.repeat(low-np.cumsum(counts)+counts, counts)
+        cols = order[starts+np.arange(len(rows))]
+        row_chunks.append(rows)
+        col_chunks.append(cols)
+    if (len(row_chunks) == 0):
+        return CouplingMatrix(singularities, scipy.sparse.csr_matrix((len(freq), len(freq))))
+    rows = np.concatenate(row_chunks)
+    cols = np.concatenate(col_chunks)
+    return CouplingMatrix(singularities, symmetric_matrix(len(freq), rows, cols, coupling))
+
+def nearest_frequency(singularities, neighbours=2, coupling=0.1):
+    """
+    Bond each singularity to the neighbours closest to it in frequency on
+    either side, a chain of the frequency spectrum
+    :return: CouplingMatrix
+    """
+    order = np.argsort(frequencies(singularities), kind="stable")
+    row_chunks = []
+    col_chunks = []
+    for offset in range(1, neighbours+1):
+        row_chunks.append(order[:-offset])
+        col_chunks.append(order[offset:])
+    count = len(singularities)
+    if (count == 0):
+        return CouplingMatrix(singularities, scipy.sparse.csr_matrix((0, 0)))
+    return CouplingMatrix(singularities, symmetric_matrix(count, np.concatenate(row_chunks),
+                                                          np.concatenate(col_chunks), coupling))
+
+def network_matrix(network):
+    """
+    CouplingMatrix of the bonds of a GML_Bond.BondNetwork. Phase offsets and
+    frequency locks are not represented in the matrix.
+    """
+    if (network.compiled == False):
+        network.compile()
+    count = len(network.singularities)
+    if (len(network) == 0):
+        return CouplingMatrix(network.singularities, scipy.sparse.csr_matrix((count, count)))
+    return CouplingMatrix(network.singularities, symmetric_matrix(count, network.endpoint1, network.endpoint2,
+                                                                  network.coupling))
+
+
+class CouplingMatrix(object):
+    """
+    Sparse symmetric coupling between a list of singularities
+    """
+
+    def __init__(self, singularities, matrix):
+        """
+        :param singularities: List of the singularities, row i of the matrix
+        is singularities[i]
+        :param matrix: Square scipy.sparse matrix of coupling strengths
+        """
+        if (matrix.shape != (len(singularities), len(singularities))):
+            raise ValueError("Coupling matrix of shape %s does not match %d singularities" %
+                             (str(matrix.shape), len(singularities)))
+        self.singularities = singularities
+        self.matrix = scipy.sparse.csr_matrix(matrix)
+
+    def __len__(self):
+        """
+        Number of bonds (each pair counted once)
+        """
+        return (self.matrix.nnz-int(np.count_nonzero(self.matrix.diagonal())))//2
+
+    def count(self):
+        """
+        Number of singularities
+        """
+        return len(self.singularities)
+
+    def degrees(self):
+        """
+        Number of bonds of each singularity
+        """
+        return np.diff(self.matrix.indptr)
+
+    def rates(self, theta):
+        """
+        Phase velocity sum_j K[i, j] sin(theta_j - theta_i) of each singularity
+        :param theta: array of phases in radians
+        :return: array of phase velocities in radians per tick
+        """
+        sin_theta = np.sin(theta)
+        cos_theta = np.cos(theta)
+        return cos_theta*(self.matrix @ sin_theta)-sin_theta*(self.matrix @ cos_theta)
+
+    def phases(self):
+        """
+        Current phase[0] of every singularity in radians
+        """
+        return np.radians(np.array([singularity.phase[0] for singularity in self.singularities], dtype=np.float64))
+
+    def update(self, dt=1.0):
+        """
+        Nudge the phase of each singularity by its coupling rate over dt ticks
+        """
+        offsets = np.degrees(self.rates(self.phases()))*dt
+        for index in np.flatnonzero(offsets).tolist():
+            self.singularities[index].apply_phase_offset(float(offsets[index]), None)
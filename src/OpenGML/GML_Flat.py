@@ -0,0 +1,431 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created By  : Martin Timms
+# Created Date: 18th October 2026
+# License: BSD-3-Clause License
+# Organisation: OpenGML.org/
+# Project: https://github.com/Electro-resonance/OpenGML
+# Description: Flat (structure of arrays) engine for GML trees
+# The whole tree is packed into contiguous numpy arrays in topological
+# (level) order so that phases and positions of every singularity can be
+# advanced with a handful of vectorised passes instead of a recursive walk.
+# The original GML node objects remain usable as thin views onto the arrays.
+# =============================================================================
+
+import numpy as np
+
+
+def spherical_offsets(theta, phi, radius):
+    """
+    Batched equivalent of the GML_3D.calc_mypos offset
+    :param theta: array of first axis phases in degrees
+    :param phi: array of second axis phases in degrees
+    :param radius: array of orbit radii
+    :return: array of [z,x,y] offsets with a trailing axis of length 3
+    """
+    theta = np.radians(theta)
+    phi = np.radians(phi)
+    sin_theta = -np.sin(theta)
+    offsets = np.empty(np.shape(theta)+(3,), dtype=np.float64)
+    offsets[..., 0] = radius*np.cos(theta)
+    offsets[..., 1] = radius*sin_theta*np.cos(phi)
+    offsets[..., 2] = radius*sin_theta*np.sin(phi)
+    return offsets
+
+def wrap_phases(phase):
+    """
+    Closed form of the wrapping applied by increment_phase, which subtracts
+    360 once a phase passes 360 (or adds 360 below -360) so phases stay
+    within -360 to 360 keeping the sign of their direction of travel
+    """
+    phase = np.array(phase, dtype=np.float64)
+    over = phase > 360
+    phase[over] -= 360*np.ceil((phase[over]-360)/360)
+    under = phase < -360
+    phase[under] += 360*np.ceil((-360-phase[under])/360)
+    return phase
+
+
+class GML_Flat(object):
+    """
+    Structure of arrays engine for a GML tree of oscillators
+    """
+
+    def __init__(self, root_node, bind_views=True):
+        """
+        Compile the tree below root_node into flat arrays
+        :param root_node: The node at the top of the tree (normally the Bindu)
+        :param bind_views: If True the node phase, freq and orbit_radius
+        lists are replaced with views onto the engine arrays
+        """
+        self.root = root_node
+        self.bind_views = bind_views
+        self.compile()
+
+    def compile(self):
+        """
+        Walk the tree once in level order and pack the singularity
+        parameters into contiguous arrays
+        """
+        nodes = [self.root]
+        parent = [-1]
+        level_starts = [0]
+        level_start = 0
+        while (level_start < len(nodes)):
+            level_end = len(nodes)
+            for index in range(level_start, level_end):
+                for child_node in nodes[index].children1:
+                    if (child_node != None):
+                        nodes.append(child_node)
+                        parent.append(index)
+            level_starts.append(level_end)
+            level_start = level_end
+        count = len(nodes)
+
+        self.nodes = nodes
+        self.parent = np.array(parent, dtype=np.int64)
+        self.level_starts = level_starts
+        self.levels = len(level_starts)-1
+        self.depth = np.zeros(count, dtype=np.int64)
+        for level in range(self.levels):
+            self.depth[level_starts[level]:level_starts[level+1]] = level
+
+        self.phase = np.array([[node.phase[0], node.phase[1]] for node in nodes], dtype=np.float64)
+        self.start_phase = np.array([[node.start_phase[0], node.start_phase[1]] for node in nodes], dtype=np.float64)
+        self.phase_step = np.array([[node.phase_step[0], node.phase_step[1]] for node in nodes], dtype=np.float64)
+        self.freq = np.array([[node.freq[0], node.freq[1]] for node in nodes], dtype=np.float64)
+        self.orbit_radius = np.array([[node.orbit_radius[0], node.orbit_radius[1]] for node in nodes], dtype=np.float64)
+        self.oscillator_speed_node = np.array([node.oscillator_speed_node for node in nodes], dtype=np.float64)
+
+        self.is_spiral = np.array([node.is_spiral for node in nodes], dtype=bool)
+        self.spiral_rate = np.array([node.spiral_rate for node in nodes], dtype=np.float64)
+        self.spiral_mode = np.array([node.spiral_mode for node in nodes], dtype=np.int64)
+        self.spiral_rotates = np.array([node.spiral_rotates for node in nodes], dtype=np.float64)
+        self.is_pendulum = np.array([node.is_pendulum for node in nodes], dtype=bool)
+        self.is_angle = np.array([node.is_angle for node in nodes], dtype=bool)
+        self.angle_offset = np.array([node.angle_offset for node in nodes], dtype=np.float64)
+        self.is_3d = np.array([node.mode_3d for node in nodes], dtype=bool)
+        self.any_3d = bool(np.any(self.is_3d))
+        # 3D singularities are not scaled by pos_scale (spirals use the 2D calculation)
+        self.spherical = self.is_3d & ~self.is_spiral
+
+        self.pos = np.zeros((count, 3), dtype=np.float64)
+        self.mypos = np.zeros((count, 3), dtype=np.float64)
+        self.mypos_views = list(self.mypos)
+        self.pos_views = list(self.pos)
+        self.draw_order = self.preorder()
+        self.topology_version = self.root.world.topology_version
+
+        if (self.bind_views == True):
+            for index in range(count):
+                node = nodes[index]
+                node.phase = self.phase[index]
+                node.freq = self.freq[index]
+                node.orbit_radius = self.orbit_radius[index]
+
+    def read_node_state(self):
+        """
+        Copy the phases and orbit radii used by update_positions from the
+        nodes into the arrays of an engine whose views are not bound to them
+        """
+        if (self.bind_views == True):
+            return
+        nodes = self.nodes
+        self.phase[:, 0] = [node.phase[0] for node in nodes]
+        self.phase[:, 1] = [node.phase[1] for node in nodes]
+        self.orbit_radius[:, 0] = [node.orbit_radius[0] for node in nodes]
+
+    def release(self):
+        """
+        Detach the nodes from the engine arrays, giving each node
+        back its own plain lists
+        """
+        if (self.bind_views == True):
+            for node in self.nodes:
+                node.phase = node.phase.tolist()
+                node.freq = node.freq.tolist()
+                node.orbit_radius = node.orbit_radius.tolist()
+                if (isinstance(node.mypos, np.ndarray)):
+                    node.mypos = node.mypos.tolist()
+                if (isinstance(getattr(node, "pos", None), np.ndarray)):
+                    node.pos = node.pos.tolist()
+        self.bind_views = False
+
+    def preorder(self):
+        """
+        Return the node indexes in the same depth first order used
+        by the recursive run1 so that drawing overlaps are unchanged
+        """
+        index_of = {}
+        for index in range(len(self.nodes)):
+            index_of[id(self.nodes[index])] = index
+        order = []
+        stack = [0]
+        while (len(stack) > 0):
+            index = stack.pop()
+            order.append(index)
+            children = [index_of[id(child_node)] for child_node in self.nodes[index].children1 if child_node != None]
+            children.reverse()
+            stack.extend(children)
+        return np.array(order, dtype=np.int64)
+
+    def check_topology(self):
+        """
+        Recompile if singularities were added or removed since the last compile
+        """
+        if (self.topology_version != self.root.world.topology_version):
+            self.compile()
+
+    def limit_count(self, limit):
+        """
+        Number of nodes (a prefix of the level ordering) reached by a
+        recursive walk with the given limit. The root is always included.
+        """
+        levels = min(max(limit, 1), self.levels)
+        return self.level_starts[levels]
+
+    def phase_rates(self, count):
+        """
+        Signed phase change per tick of the first count nodes for both axes,
+        respecting reverse, the global and the per node oscillator speed.
+        Only 3D singularities advance the second axis.
+        """
+        rate = self.freq[:count] * (self.root.world.oscillator_speed * self.oscillator_speed_node[:count, None])
+        rate[:, 1] *= self.is_3d[:count]
+        if (self.root.world.reverse == True):
+            rate = -rate
+        return rate
+
+    def increment_phases(self, count):
+        """
+        Vectorised equivalent of increment_phase for the first count nodes.
+        3D singularities advance both phase axes.
+        """
+        if (self.any_3d == True):
+            dims = 2
+        else:
+            dims = 1
+        phase = self.phase[:count, :dims]
+        delta = self.phase_rates(count)[:, :dims]
+        phase += delta
+        self.phase_step[:count, :dims] = delta
+        phase[phase > 360] -= 360
+        phase[phase < -360] += 360
+
+    def planar_offsets(self, count):
+        """
+        Vectorised equivalent of the 2D calc_mypos offset including the
+        spiral, linear, pendulum and angle variants
+        """
+        self.pos[:count] = self.planar_offset_values(self.phase[:count, 0], count)
+
+    def planar_offset_values(self, phase, count):
+        """
+        Planar offsets of the first count nodes for an array of phases
+        :param phase: array of first axis phases with a trailing axis of length count
+        :return: array of [x,y,z] offsets with a trailing axis of length 3
+        """
+        radius = self.orbit_radius[:count, 0]
+        is_spiral = self.is_spiral[:count]
+        spiral_mode = self.spiral_mode[:count]
+
+        angle = np.where(is_spiral, phase*self.spiral_rate[:count], phase)
+        amount = phase/360
+        mode1 = is_spiral & (spiral_mode == 1)
+        amount = np.where(mode1, np.abs(phase/180-1), amount)
+        mode2 = is_spiral & (spiral_mode == 2)
+        amount = np.where(mode2, phase/180-1, amount)
+        angle = np.where(mode2 & (phase > 180), -angle, angle)
+        mode3 = is_spiral & (spiral_mode == 3)
+        ph2 = np.where(phase >= 180, (360-phase)*2, phase*2)
+        amount = np.where(mode3, ph2/180-1, amount)
+        angle = np.where(mode3 & (ph2 > 180), -angle, angle)
+        amount = np.where(self.is_pendulum[:count], 1.0, amount)
+        angle = np.where(is_spiral, angle+phase*self.spiral_rotates[:count], angle)
+        angle = np.where(is_spiral & self.is_angle[:count] & (amount > 0), angle+self.angle_offset[:count], angle)
+        amount = np.where(is_spiral, amount, 1.0)
+
+        radians = np.radians(angle)
+        values = np.zeros(np.shape(phase)+(3,), dtype=np.float64)
+        values[..., 0] = radius*amount*np.cos(radians)
+        values[..., 1] = radius*amount*np.sin(radians)
+        return values
+
+    def offsets(self, count):
+        """
+        Calculate the parent relative offsets of the first count nodes,
+        using the spherical kernel for 3D singularities
+        """
+        self.planar_offsets(count)
+        if (self.any_3d == True):
+            spherical = self.spherical[:count]
+            self.pos[:count][spherical] = spherical_offsets(self.phase[:count, 0][spherical],
+                                                            self.phase[:count, 1][spherical],
+                                                            self.orbit_radius[:count, 0][spherical])
+
+    def offset_values(self, phase, count):
+        """
+        Parent relative offsets of the first count nodes for an array of phases
+        :param phase: array of [phase0, phase1] with shape (..., count, 2)
+        :return: array of offsets with shape (..., count, 3)
+        """
+        values = self.planar_offset_values(phase[..., 0], count)
+        if (self.any_3d == True):
+            spherical = self.spherical[:count]
+            values[..., spherical, :] = spherical_offsets(phase[..., spherical, 0], phase[..., spherical, 1],
+                                                          self.orbit_radius[:count, 0][spherical])
+        return values
+
+    def accumulate_positions(self, count):
+        """
+        Add each offset onto the position of its parent one level at a time
+        """
+        self.mypos[:count] = self.position_values(self.pos[:count], count)
+
+    def position_values(self, offsets, count):
+        """
+        Absolute positions of the first count nodes from their offsets
+        :param offsets: array of offsets with shape (..., count, 3)
+        :return: array of positions with the same shape
+        """
+        scaled = offsets/self.root.world.pos_scale
+        if (self.any_3d == True):
+            spherical = self.spherical[:count]
+            scaled[..., spherical, :] = offsets[..., spherical, :]
+        origin = np.array([self.root.world.screen_width/2, self.root.world.screen_height/2, 0])
+        positions = np.empty_like(scaled)
+        positions[..., 0, :] = origin+scaled[..., 0, :]
+        for level in range(1, self.levels):
+            start = self.level_starts[level]
+            if (start >= count):
+                break
+            end = min(self.level_starts[level+1], count)
+            positions[..., start:end, :] = positions[..., self.parent[start:end], :]+scaled[..., start:end, :]
+        return positions
+
+    def phases_at(self, times, count, from_start=False):
+        """
+        Closed form phases of the first count nodes after a number of ticks
+        :param times: scalar or array of tick counts (fractions allowed)
+        :param from_start: If True count from the start phases (the state
+        after reset_phases) otherwise from the current phases
+        :return: array of phases with shape times.shape+(count, 2)
+        """
+        if (from_start == True):
+            phase = self.start_phase[:count]
+        else:
+            phase = self.phase[:count]
+        times = np.asarray(times, dtype=np.float64)
+        if (self.root.world.pause == True):
+            return np.broadcast_to(phase, times.shape+phase.shape).copy()
+        return wrap_phases(phase+times[..., None, None]*self.phase_rates(count))
+
+    def seek(self, ticks, limit=100, from_start=False):
+        """
+        Jump the phases of every node within limit forward by a number of
+        ticks without stepping through them
+        """
+        self.check_topology()
+        count = self.limit_count(limit)
+        self.phase[:count] = self.phases_at(ticks, count, from_start)
+        self.phase_step[:count] = 0
+        return count
+
+    def positions_at(self, times, limit=100, from_start=False):
+        """
+        Evaluate the positions of every node within limit at one or many
+        tick counts without stepping the simulation
+        :return: [phases, positions] with shapes times.shape+(count, 2) and
+        times.shape+(count, 3), nodes in the engine (level) order
+        """
+        self.check_topology()
+        count = self.limit_count(limit)
+        phases = self.phases_at(times, count, from_start)
+        return [phases, self.position_values(self.offset_values(phases, count), count)]
+
+    def update_positions(self, limit=100):
+        """
+        Recalculate the positions of every node within limit without
+        advancing any phases
+        """
+        self.check_topology()
+        count = self.limit_count(limit)
+        self.offsets(count)
+        self.accumulate_positions(count)
+        return count
+
+    def write_positions(self, count):
+        """
+        Point the mypos and pos of the first count nodes at the engine arrays
+        """
+        for index in range(count):
+            node = self.nodes[index]
+            node.mypos = self.mypos_views[index]
+            node.pos = self.pos_views[index]
+
+    def step(self, limit=100):
+        """
+        Advance all phases one tick and recalculate positions
+        """
+        self.check_topology()
+        count = self.limit_count(limit)
+        if (self.root.world.pause != True):
+            self.increment_phases(count)
+        else:
+            self.phase_step[:count] = 0
+        self.offsets(count)
+        self.accumulate_positions(count)
+        return count
+
+    def max_child_radius(self):
+        """
+        Largest child orbit radius for every node (used by draw modes 7 and 8)
+        """
+        max_r = np.zeros(len(self.nodes), dtype=np.float64)
+        if (len(self.nodes) > 1):
+            np.maximum.at(max_r, self.parent[1:], self.orbit_radius[1:, 0])
+        return max_r
+
+    def run1(self, limit):
+        """
+        Flat equivalent of GML_2D.run1 advancing the tree one tick and
+        drawing every singularity in the original depth first order
+        """
+        count = self.step(limit)
+        self.draw(limit, count)
+
+    def render1(self, limit, alpha=1.0):
+        """
+        Flat equivalent of GML_2D.render1 drawing the tree with phases
+        interpolated alpha of the way from the previous tick to the current one
+        """
+        self.check_topology()
+        count = self.limit_count(limit)
+        current_phase = self.phase[:count].copy()
+        self.phase[:count] -= (1-alpha)*self.phase_step[:count]
+        self.offsets(count)
+        self.accumulate_positions(count)
+        self.draw(limit, count)
+        self.phase[:count] = current_phase
+
+    def draw(self, limit, count):
+        """
+        Draw every singularity within limit in the original depth first order
+        """
+        self.root.world.run_count += count
+        if (self.root.world.draw_mode >= 7):
+            max_r = self.max_child_radius()
+        else:
+            max_r = np.zeros(len(self.nodes), dtype=np.float64)
+        origin = [self.root.world.screen_width/2, self.root.world.screen_height/2, 0]
+        order = self.draw_order[self.depth[self.draw_order] < max(limit, 1)]
+        for index in order.tolist():
+            node = self.nodes[index]
+            node.mypos = self.mypos_views[index]
+            node.pos = self.pos_views[index]
+            parent_index = self.parent[index]
+            if (parent_index < 0):
+                node.mypos2 = origin
+            else:
+                node.mypos2 = self.mypos_views[parent_index]
+            node.draw1(max_r[index])
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created By  : Martin Timms
+# Created Date: 18th October 2026
+# License: BSD-3-Clause License
+# Organisation: OpenGML.org/
+# Project: https://github.com/Electro-resonance/OpenGML
+# Description: Kuramoto integrator for coupled GML oscillators
+# The phases of the singularities of a tree are integrated as a system of
+# coupled phase oscillators
+#   dtheta_i/dt = omega_i + K/N sum_j sin(theta_j - theta_i) + bond rates
+# where omega_i is the phase step a singularity takes each tick (time is
+# measured in ticks, one run1 call), K is an optional all to all (mean field)
+# coupling and the bonds of a GML_Bond.BondNetwork or the sparse matrix of a
+# GML_Coupling.CouplingMatrix add pairwise coupling. Bonds follow the same
+# law as BondNetwork.forces, k wrap(theta_1 - theta_2 + offset) (plus the
+# frequency lock term) added to the first singularity and taken from the
+# second each tick, so the integrator settles where network.update() does.
+# Euler, RK4 and Strang split schemes are provided together with an
+# adaptive RK4 step, and the Kuramoto order parameter r measures how far
+# the oscillators have locked (r near 1) without rendering anything.
+# =============================================================================
+
+import numpy as np
+from GML_Flat import wrap_phases
+from GML_Bond import wrapped_phase_differences
+
+SCHEMES = ["euler", "rk4", "split"]
+
+
+def order_parameter(theta):
+    """
+    Kuramoto order parameter of a set of phases
+    :param theta: array of phases in radians, the last axis is the oscillators
+    :return: [r, psi] the coherence (0 to 1) and the mean phase in radians
+    """
+    mean = np.mean(np.exp(1j*np.asarray(theta)), axis=-1)
+    return [np.abs(mean), np.angle(mean)]
+
+
+def oscillator_nodes(nodes, limit=100):
+    """
+    The singularities to integrate, leaving out Bindu points
+    :param nodes: The root of a tree, or a list of singularities
+    :param limit: Depth limit when a root node is given
+    """
+    if (hasattr(nodes, "iter_nodes")):
+        nodes = nodes.iter_nodes(limit)
+    return [node for node in nodes if getattr(node, "bindu", False) == False]
+
+def node_mapping(nodes, singularities):
+    """
+    Index in nodes of each of the singularities
+    """
+    index_of = {}
+    for index in range(len(nodes)):
+        index_of[id(nodes[index])] = index
+    mapping = np.zeros(len(singularities), dtype=np.int64)
+    for index in range(len(singularities)):
+        node_index = index_of.get(id(singularities[index]))
+        if (node_index is None):
+            raise ValueError("Coupled singularity %s is not one of the integrated oscillators" %
+                             singularities[index].name)
+        mapping[index] = node_index
+    return mapping
+
+
+class GML_Kuramoto(object):
+    """
+    Array based integrator of the phases of a GML tree
+    """
+
+    def __init__(self, nodes, network=None, coupling=0.0, scheme="rk4", limit=100, matrix=None):
+        """
+        :param nodes: The root of a tree, or a list of singularities. Bindu
+        points are left out as they do not oscillate.
+        :param network: Optional BondNetwork between the singularities
+        :param coupling: Mean field coupling K shared by every pair
+        :param scheme: "euler", "rk4" or "split" (Strang splitting)
+        :param limit: Depth limit when a root node is given
+        :param matrix: Optional CouplingMatrix between the singularities
+        """
+        self.nodes = oscillator_nodes(nodes, limit)
+        if (scheme not in SCHEMES):
+            raise ValueError("Unknown scheme %s, expected one of %s" % (scheme, ", ".join(SCHEMES)))
+        self.scheme = scheme
+        self.coupling = coupling
+        self.set_network(network)
+        self.set_matrix(matrix)
+        self.omega = self.natural_frequencies()
+        self.read_phases()
+
+    def set_network(self, network):
+        """
+        Use the bonds of a BondNetwork, mapping their singularities to the
+        oscillators of this integrator
+        """
+        self.bond1 = np.zeros(0, dtype=np.int64)
+        self.bond2 = np.zeros(0, dtype=np.int64)
+        self.bond_coupling = np.zeros(0, dtype=np.float64)
+        self.bond_offset = np.zeros(0, dtype=np.float64)
+        self.bond_lock = np.zeros(0, dtype=np.float64)
+        if (network is None or len(network) == 0):
+            return
+        mapping = node_mapping(self.nodes, network.singularities)
+        if (network.compiled == False):
+            network.compile()
+        self.bond1 = mapping[network.endpoint1]
+        self.bond2 = mapping[network.endpoint2]
+        self.bond_coupling = network.coupling.copy()
+        # Offsets and the frequency lock term are kept in degrees, as
+        # BondNetwork.forces uses them
+        self.bond_offset = network.phase_offset.copy()
+        self.bond_lock = np.zeros(len(network), dtype=np.float64)
+        if (network.any_locked == True):
+            freq = network.frequencies()
+            freq_diff = freq[network.endpoint1]-freq[network.endpoint2]
+            self.bond_lock = np.where(network.lock_frequency, freq_diff*360, 0)
+
+    def set_matrix(self, matrix):
+        """
+        Use the sparse coupling of a CouplingMatrix, mapping its rows to
+        the oscillators of this integrator
+        """
+        self.matrix = matrix
+        self.matrix_index = None
+        if (matrix is not None):
+            mapping = node_mapping(self.nodes, matrix.singularities)
+            if (len(mapping) != len(self.nodes) or np.any(mapping != np.arange(len(mapping)))):
+                self.matrix_index = mapping
+
+    def natural_frequencies(self):
+        """
+        Phase change per tick of each oscillator in radians, as increment_phase
+        applies it (respecting reverse and the oscillator speeds)
+        """
+        omega = np.array([node.freq[0]*node.world.oscillator_speed*node.oscillator_speed_node
+                          for node in self.nodes], dtype=np.float64)
+        if (len(self.nodes) > 0 and self.nodes[0].world.reverse == True):
+            omega = -omega
+        return np.radians(omega)
+
+    def read_phases(self):
+        """
+        Start from the current phases of the singularities
+        """
+        self.theta = np.radians(np.array([node.phase[0] for node in self.nodes], dtype=np.float64))
+        self.time = 0.0
+
+    def write_phases(self):
+        """
+        Copy the integrated phases back to the singularities so they can be drawn
+        """
+        phase = wrap_phases(np.degrees(self.theta))
+        for index in range(len(self.nodes)):
+            self.nodes[index].phase[0] = float(phase[index])
+            self.nodes[index].pos_dirty = True
+
+    def coupling_rates(self, theta):
+        """
+        Phase velocity added by the mean field and bond coupling
+        """
+        count = len(theta)
+        rates = np.zeros(count, dtype=np.float64)
+        if (self.coupling != 0 and count > 0):
+            # K/N sum_j sin(theta_j - theta_i) = K r sin(psi - theta_i)
+            [r, psi] = order_parameter(theta)
+            rates += self.coupling*r*np.sin(psi-theta)
+        if (len(self.bond1) > 0):
+            # wrapped_phase_differences expects phases within -360 to 360
+            phase = wrap_phases(np.degrees(theta))
+            phase_diff = wrapped_phase_differences(phase[self.bond1], phase[self.bond2], self.bond_offset)
+            force = np.radians(self.bond_coupling*(phase_diff+self.bond_lock))
+            rates += np.bincount(self.bond1, weights=force, minlength=count)
+            rates -= np.bincount(self.bond2, weights=force, minlength=count)
+        if (self.matrix is not None):
+            if (self.matrix_index is None):
+                rates += self.matrix.rates(theta)
+            else:
+                rates[self.matrix_index] += self.matrix.rates(theta[self.matrix_index])
+        return rates
+
+    def derivative(self, theta):
+        """
+        dtheta/dt of every oscillator
+        """
+        return self.omega+self.coupling_rates(theta)
+
+    def euler_step(self, theta, dt):
+        return theta+dt*self.derivative(theta)
+
+    def rk4_step(self, theta, dt):
+        k1 = self.derivative(theta)
+        k2 = self.derivative(theta+0.5*dt*k1)
+        k3 = self.derivative(theta+0.5*dt*k2)
+        k4 = self.derivative(theta+dt*k3)
+        return theta+dt/6.0*(k1+2*k2+2*k3+k4)
+
+    def split_step(self, theta, dt):
+        """
+        Strang splitting: half a step of free rotation (solved exactly), a
+        full coupling step, then another half step of rotation. Keeps the
+        phases of uncoupled oscillators exact whatever the step size.
+        """
+        theta = theta+0.5*dt*self.omega
+        theta = theta+dt*self.coupling_rates(theta)
+        return theta+0.5*dt*self.omega
+
+    def advance(self, theta, dt, scheme=None):
+        """
+        One step of a scheme from theta
+        :return: The new phases
+        """
+        if (scheme is None):
+            scheme = self.scheme
+        if (scheme == "euler"):
+            return self.euler_step(theta, dt)
+        if (scheme == "split"):
+            return self.split_step(theta, dt)
+        return self.rk4_step(theta, dt)
+
+    def step(self, dt=1.0):
+        """
+        Advance the phases dt ticks with the selected scheme
+        """
+        self.theta = self.advance(self.theta, dt)
+        self.time += dt
+
+    def adaptive_step(self, dt, tolerance=1e-6):
+        """
+        Take one RK4 step, choosing its size by step doubling so that the
+        estimated phase error stays below tolerance (radians). Stiff
+        (strongly coupled) networks get smaller steps only when they need them.
+        :param dt: Proposed step size
+        :return: [dt_taken, dt_next]
+        """
+        while (True):
+            full = self.rk4_step(self.theta, dt)
+            half = self.rk4_step(self.rk4_step(self.theta, 0.5*dt), 0.5*dt)
+            error = np.max(np.abs(half-full))/15.0 if len(full) > 0 else 0.0
+            if (error <= tolerance or dt < 1e-12):
+                break
+            dt *= max(0.1, 0.9*(tolerance/error)**0.2)
+        # Richardson extrapolation of the two estimates
+        self.theta = half+(half-full)/15.0
+        self.time += dt
+        if (error == 0):
+            return [dt, dt*5]
+        return [dt, dt*min(5.0, 0.9*(tolerance/error)**0.2)]
+
+    def integrate(self, duration, dt=1.0, record_every=1, tolerance=None, write_back=True):
+        """
+        Integrate for duration ticks recording the order parameter
+        :param dt: Step size (the first step size when adaptive)
+        :param record_every: Record r after every this many steps
+        :param tolerance: If given use adaptive RK4 steps with this error tolerance
+        :param write_back: Copy the final phases to the singularities
+        :return: [times, r] arrays of the recorded times and order parameter
+        """
+        times = [self.time]
+        r_values = [order_parameter(self.theta)[0]]
+        end_time = self.time+duration
+        steps = 0
+        while (self.time < end_time-1e-12):
+            step_dt = min(dt, end_time-self.time)
+            if (tolerance is None):
+                self.step(step_dt)
+            else:
+                dt = self.adaptive_step(step_dt, tolerance)[1]
+            steps += 1
+            if (steps % record_every == 0):
+                times.append(self.time)
+                r_values.append(order_parameter(self.theta)[0])
+        if (write_back == True):
+            self.write_phases()
+        return [np.array(times), np.array(r_values)]
+
+    def order_parameter(self):
+        """
+        Current [r, psi] of the integrated oscillators
+        """
+        return order_parameter(self.theta)
+
+    def is_phase_locked(self, threshold=0.95):
+        """
+        Return True if the current order parameter is at least threshold
+        """
+        return self.order_parameter()[0] >= threshold
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created By  : Martin Timms
+# Created Date: 18th October 2026
+# License: BSD-3-Clause License
+# Organisation: OpenGML.org/
+# Project: https://github.com/Electro-resonance/OpenGML
+# Description: Batch export of GML animation frames without a display
+# The tree is advanced a fixed phase step per frame (or a fixed interval of
+# the simulation clock) and rasterised by the headless graphics helper so
+# that renders are reproducible and run as fast as the CPU allows. Frames are written as numbered PNG images or as a raw
+# rgb24 stream suitable for piping into ffmpeg, e.g.
+#   python GML_Render.py my_demo:populate_demo --frames 500 --format raw --out - |
+#     ffmpeg -f rawvideo -pix_fmt rgb24 -s 800x800 -r 50 -i - out.mp4
+# Long sequences can be split into frame ranges rendered by a pool of
+# worker processes (--workers), each rebuilding the tree from a compact
+# snapshot and seeking to its first frame with the closed form phases.
+# =============================================================================
+
+import argparse
+import contextlib
+import importlib
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import GML
+import GML_Serialise
+from GML_Clock import GML_Clock
+
+
+def load_populate_function(spec):
+    """
+    Find a populate function from a "module:function" specification
+    The module may be an importable name or a path to a python file.
+    :return: The function
+    """
+    if (":" in spec):
+        [module_name, function_name] = spec.rsplit(":", 1)
+    else:
+        [module_name, function_name] = [spec, "populate_demo"]
+    if (module_name.endswith(".py")):
+        path = os.path.abspath(module_name)
+        sys.path.append(os.path.dirname(path))
+        module_spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(path))[0], path)
+        module = importlib.util.module_from_spec(module_spec)
+        module_spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(module_name)
+    return getattr(module, function_name)
+
+def render_frame(root_node, limit=20, line_mode=0, clock=None, dt=0):
+    """
+    Draw one frame of a tree into the current graphics helper
+    :param line_mode: 0 none, 1/2 polygons, 3/4 lines (as the 2D app modes)
+    :param clock: Optional GML_Clock, advanced dt seconds before drawing.
+    Without a clock the tree is advanced one tick per frame.
+    """
+    helper = GML.GML_graphics_helper()
+    helper.screen_clear()
+    if (clock is None):
+        root_node.run1(limit)
+    else:
+        alpha = clock.advance(dt, lambda: root_node.step_phases(limit))
+        root_node.render1(limit, alpha)
+    if (line_mode == 1):
+        root_node.gml_line_plot(100, polygons=True)
+    elif (line_mode == 2):
+        root_node.gml_line_plot(100, polygons=True, plot_mode=1)
+    elif (line_mode == 3):
+        root_node.gml_line_plot(100, polygons=False)
+    elif (line_mode == 4):
+        root_node.gml_line_plot(100, polygons=False, plot_mode=1)
+    helper.flush()
+
+def render_frames(populate_function, frames, out, frame_format="png", size=(800, 800), demo_num=0,
+                  speed=1.0, limit=20, line_mode=0, draw_mode=None, start_frame=0, dt=None, tick_rate=50):
+    """
+    Render a sequence of frames to files
+    :param populate_function: Function taking a demo number and returning the root node
+    :param frames: Number of frames to write
+    :param out: Directory for png frames, or file name ("-" for stdout) for raw frames
+    :param frame_format: "png" or "raw"
+    :param speed: Oscillator speed, the phase step applied each frame
+    :param start_frame: Number of frames to advance before writing the first one
+    :param dt: Seconds between frames. If given the tree is advanced by a
+    GML_Clock running at tick_rate, otherwise by one tick per frame.
+    :return: Number of frames written
+    """
+    helper = GML.GML_Use_Headless(size)
+    stream = open_output(out, frame_format)
+    try:
+        root_node = build_tree(populate_function, demo_num, draw_mode, speed)
+        clock = None
+        if (dt is not None):
+            clock = GML_Clock(tick_rate, max_substeps=None)
+        for frame in range(start_frame):
+            if (clock is None):
+                root_node.step_phases(limit)
+            else:
+                clock.advance(dt, lambda: root_node.step_phases(limit))
+        for frame in range(frames):
+            render_frame(root_node, limit, line_mode, clock, dt)
+            if (stream is not None):
+                helper.write_raw(stream)
+            else:
+                helper.save_png(os.path.join(out, "frame_%06d.png" % (start_frame+frame)))
+    finally:
+        if (stream is not None and out != "-"):
+            stream.close()
+    return frames
+
+def open_output(out, frame_format):
+    """
+    Open the raw output stream, or create the png output directory
+    :return: Binary stream for raw frames, otherwise None
+    """
+    if (frame_format == "raw"):
+        if (out == "-"):
+            return sys.stdout.buffer
+        return open(out, "wb")
+    os.makedirs(out, exist_ok=True)
+    return None
+
+def build_tree(populate_function, demo_num=0, draw_mode=None, speed=1.0):
+    """
+    Create the tree ready for animation. Text printed by the populate
+    function is sent to stderr so it cannot corrupt raw frames on stdout.
+    """
+    with contextlib.redirect_stdout(sys.stderr):
+        root_node = populate_function(demo_num)
+    if (draw_mode is not None):
+        root_node.set_draw_mode(draw_mode)
+    root_node.set_oscillator_speed(speed)
+    root_node.set_pause(False)
+    return root_node
+
+def render_range(snapshot, settings, out, frame_format, start, end, worker):
+    """
+    Worker process entry point rendering frames start to end-1 of a sequence
+    :param snapshot: [nodes, edges] arrays from GML_Serialise.tree_to_arrays
+    :param settings: Dictionary of the global GML and render settings
+    :param out: Output directory (png) or file name for this range (raw)
+    :return: [worker, start, end, seconds]
+    """
+    started = time.perf_counter()
+    helper = GML.GML_Use_Headless(settings["size"])
+    root_node = GML_Serialise.arrays_to_tree(snapshot[0], snapshot[1])
+    root_node.world.reverse = settings["reverse"]
+    root_node.world.pos_scale = settings["pos_scale"]
+    root_node.world.mode_3d = settings["mode_3d"]
+    root_node.set_draw_mode(settings["draw_mode"])
+    root_node.set_oscillator_speed(settings["speed"])
+    root_node.set_pause(False)
+    root_node.compile_flat()
+    limit = settings["limit"]
+    dt = settings["dt"]
+
+    # Seek to the first frame in closed form rather than replaying it
+    clock = None
+    if (dt is None):
+        root_node.flat_engine.seek(start, limit)
+    else:
+        clock = GML_Clock(settings["tick_rate"], max_substeps=None)
+        for frame in range(start):
+            clock.advance(dt, lambda: None)
+        if (clock.ticks > 0):
+            root_node.flat_engine.seek(clock.ticks-1, limit)
+            root_node.step_phases(limit)
+
+    stream = None
+    if (frame_format == "raw"):
+        stream = open(out, "wb")
+    try:
+        for frame in range(start, end):
+            render_frame(root_node, limit, settings["line_mode"], clock, dt)
+            if (stream is not None):
+                helper.write_raw(stream)
+            else:
+                helper.save_png(os.path.join(out, "frame_%06d.png" % frame))
+    finally:
+        if (stream is not None):
+            stream.close()
+    return [worker, start, end, time.perf_counter()-started]
+
+def render_sequence(populate_function, frames, out, workers=None, frame_format="png", size=(800, 800), demo_num=0,
+                    speed=1.0, limit=20, line_mode=0, draw_mode=None, start_frame=0, dt=None, tick_rate=50):
+    """
+    Render a sequence of frames in parallel. The tree is built once, shipped
+    to a pool of worker processes as a compact snapshot and each worker
+    renders a contiguous range of frames. Raw output is stitched back
+    together in frame order.
+    :param workers: Number of processes, defaults to the number of CPUs
+    :return: List of [worker, start, end, seconds] for each worker
+    Other parameters are as render_frames.
+    """
+    if (workers is None):
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, frames))
+    GML.GML_Use_Headless(size)
+    stream = open_output(out, frame_format)
+    part_dir = None
+    try:
+        root_node = build_tree(populate_function, demo_num, draw_mode, speed)
+        snapshot = GML_Serialise.tree_to_arrays(root_node)
+        settings = {"size": size, "speed": speed, "limit": limit, "line_mode": line_mode,
+                    "draw_mode": root_node.world.draw_mode, "reverse": root_node.world.reverse,
+                    "pos_scale": root_node.world.pos_scale, "mode_3d": root_node.world.mode_3d,
+                    "dt": dt, "tick_rate": tick_rate}
+        bounds = [start_frame+frames*worker//workers for worker in range(workers+1)]
+        targets = [out]*workers
+        if (stream is not None):
+            part_dir = tempfile.mkdtemp(prefix="gml_render_")
+            targets = [os.path.join(part_dir, "part%03d.raw" % worker) for worker in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(render_range, snapshot, settings, targets[worker], frame_format,
+                                       bounds[worker], bounds[worker+1], worker) for worker in range(workers)]
+            stats = [future.result() for future in futures]
+        if (stream is not None):
+            for target in targets:
+                with open(target, "rb") as part:
+                    shutil.copyfileobj(part, stream)
+    finally:
+        if (part_dir is not None):
+            shutil.rmtree(part_dir, ignore_errors=True)
+        if (stream is not None and out != "-"):
+            stream.close()
+    for [worker, start, end, seconds] in stats:
+        print("Worker %d: frames %d-%d in %.2fs (%.1f fps)" % (worker, start, end-1, seconds, (end-start)/max(seconds, 1e-9)),
+              file=sys.stderr)
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render OpenGML animation frames without a display")
+    parser.add_argument("populate", help="module:function returning the root node, e.g. Simple_GML.py:populate_demo")
+    parser.add_argument("--frames", type=int, default=100, help="number of frames to render")
+    parser.add_argument("--out", default="frames", help="output directory (png) or file, - for stdout (raw)")
+    parser.add_argument("--format", choices=["png", "raw"], default="png", help="png images or raw rgb24 frames")
+    parser.add_argument("--width", type=int, default=800)
+    parser.add_argument("--height", type=int, default=800)
+    parser.add_argument("--demo", type=int, default=0, help="demo number passed to the populate function")
+    parser.add_argument("--speed", type=float, default=1.0, help="phase step per frame")
+    parser.add_argument("--limit", type=int, default=20, help="depth limit of the tree to draw")
+    parser.add_argument("--lines", type=int, default=0, choices=range(5), help="line plot mode as in the 2D app")
+    parser.add_argument("--draw-mode", type=int, default=None, help="singularity draw mode")
+    parser.add_argument("--start", type=int, default=0, help="frames to advance before the first one written")
+    parser.add_argument("--dt", type=float, default=None, help="seconds between frames on the simulation clock, e.g. 0.04 for 25 fps")
+    parser.add_argument("--tick-rate", type=float, default=50, help="simulation clock ticks per second")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes, 0 for one per CPU")
+    args = parser.parse_args(argv)
+
+    populate_function = load_populate_function(args.populate)
+    start = time.perf_counter()
+    if (args.workers == 1):
+        frames = render_frames(populate_function, args.frames, args.out, args.format, (args.width, args.height),
+                               args.demo, args.speed, args.limit, args.lines, args.draw_mode, args.start,
+                               args.dt, args.tick_rate)
+    else:
+        render_sequence(populate_function, args.frames, args.out, args.workers or None, args.format,
+                        (args.width, args.height), args.demo, args.speed, args.limit, args.lines,
+                        args.draw_mode, args.start, args.dt, args.tick_rate)
+        frames = args.frames
+    elapsed = time.perf_counter()-start
+    print("Rendered %d frames in %.2fs (%.1f fps)" % (frames, elapsed, frames/max(elapsed, 1e-9)), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created By  : Martin Timms
+# Created Date: 18th October 2026
+# License: BSD-3-Clause License
+# Organisation: OpenGML.org/
+# Project: https://github.com/Electro-resonance/OpenGML
+# Description: Compact snapshots of GML trees
+# A tree is flattened into a NumPy structured array with one row per
+# singularity (in depth first order with a parent index) plus a table of
+# the 3D face edges. Snapshots are cheap to pickle so they can be shipped to
+# worker processes, and a tree can be rebuilt from them without replaying
+# the add_polygon calls that created it.
+# Snapshots are saved as a single versioned .npy record holding both tables
+# so they can be opened with np.load(path, mmap_mode="r"), or exported as
+# JSON for other tools.
+# =============================================================================
+
+import json
+import os
+import numpy as np
+import GML
+
+FORMAT_VERSION = 1
+NAME_LENGTH = 32
+
+NODE_DTYPE = np.dtype([
+    ('parent', np.int32),
+    ('mode_3d', np.bool_),
+    ('bindu', np.bool_),
+    ('name', 'U%d' % NAME_LENGTH),
+    ('diameter', np.float64),
+    ('colour', np.float64, (3,)),
+    ('freq', np.float64, (2,)),
+    ('orbit_radius', np.float64, (2,)),
+    ('phase', np.float64, (2,)),
+    ('start_phase', np.float64, (2,)),
+    ('cursor_phase', np.float64, (2,)),
+    ('oscillator_speed_node', np.float64),
+    ('is_spiral', np.bool_),
+    ('spiral_rate', np.float64),
+    ('spiral_mode', np.int32),
+    ('spiral_rotates', np.float64),
+    ('is_pendulum', np.bool_),
+    ('is_angle', np.bool_),
+    ('angle_offset', np.float64),
+    ('identifier', np.int64),
+    ('probability', np.float64),
+    ('preserve_edges', np.bool_),
+])
+
+# One row per edge of a 3D face: the owning node, the face and the two vertices
+EDGE_DTYPE = np.dtype([
+    ('node', np.int32),
+    ('face', np.int32),
+    ('a', np.int32),
+    ('b', np.int32),
+])
+
+# Node attributes copied directly to and from fields of the same name
+SCALAR_FIELDS = ['diameter', 'oscillator_speed_node', 'is_spiral', 'spiral_rate', 'spiral_mode',
+                 'spiral_rotates', 'is_pendulum', 'is_angle', 'angle_offset', 'identifier',
+                 'probability', 'preserve_edges']
+PAIR_FIELDS = ['freq', 'orbit_radius', 'phase', 'start_phase', 'cursor_phase']
+
+
+def preorder_nodes(root_node):
+    """
+    List the nodes below root_node depth first with the index of each parent
+    :return: [nodes, parents]
+    """
+    nodes = []
+    parents = []
+    stack = [[root_node, -1]]
+    while (len(stack) > 0):
+        [node, parent_index] = stack.pop()
+        index = len(nodes)
+        nodes.append(node)
+        parents.append(parent_index)
+        for child_node in reversed(node.children1):
+            if (child_node != None):
+                stack.append([child_node, index])
+    return [nodes, parents]
+
+def tree_to_arrays(root_node):
+    """
+    Flatten a GML_2D or GML_3D tree
+    :param root_node: The node at the top of the tree (normally the Bindu)
+    :return: [nodes, edges] structured arrays of NODE_DTYPE and EDGE_DTYPE
+    """
+    [nodes, parents] = preorder_nodes(root_node)
+    table = np.zeros(len(nodes), dtype=NODE_DTYPE)
+    edge_rows = []
+    for index in range(len(nodes)):
+        node = nodes[index]
+        row = table[index]
+        row['parent'] = parents[index]
+        row['mode_3d'] = node.mode_3d
+        row['bindu'] = getattr(node, "bindu", False)
+        row['name'] = str(node.name)[:NAME_LENGTH]
+        row['colour'] = list(node.colour)[:3]
+        for field in SCALAR_FIELDS:
+            row[field] = getattr(node, field)
+        for field in PAIR_FIELDS:
+            value = getattr(node, field)
+            row[field] = [value[0], value[1]]
+        if (node.edges is not None):
+            for face_index in range(len(node.edges)):
+                for [a, b] in node.edges[face_index]:
+                    edge_rows.append((index, face_index, a, b))
+    edges = np.array(edge_rows, dtype=EDGE_DTYPE)
+    return [table, edges]
+
+def file_dtype(node_count, edge_count):
+    """
+    Record type of a saved tree: the format version and both tables
+    """
+    return np.dtype([
+        ('version', np.int32),
+        ('nodes', NODE_DTYPE, (node_count,)),
+        ('edges', EDGE_DTYPE, (edge_count,)),
+    ])
+
+def upgrade_table(table, dtype):
+    """
+    Copy the fields shared with the current layout into a table of the
+    current dtype, so files written by other format versions still load.
+    Fields missing from the file keep their zero defaults.
+    """
+    if (table.dtype == dtype):
+        return table
+    upgraded = np.zeros(len(table), dtype=dtype)
+    for name in dtype.names:
+        if (name in table.dtype.names):
+            upgraded[name] = table[name]
+    return upgraded
+
+def save_tree(root_node, path):
+    """
+    Save a tree as a versioned .npy file
+    """
+    [table, edges] = tree_to_arrays(root_node)
+    record = np.zeros(1, dtype=file_dtype(len(table), len(edges)))
+    record['version'] = FORMAT_VERSION
+    record['nodes'][0] = table
+    record['edges'][0] = edges
+    np.save(path, record, allow_pickle=False)
+
+def load_arrays(path, mmap_mode="r"):
+    """
+    Open a saved tree without building it
+    :param mmap_mode: Passed to np.load, None reads the whole file into memory
+    :return: [nodes, edges] structured arrays
+    """
+    record = np.load(path, mmap_mode=mmap_mode, allow_pickle=False)
+    if (record.dtype.names is None or 'version' not in record.dtype.names or 'nodes' not in record.dtype.names):
+        raise ValueError("%s is not a saved GML tree" % path)
+    version = int(record['version'][0])
+    if (version > FORMAT_VERSION):
+        raise ValueError("%s uses GML tree format %d, newer than the supported %d" % (path, version, FORMAT_VERSION))
+    table = upgrade_table(record['nodes'][0], NODE_DTYPE)
+    edges = upgrade_table(record['edges'][0], EDGE_DTYPE)
+    return [table, edges]
+
+def load_tree(path, mmap_mode="r", world=None):
+    """
+    Load a tree saved by save_tree
+    :param world: GMLWorld for the tree, default_world if not given
+    :return: The root node
+    """
+    [table, edges] = load_arrays(path, mmap_mode)
+    return arrays_to_tree(table, edges, world)
+
+def cached_tree(path, populate_function, *args):
+    """
+    Load a tree from path if it exists, otherwise build it with
+    populate_function(*args) and save it there for next time
+    """
+    # np.save adds the .npy suffix, so check for the file it will write
+    if (not path.endswith(".npy")):
+        path = path+".npy"
+    if (os.path.exists(path)):
+        return load_tree(path)
+    root_node = populate_function(*args)
+    save_tree(root_node, path)
+    return root_node
+
+def tree_to_json(root_node):
+    """
+    Export a tree as a JSON string with one object per singularity
+    """
+    [table, edges] = tree_to_arrays(root_node)
+    columns = {}
+    for name in NODE_DTYPE.names:
+        columns[name] = table[name].tolist()
+    nodes = []
+    for index in range(len(table)):
+        node = {}
+        for name in NODE_DTYPE.names:
+            node[name] = columns[name][index]
+        node['edges'] = []
+        nodes.append(node)
+    for [node_index, face_index, a, b] in edges.tolist():
+        faces = nodes[node_index]['edges']
+        while (len(faces) <= face_index):
+            faces.append([])
+        faces[face_index].append([a, b])
+    return json.dumps({'format': 'OpenGML', 'version': FORMAT_VERSION, 'nodes': nodes})
+
+def json_to_tree(text, world=None):
+    """
+    Rebuild a tree from the JSON made by tree_to_json
+    :param world: GMLWorld for the tree, default_world if not given
+    :return: The root node
+    """
+    data = json.loads(text)
+    if (data.get('version', 0) > FORMAT_VERSION):
+        raise ValueError("GML tree format %d is newer than the supported %d" % (data['version'], FORMAT_VERSION))
+    nodes = data['nodes']
+    table = np.zeros(len(nodes), dtype=NODE_DTYPE)
+    edge_rows = []
+    for index in range(len(nodes)):
+        for name in NODE_DTYPE.names:
+            if (name in nodes[index]):
+                table[index][name] = nodes[index][name]
+        faces = nodes[index].get('edges', [])
+        for face_index in range(len(faces)):
+            for [a, b] in faces[face_index]:
+                edge_rows.append((index, face_index, a, b))
+    return arrays_to_tree(table, np.array(edge_rows, dtype=EDGE_DTYPE), world)
+
+def save_json(root_node, path):
+    """
+    Write the JSON export of a tree to a file
+    """
+    with open(path, "w") as json_file:
+        json_file.write(tree_to_json(root_node))
+
+def load_json(path, world=None):
+    """
+    Load a tree from a file written by save_json
+    """
+    with open(path, "r") as json_file:
+        return json_to_tree(json_file.read(), world)
+
+def plain_number(value):
+    """
+    Return a numpy scalar as an int if it is whole, otherwise a float
+    """
+    value = float(value)
+    if (value.is_integer()):
+        return int(value)
+    return value
+
+def arrays_to_tree(table, edges=None, world=None):
+    """
+    Rebuild a tree from the arrays made by tree_to_arrays
+    :param world: GMLWorld for the tree, default_world if not given
+    :return: The root node
+    """
+    import GML_3D
+    # Reading whole columns as lists is much faster than indexing rows
+    columns = {}
+    for name in NODE_DTYPE.names:
+        columns[name] = table[name].tolist()
+    nodes = []
+    for index in range(len(table)):
+        parent_index = columns['parent'][index]
+        if (parent_index < 0):
+            parent = None
+        else:
+            parent = nodes[parent_index]
+        colour = [plain_number(c) for c in columns['colour'][index]]
+        if (columns['mode_3d'][index] == True):
+            node = GML_3D.GML_3D(columns['name'][index], columns['diameter'][index], colour, [1, 1], [0, 0], None,
+                                 parent=parent, world=world)
+        else:
+            node = GML.GML_2D(columns['name'][index], columns['diameter'][index], colour, 1, 0, None,
+                              parent=parent, world=world)
+        if (parent is None):
+            node.reset_osc_count()
+            node.world.osc_count += 1
+        node.bindu = columns['bindu'][index]
+        for field in SCALAR_FIELDS:
+            setattr(node, field, columns[field][index])
+        for field in PAIR_FIELDS:
+            setattr(node, field, columns[field][index])
+        node.edges = []
+        node.invalidate_position()
+        nodes.append(node)
+    if (edges is not None):
+        for [node_index, face_index, a, b] in edges.tolist():
+            node = nodes[node_index]
+            while (len(node.edges) <= face_index):
+                node.edges.append([])
+            node.edges[face_index].append((a, b))
+    # The fields were set directly so refresh the cached subtree statistics
+    nodes[0].rebuild_aggregates()
+    return nodes[0]
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created By  : Martin Timms
+# Created Date: 18th October 2026
+# License: BSD-3-Clause License
+# Organisation: OpenGML.org/
+# Project: https://github.com/Electro-resonance/OpenGML
+# Description: Spatial index of singularity positions for hit-testing
+# A KD-tree is built from the mypos values of a GML tree once per frame so
+# that nearest, radius and k-nearest queries run in sub-linear time instead
+# of a recursive walk over every singularity.
+# =============================================================================
+
+import numpy as np
+import scipy.spatial
+
+
+class GML_Spatial(object):
+    """
+    Per frame KD-tree index over the positions of a GML tree
+    """
+
+    def __init__(self, root_node, limit=100, dims=2):
+        """
+        Build the index
+        :param root_node: The node at the top of the tree (normally the Bindu)
+        :param limit: Depth limit as used by run1 and nearest
+        :param dims: 2 to index the x,y screen positions, 3 to include z
+        """
+        self.root = root_node
+        self.limit = limit
+        self.dims = dims
+        self.build()
+
+    def collect(self):
+        """
+        Gather the nodes within limit and their current positions
+        """
+        engine = self.root.flat_engine
+        if (engine is not None):
+            engine.check_topology()
+            count = engine.limit_count(self.limit)
+            return [engine.nodes[:count], engine.mypos[:count, :self.dims].copy()]
+        nodes = []
+        points = []
+        stack = [[self.root, self.limit]]
+        while (len(stack) > 0):
+            [node, limit] = stack.pop()
+            node.calc_mypos()
+            nodes.append(node)
+            points.append(node.mypos[:self.dims])
+            limit -= 1
+            if (limit > 0):
+                for child_node in reversed(node.children1):
+                    if (child_node != None):
+                        stack.append([child_node, limit])
+        return [nodes, np.array(points, dtype=np.float64)]
+
+    def build(self):
+        """
+        (Re)build the KD-tree from the current positions
+        """
+        [self.nodes, self.points] = self.collect()
+        self.tree = scipy.spatial.cKDTree(self.points)
+        self.frame_id = self.root.world.frame_id
+        self.topology_version = self.root.world.topology_version
+
+    def is_current(self, limit):
+        """
+        Return True if the index was built this frame for the same tree and limit
+        """
+        return (self.frame_id == self.root.world.frame_id and
+                self.topology_version == self.root.world.topology_version and
+                self.limit == limit)
+
+    def query_point(self, test_pos):
+        """
+        Trim or pad a test position to the dimensions of the index
+        """
+        point = np.zeros(self.dims, dtype=np.float64)
+        size = min(len(test_pos), self.dims)
+        point[:size] = test_pos[:size]
+        return point
+
+    def nearest(self, test_pos, max_distance):
+        """
+        Find the singularity nearest to a cartesian position
+        :param test_pos: Position to test
+        :param max_distance: Only singularities closer than this are matched
+        :return: [node, distance] or [root, max_distance] if nothing is closer,
+        in the same form as GML_2D.nearest
+        """
+        [distance, index] = self.tree.query(self.query_point(test_pos), k=1)
+        if (distance < max_distance):
+            return [self.nodes[index], float(distance)]
+        return [self.root, max_distance]
+
+    def within_radius(self, test_pos, radius):
+        """
+        Return the list of singularities within radius of a position, closest first
+        """
+        point = self.query_point(test_pos)
+        indexes = self.tree.query_ball_point(point, radius)
+        if (len(indexes) == 0):
+            return []
+        distances = np.linalg.norm(self.points[indexes]-point, axis=1)
+        return [self.nodes[indexes[i]] for i in np.argsort(distances, kind='stable')]
+
+    def k_nearest(self, test_pos, k, max_distance=np.inf):
+        """
+        Return up to k [node, distance] pairs nearest to a position, closest first
+        """
+        k = min(k, len(self.nodes))
+        if (k < 1):
+            return []
+        [distances, indexes] = self.tree.query(self.query_point(test_pos), k=k,
+                                               distance_upper_bound=max_distance)
+        distances = np.atleast_1d(distances)
+        indexes = np.atleast_1d(indexes)
+        return [[self.nodes[indexes[i]], float(distances[i])] for i in range(k)
+                if np.isfinite(distances[i])]
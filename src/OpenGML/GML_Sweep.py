@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created By  : Martin Timms
+# Created Date: 18th October 2026
+# License: BSD-3-Clause License
+# Organisation: OpenGML.org/
+# Project: https://github.com/Electro-resonance/OpenGML
+# Description: Headless parameter sweeps of coupled GML trees
+# Every combination of a grid of parameters (bond coupling, frequency
+# locking, oscillator speed and the symmetry breaking probabilities) is run
+# for a number of steps without a display, in a pool of worker processes.
+# Summary metrics of each run (order parameter, fraction of phase locked
+# bonds, node count over time and a frequency histogram) are collected in a
+# NumPy record array with one row per configuration, e.g.
+#   python GML_Sweep.py Symmetry_Breaking.py:populate_demo --steps 2000
+#     --grid coupling=0.000005,0.0002 --grid add_probability=0.001,0.01 --out sweep.npy
+# The record array is saved after every configuration finishes, so a sweep
+# that is interrupted continues from where it stopped when run again.
+# =============================================================================
+
+import argparse
+import contextlib
+import itertools
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import GML
+import GML_Bond
+from GML_Kuramoto import order_parameter, oscillator_nodes
+from GML_Symmetry import SymmetryBreaker
+
+# Parameters that can be swept, with the type of their result column
+SWEEP_PARAMETERS = {"coupling": np.float64, "lock_frequency": np.bool_, "oscillator_speed": np.float64,
+                    "add_probability": np.float64, "remove_probability": np.float64,
+                    "prime_probability": np.float64}
+SYMMETRY_PARAMETERS = ["add_probability", "remove_probability", "prime_probability"]
+
+# Bins of |freq| for the frequency histogram. Symmetry breaking halves and
+# doubles frequencies so the bins are spaced logarithmically.
+FREQ_BINS = np.logspace(-2, 3, 26)
+
+
+def parameter_grid(grid):
+    """
+    List every combination of the values of a parameter grid
+    :param grid: Dictionary of parameter name to a list of values
+    :return: List of dictionaries, one per configuration
+    """
+    for name in grid:
+        if (name not in SWEEP_PARAMETERS):
+            raise ValueError("Unknown sweep parameter %s, expected one of %s" % (name, ", ".join(SWEEP_PARAMETERS)))
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*[list(grid[name]) for name in names])]
+
+def result_dtype(grid, samples, bins):
+    """
+    Record type of a sweep result: the configuration, whether it has been
+    run and its metrics
+    :param samples: Number of node count samples per run
+    :param bins: Number of frequency histogram bins
+    """
+    fields = [('index', np.int64)]
+    for name in grid:
+        fields.append((name, SWEEP_PARAMETERS[name]))
+    fields.extend([
+        ('done', np.bool_),
+        ('seconds', np.float64),
+        ('order_parameter', np.float64),
+        ('locked_fraction', np.float64),
+        ('node_count', np.int64, (samples,)),
+        ('freq_histogram', np.int64, (bins,)),
+    ])
+    return np.dtype(fields)
+
+def build_tree(populate_function, demo_num=0):
+    """
+    Create the tree of a run. The populate function may return the root
+    node, or [root_node, bonds] if it also creates GML_Bond objects that
+    are not registered in the world of the tree. Text it prints is sent
+    to stderr.
+    :return: [root_node, bonds]
+    """
+    # Bonds added by an earlier run in this process must not carry over
+    del GML.default_world.bonds[:]
+    with contextlib.redirect_stdout(sys.stderr):
+        result = populate_function(demo_num)
+    if (isinstance(result, (list, tuple))):
+        [root_node, bonds] = result
+    else:
+        [root_node, bonds] = [result, []]
+    # A bond both returned and registered in the world is only used once
+    found = {}
+    for bond in list(bonds)+list(root_node.world.bonds):
+        found.setdefault(id(bond), bond)
+    return [root_node, list(found.values())]
+
+def configure_bonds(bonds, config):
+    """
+    Apply the swept bond parameters of a configuration to bonds
+    """
+    for bond in bonds:
+        if ("coupling" in config):
+            bond.coupling = config["coupling"]
+        if ("lock_frequency" in config):
+            bond.lock_frequency = bool(config["lock_frequency"])
+
+def bond_phase_differences(network):
+    """
+    Phase difference across each bond in degrees
+    """
+    if (network.compiled == False):
+        network.compile()
+    phase = network.phases()
+    return GML_Bond.wrapped_phase_differences(phase[network.endpoint1], phase[network.endpoint2],
+                                              network.phase_offset)
+
+def locked_fraction(previous, current, tolerance):
+    """
+    Fraction of bonds whose phase difference moved less than tolerance
+    degrees between two samples. Bonds added since the previous sample
+    (at the end of current) are left out.
+    """
+    current = current[:len(previous)]
+    if (len(current) == 0):
+        return 0.0
+    drift = np.abs((current-previous+180) % 360-180)
+    return float(np.mean(drift < tolerance))
+
+def run_configuration(populate_function, config, steps, record_every=100, limit=100, freq_bins=FREQ_BINS,
+                      seed=0, demo_num=0, lock_tolerance=1.0):
+    """
+    Run one configuration of a sweep
+    :param populate_function: Function taking a demo number, or a
+    "module:function" specification of one
+    :param config: Dictionary of parameter values
+    :param steps: Number of steps to run
+    :param record_every: Sample the node count every this many steps
+    :param seed: Seed of the random module and of the symmetry breaking,
+    so runs can be repeated
+    :param lock_tolerance: Most a bond's phase difference may move (degrees)
+    between the last two samples for it to count as locked. The locked
+    fraction is NaN if fewer than two samples were taken.
+    :return: Dictionary of the metrics
+    """
+    started = time.perf_counter()
+    if (isinstance(populate_function, str)):
+        import GML_Render
+        populate_function = GML_Render.load_populate_function(populate_function)
+    GML.GML_Use_Headless((100, 100))
+    random.seed(seed)
+    [root_node, bonds] = build_tree(populate_function, demo_num)
+    if (len(bonds) == 0 and ("coupling" in config or "lock_frequency" in config)):
+        raise ValueError("Bond parameters are swept but the populate function created no bonds, return "
+                         "[root_node, bonds] or add the bonds to root_node.world.bonds")
+    configure_bonds(bonds, config)
+    network = GML_Bond.BondNetwork(bonds)
+    network.compile()
+    if ("oscillator_speed" in config):
+        root_node.set_oscillator_speed(config["oscillator_speed"])
+    root_node.set_pause(False)
+    probabilities = {}
+    for name in SYMMETRY_PARAMETERS:
+        if (name in config):
+            probabilities[name] = config[name]
+    breaker = None
+    if (len(probabilities) > 0):
+        breaker = SymmetryBreaker(root_node, limit, seed, **probabilities)
+    world_bonds = root_node.world.bonds
+    known_bonds = len(world_bonds)
+
+    node_count = [root_node.node_count]
+    previous = None
+    current = bond_phase_differences(network)
+    for step in range(1, steps+1):
+        root_node.step_phases(limit)
+        if (len(network) > 0):
+            network.update()
+        if (breaker is not None):
+            breaker.step()
+            # Bonds copied to new singularities join the network
+            if (len(world_bonds) > known_bonds):
+                new_bonds = world_bonds[known_bonds:]
+                configure_bonds(new_bonds, config)
+                for bond in new_bonds:
+                    network.add(bond)
+                known_bonds = len(world_bonds)
+        if (step % record_every == 0):
+            node_count.append(root_node.node_count)
+            previous = current
+            current = bond_phase_differences(network)
+
+    nodes = oscillator_nodes(root_node, limit)
+    phase = np.radians([node.phase[0] for node in nodes])
+    freq = np.abs([node.freq[0] for node in nodes])
+    return {"order_parameter": float(order_parameter(phase)[0]) if len(nodes) > 0 else 0.0,
+            "locked_fraction": locked_fraction(previous, current, lock_tolerance) if previous is not None else np.nan,
+            "node_count": node_count,
+            "freq_histogram": np.histogram(freq, bins=freq_bins)[0],
+            "seconds": time.perf_counter()-started}
+
+def save_results(table, path):
+    """
+    Write a sweep result, replacing the previous file only once the new
+    one is complete so an interruption cannot leave a partial file
+    """
+    temp_path = path+".tmp"
+    with open(temp_path, "wb") as result_file:
+        np.save(result_file, table, allow_pickle=False)
+    os.replace(temp_path, path)
+
+def load_results(path, table):
+    """
+    Copy the finished rows of a saved sweep into a new result table
+    :param table: The empty table of the sweep being resumed
+    :return: Number of rows already done
+    """
+    saved = np.load(path, allow_pickle=False)
+    if (saved.dtype != table.dtype or len(saved) != len(table)):
+        raise ValueError("%s was written by a different sweep" % path)
+    for name in table.dtype.names[:table.dtype.names.index('done')]:
+        if (np.any(saved[name] != table[name])):
+            raise ValueError("%s was written by a different sweep" % path)
+    table[:] = saved
+    return int(np.sum(table['done']))
+
+def store_result(table, index, metrics):
+    """
+    Copy the metrics of a finished configuration into its row
+    """
+    samples = table.dtype['node_count'].shape[0]
+    row = table[index]
+    row['done'] = True
+    row['seconds'] = metrics["seconds"]
+    row['order_parameter'] = metrics["order_parameter"]
+    row['locked_fraction'] = metrics["locked_fraction"]
+    row['node_count'] = metrics["node_count"][:samples]
+    row['freq_histogram'] = metrics["freq_histogram"]
+
+def sweep(populate_function, grid, steps=1000, out=None, workers=None, record_every=100, limit=100,
+          freq_bins=FREQ_BINS, seed=0, demo_num=0, lock_tolerance=1.0):
+    """
+    Run every configuration of a parameter grid in a pool of processes
+    :param populate_function: Function taking a demo number and returning
+    the root node (or [root_node, bonds]), or a "module:function"
+    specification. A function must be importable by the worker processes.
+    :param grid: Dictionary of parameter name to a list of values, the
+    names are those of SWEEP_PARAMETERS. Parameters not in the grid keep
+    the values set by the populate function, and symmetry breaking only
+    runs if one of its probabilities is swept.
+    :param steps: Steps to run each configuration
+    :param out: Optional .npy file saved as each configuration finishes.
+    If it exists the configurations already done are not run again.
+    :param workers: Number of processes, defaults to the number of CPUs.
+    1 runs the configurations in this process.
+    :param seed: Configuration i is run with random seed seed+i
+    Other parameters are as run_configuration.
+    :return: NumPy record array with one row per configuration
+    """
+    configs = parameter_grid(grid)
+    freq_bins = np.asarray(freq_bins)
+    table = np.zeros(len(configs), dtype=result_dtype(grid, steps//record_every+1, len(freq_bins)-1))
+    table['index'] = np.arange(len(configs))
+    for name in grid:
+        table[name] = [config[name] for config in configs]
+    if (out is not None and os.path.exists(out)):
+        load_results(out, table)
+    pending = [index for index in range(len(configs)) if table['done'][index] == False]
+    if (workers is None):
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(pending)))
+
+    arguments = [steps, record_every, limit, freq_bins]
+    if (workers == 1):
+        for index in pending:
+            metrics = run_configuration(populate_function, configs[index], *arguments,
+                                        seed=seed+index, demo_num=demo_num, lock_tolerance=lock_tolerance)
+            store_result(table, index, metrics)
+            if (out is not None):
+                save_results(table, out)
+        return table
+
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = {}
+        for index in pending:
+            future = executor.submit(run_configuration, populate_function, configs[index], *arguments,
+                                     seed=seed+index, demo_num=demo_num, lock_tolerance=lock_tolerance)
+            futures[future] = index
+        for future in as_completed(futures):
+            store_result(table, futures[future], future.result())
+            if (out is not None):
+                save_results(table, out)
+    finally:
+        # On an interruption drop the configurations not yet started
+        executor.shutdown(wait=True, cancel_futures=True)
+    return table
+
+def parse_grid(items):
+    """
+    Turn name=value,value,... command line items into a parameter grid
+    """
+    grid = {}
+    for item in items:
+        [name, values] = item.split("=", 1)
+        if (SWEEP_PARAMETERS.get(name) == np.bool_):
+            grid[name] = [value.strip().lower() in ["1", "true", "yes"] for value in values.split(",")]
+        else:
+            grid[name] = [float(value) for value in values.split(",")]
+    return grid
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a headless OpenGML parameter sweep")
+    parser.add_argument("populate", help="module:function returning the root node, e.g. Symmetry_Breaking.py:populate_demo")
+    parser.add_argument("--grid", action="append", default=[], help="name=value,value,... for each swept parameter")
+    parser.add_argument("--steps", type=int, default=1000, help="steps to run each configuration")
+    parser.add_argument("--record-every", type=int, default=100, help="steps between node count samples")
+    parser.add_argument("--limit", type=int, default=100, help="depth limit of the tree")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the first configuration")
+    parser.add_argument("--demo", type=int, default=0, help="demo number passed to the populate function")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes, 0 for one per CPU")
+    parser.add_argument("--out", default="sweep.npy", help="result file, resumed if it exists")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    table = sweep(args.populate, parse_grid(args.grid), args.steps, args.out, args.workers or None,
+                  args.record_every, args.limit, seed=args.seed, demo_num=args.demo)
+    for row in table:
+        print("%4d r=%.3f locked=%.3f nodes=%d" % (row['index'], row['order_parameter'], row['locked_fraction'],
+                                                   row['node_count'][-1]))
+    print("Swept %d configurations in %.2fs" % (len(table), time.perf_counter()-start), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,20 +7,30 @@
 # Project: https://github.com/Electro-resonance/OpenGML
 # Description: functions used for symmetry breaking
 # (creating new phase singularities and removing others)
+# SymmetryBreaker applies the same rules to a whole tree at once, drawing
+# every random decision of a frame from a seeded numpy Generator so that
+# runs can be repeated, then adding and removing the nodes afterwards.
 # =============================================================================
 
 import random
-from prime_functions import is_prime
+import numpy as np
+from prime_functions import is_prime, prime_sieve
 import GML_Bond
 
-def symmetry_breaking(root, limit, min_freq=0.01, max_freq=200):
+def symmetry_breaking(root, limit, min_freq=0.01, max_freq=200, add_probability=0.001,
+                      remove_probability=0.001, prime_probability=0.0001):
     """
     Symmetry breaking
+    :param add_probability: Chance per frame of a node (without a prime
+    number of children) adding a child at half or double its frequency
+    :param remove_probability: Chance of such a node removing its first child
+    :param prime_probability: Chance of a node with a prime number of
+    children removing its first child (at the root) or duplicating it (below)
     """
     number_children = len(root.children1)
     if (number_children == 0 or is_prime(number_children) == False):
         # Check if symmetry breaking should be applied
-        if random.random() > 0.999:
+        if random.random() > 1-add_probability:
             if random.random() > 0.5:
                 child_freq = root.freq[0] / 2
             else:
@@ -30,18 +40,18 @@ def symmetry_breaking(root, limit, min_freq=0.01, max_freq=200):
             elif (child_freq < min_freq):
                 child_freq = min_freq
             child_phase = root.phase[0]
-            node = root.add_singularity(child_phase, root.diameter, child_freq, root.colour)
+            node = root.add_singularity(child_phase, root.diameter, child_freq, root.colour)[0]
 
-            for bond in root.bonds:
+            for bond in list(root.world.bonds):
                 if bond.singularity1 == root:
                     node.add_bond(node, bond.singularity2)
                 if bond.singularity2 == root:
                     node.add_bond(node, bond.singularity1)
 
-        elif random.random() > 0.999:
+        elif random.random() > 1-remove_probability:
             if (number_children > 0):
                 root.remove_child(root.children1[0])
-    elif random.random() > 0.9999:
+    elif random.random() > 1-prime_probability:
         if (number_children > 0):
             root.remove_child(root.children1[0])
 
@@ -49,18 +59,21 @@ def symmetry_breaking(root, limit, min_freq=0.01, max_freq=200):
     if (limit > 0):
         for child_node in root.children1:
             if (child_node != None):
-                symmetry_breaking2(child_node,limit)
+                symmetry_breaking2(child_node, limit, min_freq, max_freq, add_probability,
+                                   remove_probability, prime_probability)
     return root
 
 
-def symmetry_breaking2(root, limit, min_freq=0.01, max_freq=200):
+def symmetry_breaking2(root, limit, min_freq=0.01, max_freq=200, add_probability=0.001,
+                       remove_probability=0.001, prime_probability=0.0001):
     """
     Symmetry breaking
+    Probabilities are as symmetry_breaking
     """
     number_children = len(root.children1)
     if (number_children == 0 or is_prime(number_children) == False):
         # Check if symmetry breaking should be applied
-        if random.random() > 0.999:
+        if random.random() > 1-add_probability:
             # Apply symmetry breaking by adding a new child node
             if random.random() > 0.5:
                 child_freq = root.freq[0] / 2
@@ -71,37 +84,201 @@ def symmetry_breaking2(root, limit, min_freq=0.01, max_freq=200):
             elif child_freq < min_freq:
                 child_freq = min_freq
             child_phase = root.phase[0]
-            node = root.add_singularity(child_phase, root.diameter, child_freq, root.colour)
+            node = root.add_singularity(child_phase, root.diameter, child_freq, root.colour)[0]
 
-            for bond in root.bonds:
+            for bond in list(root.world.bonds):
                 if bond.singularity1 == root:
                     node.add_bond(node, bond.singularity2)
                 if bond.singularity2 == root:
                     node.add_bond(node, bond.singularity1)
 
-        elif random.random() > 0.999:
+        elif random.random() > 1-remove_probability:
             # Apply symmetry breaking by removing a child node
             if number_children > 0:
                 root.remove_child(root.children1[0])
 
-    elif random.random() > 0.9999:
+    elif random.random() > 1-prime_probability:
         # Apply symmetry breaking by duplicating a child node
         if number_children > 0:
             child_node = root.children1[0]
             new_node = root.add_singularity(child_node.phase[0], child_node.diameter, child_node.freq[0],
-                                            child_node.colour)
-            for bond in child_node.bonds:
-                new_node.add_bond(new_node, bond.singularity1)
-                new_node.add_bond(new_node, bond.singularity2)
+                                            child_node.colour)[0]
+            for bond in list(child_node.world.bonds):
+                if bond.singularity1 == child_node:
+                    new_node.add_bond(new_node, bond.singularity2)
+                if bond.singularity2 == child_node:
+                    new_node.add_bond(new_node, bond.singularity1)
             # Apply symmetry breaking by rotating the duplicated child node
             angle = random.random() * 360
-            if isinstance(new_node, list):
-                new_node[0].set_phase(angle)
-            else:
-                new_node.set_phase(angle)
+            new_node.set_phase(angle)
     limit -= 1
     if (limit > 0):
         for child_node in root.children1:
             if (child_node != None):
-                symmetry_breaking2(child_node,limit)
-    return root
\ No newline at end of file
+                symmetry_breaking2(child_node, limit, min_freq, max_freq, add_probability,
+                                   remove_probability, prime_probability)
+    return root
+
+
+class SymmetryBreaker(object):
+    """
+    Batched, seeded symmetry breaking of a tree, following the rules of
+    symmetry_breaking at the root and symmetry_breaking2 below it.
+    The decisions of a frame are made for the tree as it was at the start
+    of the frame, so nodes added in a frame are first considered in the
+    next one and nothing is done for nodes whose ancestor was removed.
+    The nodes and their child counts are kept in arrays that are updated
+    with the changes made here, and only rebuilt from the tree when the
+    world topology_version shows it was changed elsewhere.
+    """
+
+    def __init__(self, root, limit=10, seed=None, min_freq=0.01, max_freq=200, add_probability=0.001,
+                 remove_probability=0.001, prime_probability=0.0001):
+        """
+        :param root: The root node of the tree
+        :param limit: Depth limit of the nodes considered
+        :param seed: Seed (or numpy Generator) of the random decisions
+        Other parameters are as symmetry_breaking.
+        """
+        self.root = root
+        self.limit = limit
+        self.rng = np.random.default_rng(seed)
+        self.min_freq = min_freq
+        self.max_freq = max_freq
+        self.add_probability = add_probability
+        self.remove_probability = remove_probability
+        self.prime_probability = prime_probability
+        self.primes = np.array(prime_sieve(64), dtype=bool)
+        self.bond_index = {}
+        self.indexed_bonds = 0
+        self.topology_version = None
+
+    def compile(self):
+        """
+        List the nodes within the depth limit with their depths and numbers
+        of children
+        """
+        nodes = []
+        depths = []
+        for [depth, level] in enumerate(self.root.iter_levels(self.limit)):
+            nodes.extend(level)
+            depths.extend([depth]*len(level))
+        self.nodes = nodes
+        self.depths = np.array(depths, dtype=np.int64)
+        self.counts = np.array([len(node.children1) for node in nodes], dtype=np.int64)
+        self.topology_version = self.root.world.topology_version
+
+    def is_prime_count(self, counts):
+        """
+        Primality of an array of child counts from the lookup table
+        """
+        largest = int(counts.max()) if len(counts) > 0 else 0
+        if (largest >= len(self.primes)):
+            self.primes = np.array(prime_sieve(max(largest, 2*len(self.primes))), dtype=bool)
+        return self.primes[counts]
+
+    def index_bonds(self):
+        """
+        Add bonds appended to the world bond list since the last call to
+        the index of bonds by endpoint
+        """
+        bonds = self.root.world.bonds
+        if (len(bonds) < self.indexed_bonds):
+            self.bond_index = {}
+            self.indexed_bonds = 0
+        for bond in bonds[self.indexed_bonds:]:
+            self.bond_index.setdefault(id(bond.singularity1), []).append(bond)
+            if (bond.singularity2 is not bond.singularity1):
+                self.bond_index.setdefault(id(bond.singularity2), []).append(bond)
+        self.indexed_bonds = len(bonds)
+
+    def bonds_of(self, node):
+        """
+        Bonds with node at either end
+        """
+        return self.bond_index.get(id(node), [])
+
+    def copy_bonds(self, source, node):
+        """
+        Bond node to every singularity that source is bonded to
+        """
+        for bond in list(self.bonds_of(source)):
+            if (bond.singularity1 is source):
+                node.add_bond(node, bond.singularity2)
+            if (bond.singularity2 is source):
+                node.add_bond(node, bond.singularity1)
+
+    def step(self):
+        """
+        One frame of symmetry breaking over the whole tree
+        :return: [added, removed] number of singularities added and removed
+        """
+        if (self.topology_version != self.root.world.topology_version):
+            self.compile()
+        self.index_bonds()
+        nodes = self.nodes
+        counts = self.counts
+        draws = self.rng.random((len(nodes), 3))
+        breaking = (counts == 0) | (self.is_prime_count(counts) == False)
+        add = breaking & (draws[:, 0] > 1-self.add_probability)
+        remove = breaking & (add == False) & (draws[:, 2] > 1-self.remove_probability) & (counts > 0)
+        prime_event = (breaking == False) & (draws[:, 0] > 1-self.prime_probability)
+        # A prime number of children removes one at the root and duplicates one below
+        remove[0] |= prime_event[0]
+        prime_event[0] = False
+
+        # Nodes in the subtrees being removed take no action this frame
+        removed_ids = set()
+        for index in np.flatnonzero(remove).tolist():
+            child_node = nodes[index].children1[0]
+            if (child_node != None):
+                removed_ids.update(id(node) for node in child_node.iter_nodes(float("inf")))
+
+        new_nodes = []
+        new_depths = []
+        added = 0
+        removed = 0
+        for index in np.flatnonzero(add | remove | prime_event).tolist():
+            node = nodes[index]
+            if (id(node) in removed_ids):
+                continue
+            if (remove[index] == True):
+                child_node = node.children1[0]
+                if (child_node != None):
+                    removed += child_node.node_count
+                    child_node.detach()
+                    counts[index] -= 1
+                continue
+            if (add[index] == True):
+                if (draws[index, 1] > 0.5):
+                    child_freq = node.freq[0] / 2
+                else:
+                    child_freq = node.freq[0] * 2
+                child_freq = min(max(child_freq, self.min_freq), self.max_freq)
+                new_node = node.add_singularity(node.phase[0], node.diameter, child_freq, node.colour)[0]
+                self.copy_bonds(node, new_node)
+            else:
+                child_node = node.children1[0]
+                new_node = node.add_singularity(child_node.phase[0], child_node.diameter, child_node.freq[0],
+                                                child_node.colour)[0]
+                self.copy_bonds(child_node, new_node)
+                new_node.set_phase(draws[index, 1] * 360)
+            counts[index] += 1
+            added += 1
+            if (self.depths[index]+1 < self.limit):
+                new_nodes.append(new_node)
+                new_depths.append(self.depths[index]+1)
+
+        # Apply the structural changes to the node arrays
+        if (len(removed_ids) > 0):
+            keep = np.array([id(node) not in removed_ids for node in nodes], dtype=bool)
+            self.nodes = [node for [node, kept] in zip(nodes, keep.tolist()) if kept]
+            self.depths = self.depths[keep]
+            self.counts = counts[keep]
+        if (len(new_nodes) > 0):
+            self.nodes.extend(new_nodes)
+            self.depths = np.concatenate([self.depths, np.array(new_depths, dtype=np.int64)])
+            self.counts = np.concatenate([self.counts, np.zeros(len(new_nodes), dtype=np.int64)])
+        self.topology_version = self.root.world.topology_version
+        self.index_bonds()
+        return [added, removed]
@@ -84,14 +84,30 @@ class Sonic_GML():
     average_note = 50
     average_note2 = 50
 
-    def __init__(self):
+    def __init__(self, world=None):
         """
         Initialise the class
+        :param world: GMLWorld of the tree being played, default_world if not given
         """
+        if (world is None):
+            world = default_world
+        self.world = world
+        # Each session keeps its own note lists rather than sharing the class ones
+        self.notes = []
+        self.notes_volumes = []
+        self.notes_panning = []
+        self.notes_on = []
+        self.notes_on_volumes = []
+        self.notes_on_panning = []
+        self.prev_notes = []
+        self.note_pos = []
+        self.orbit_pos = []
+        self.notes_on_pos = []
+        self.blip_vol = []
         self.chord_size = 100
         for i in range(0, 255):
             self.blip_vol.append(None)
-        self.graphics_helper = GML_graphics_helper()
+        self.graphics_helper = world.graphics_helper
         self.pos_mid = self.graphics_helper.screen_get_mid_position()
 
     def set_pitch_offset(self, pitch_offset):
@@ -300,7 +316,7 @@ class Sonic_GML():
         Draw circles around the singularity points for
         which sound is being made
         """
-        if(self.draw_mode >= 6 and GMLBaseClass.draw_mode < 7):
+        if(self.draw_mode >= 6 and self.world.draw_mode < 7):
             for pos in self.orbit_pos:
                 #Show a blue dot for the cursor
                 pos1 = [pos[0], pos[1]]
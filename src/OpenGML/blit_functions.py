@@ -22,9 +22,25 @@ import numpy as np
 
 import gl_text_drawing as gl
 from graphics_helper import GraphicsHelperBaseClass
+from sprite_atlas import SpriteAtlas, AtlasSprite
 import menu_functions as help_menu_text
 
 class BlitGraphicsHelper(GraphicsHelperBaseClass):
+    """
+    Kivy helper. Singularity sprites are persistent instruction groups held
+    in a node layer canvas and only their positions and angles change from
+    frame to frame. Everything else is drawn into a frame layer canvas which
+    is cleared at the start of each frame.
+    """
+    root_canvas = None
+    node_layer = None
+    frame_layer = None
+    sprites = {}
+    touched = set()
+    atlas = None
+    atlas_texture = None
+    atlas_size = 2048
+    atlas_budget = None
 
     def init(self,window1):
         """
@@ -38,8 +54,117 @@ class BlitGraphicsHelper(GraphicsHelperBaseClass):
         """
         Add the canvas and framebuffer
         """
-        self.canvas = canvas1
+        self.root_canvas = canvas1
         self.fbo = fbo1
+        self.reset_layers()
+
+    def reset_layers(self):
+        """
+        Clear the whole canvas and start new node and frame layers.
+        Only needed when the GML tree is rebuilt or its topology changes.
+        """
+        self.root_canvas.clear()
+        self.node_layer = Canvas()
+        self.frame_layer = Canvas()
+        self.root_canvas.add(self.node_layer)
+        self.root_canvas.add(self.frame_layer)
+        self.canvas = self.frame_layer
+        self.sprites = {}
+        self.touched = set()
+
+    def begin_frame(self):
+        """
+        Clear the per frame instructions, keeping the persistent node sprites
+        """
+        self.frame_layer.clear()
+        self.touched = set()
+        if (self.atlas is not None):
+            self.atlas.begin_frame()
+
+    def end_frame(self):
+        """
+        Remove the sprites of any singularities which were not drawn this frame
+        """
+        for key in list(self.sprites.keys()):
+            if (key not in self.touched):
+                self.node_layer.remove(self.sprites[key][0])
+                del self.sprites[key]
+
+    def place_sprite(self, key, part, pos, angle=0):
+        """
+        Draw a cached blit centred on pos, creating its instructions on first
+        use and afterwards only updating the position, angle and texture
+        :param key: Cache pointer of the singularity
+        :param part: [r1, r2, fbo] as returned by the create blit functions
+        :param pos: Centre position
+        :param angle: Rotation about the centre in degrees
+        """
+        r1 = part[0]
+        r2 = part[1]
+        rect_pos = (pos[0]-r1, pos[1]-r2)
+        if (key not in self.sprites):
+            group = InstructionGroup()
+            group.add(PushMatrix())
+            rotate = Rotate(angle=angle, origin=(pos[0], pos[1]))
+            group.add(rotate)
+            group.add(Color(1, 1, 1, 1))
+            rect = Rectangle(pos=rect_pos, size=(2*r1, 2*r2), texture=part[2].texture)
+            group.add(rect)
+            group.add(PopMatrix())
+            self.node_layer.add(group)
+            self.sprites[key] = [group, rotate, rect]
+        else:
+            [group, rotate, rect] = self.sprites[key]
+            rotate.angle = angle
+            rotate.origin = (pos[0], pos[1])
+            rect.pos = rect_pos
+            if (rect.texture is not part[2].texture):
+                rect.texture = part[2].texture
+                rect.size = (2*r1, 2*r2)
+        self.touched.add(key)
+
+    def sprite_atlas(self):
+        """
+        Return the shared sprite atlas, creating its texture on first use
+        """
+        if (self.atlas is None):
+            self.atlas = SpriteAtlas(self.atlas_size, self.atlas_size, self.atlas_budget)
+            self.atlas_texture = Texture.create(size=(self.atlas_size, self.atlas_size), colorfmt='rgba')
+        return self.atlas
+
+    def get_sprite(self, key):
+        """
+        Return the blit for a sprite key from the atlas, or from the
+        image cache for sprites too large for the atlas
+        """
+        part = self.image_cache.get(key)
+        if (part is not None):
+            return part
+        return self.sprite_atlas().get(key)
+
+    def store_sprite(self, key, part):
+        """
+        Copy a newly rendered blit into the atlas so the Fbo can be released.
+        Only sprites too large for the atlas are kept in the image cache. A
+        sprite that does not fit this frame is not cached, it is rendered
+        again and retried on a later frame.
+        """
+        if (part is None):
+            return None
+        fbo = part[2]
+        [width, height] = fbo.texture.size
+        atlas = self.sprite_atlas()
+        if (atlas.can_hold(width, height) == False):
+            self.image_cache[key] = part
+            return part
+        region = atlas.put(key, width, height)
+        if (region is None):
+            return part
+        self.atlas_texture.blit_buffer(fbo.pixels, pos=(region[0], region[1]), size=(width, height),
+                                       colorfmt='rgba', bufferfmt='ubyte')
+        sprite = [part[0], part[1], AtlasSprite(self.atlas_texture.get_region(*region), region)]
+        self.atlas.set_value(key, sprite)
+        return sprite
 
     def screen_clear(self):
         """
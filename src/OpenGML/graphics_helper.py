@@ -15,6 +15,7 @@ from scipy.stats import norm
 import scipy.spatial
 from scipy.spatial import HalfspaceIntersection
 import cdd as pcdd # Requires the pycddlib
+from sprite_atlas import sprite_key, key_radius
 
 class GraphicsHelperBaseClass(object):
     screen = None
@@ -38,7 +39,7 @@ class GraphicsHelperBaseClass(object):
         """
         self.window = window1
         self.screen_width, self.screen_height = self.window.size
-        self.image_cache = [None, None, None, None, None, None, None, None]
+        self.image_cache = {}
 
 
     def screen_get_screen_size(self):
@@ -103,15 +104,41 @@ class GraphicsHelperBaseClass(object):
 
     def create_circle(self, cache_pointer, pos, diameter, line_width, colour, transparent_colour, transparency, gears, phase):
         """
-        Create a circle
+        Create a circle. The rendered blit is shared by every circle
+        with the same quantised size, colour and style.
         """
-        if (cache_pointer in self.image_cache.keys()):
-            self.plot_centre_blit(self.image_cache[cache_pointer], pos)
+        key = sprite_key("circle", diameter, colour, line_width, gears)
+        part = self.get_sprite(key)
+        if (part is not None):
+            self.place_sprite(cache_pointer, part, pos)
         else:
-            self.image_cache[cache_pointer] = self.create_circular_blit(
-                pos, diameter, line_width, colour, transparent_colour, transparency, gears, phase)
+            self.store_sprite(key, self.create_circular_blit(
+                pos, key_radius(key), line_width, colour, transparent_colour, transparency, gears, phase))
         return
 
+    def get_sprite(self, key):
+        """
+        Return the cached blit for a sprite key or None
+        """
+        return self.image_cache.get(key)
+
+    def store_sprite(self, key, part):
+        """
+        Cache a newly created blit under its sprite key
+        """
+        if (part is not None):
+            self.image_cache[key] = part
+        return part
+
+    def place_sprite(self, cache_pointer, part, pos, angle=0):
+        """
+        Plot a cached blit centred on pos for the singularity owning cache_pointer
+        """
+        if (angle != 0):
+            self.plot_rotated_centre_blit(part, pos, angle)
+        else:
+            self.plot_centre_blit(part, pos)
+
     def create_sphere(self, cache_pointer, pos, diameter, line_width, colour, transparent_colour, transparency, gears, phase):
         """
         Create a sphere
@@ -167,6 +194,31 @@ class GraphicsHelperBaseClass(object):
         return None
 
 
+    def flush(self):
+        """
+        Prototype method to draw any geometry retained during the frame
+        """
+        return None
+
+    def reset_layers(self):
+        """
+        Prototype method to discard all persistent drawing instructions
+        """
+        return None
+
+    def begin_frame(self):
+        """
+        Prototype method called before a frame is drawn
+        """
+        return None
+
+    def end_frame(self):
+        """
+        Prototype method called after a frame is drawn
+        """
+        return None
+
+
     def plot_gaussian(self,x_offset, y_offset, height, colour, transparency, width,max_phases, raw_x_offset=0, xscale=600, screen=None):
         xy_plot = []
         x_axis_length=1000
@@ -228,19 +280,24 @@ class GraphicsHelperBaseClass(object):
 
     def draw_singularity(self,cache_pointer0,cache_pointer1,mypos,mypos2,orbit_radius,phase,angle_offset,colour,draw_mode,is_spiral,spiral_rotates,spiral_mode,spiral_rate,max_r):
         if(draw_mode >= 2 and draw_mode < 7):
-            if (cache_pointer0 in self.image_cache.keys()):
+            #Blits are shared between singularities that look the same
+            if(is_spiral):
+                key = sprite_key("spiral", orbit_radius, colour, 2, False, spiral_rate, spiral_mode, angle_offset)
+            else:
+                key = sprite_key("circle", orbit_radius, colour, 2, False)
+            part = self.get_sprite(key)
+            if (part is not None):
                 if(is_spiral and spiral_rotates != 0):
-                    self.plot_rotated_centre_blit(
-                        self.image_cache[cache_pointer0], mypos2, phase*spiral_rotates)
+                    self.place_sprite(cache_pointer0, part, mypos2, phase*spiral_rotates)
                 else:
-                    self.plot_centre_blit(self.image_cache[cache_pointer0], mypos2)
+                    self.place_sprite(cache_pointer0, part, mypos2)
             else:
                 if(is_spiral):
-                    self.image_cache[cache_pointer0] = self.create_spiral_blit(mypos2, orbit_radius, 2, colour, [
-                                                             0, 0, 0], 200, False, phase, spiral_rate, spiral_mode, angle_offset)
+                    self.store_sprite(key, self.create_spiral_blit(mypos2, key_radius(key), 2, colour, [
+                                                             0, 0, 0], 200, False, phase, spiral_rate, spiral_mode, angle_offset))
                 else:
-                    self.image_cache[cache_pointer0] = self.create_circular_blit(
-                        mypos2, orbit_radius, 2, colour, [0, 0, 0], 200, False, phase)
+                    self.store_sprite(key, self.create_circular_blit(
+                        mypos2, key_radius(key), 2, colour, [0, 0, 0], 200, False, phase))
             self.create_sphere(cache_pointer0, mypos2, orbit_radius, 2, colour, [0, 0, 0], 200, False, phase)
         elif(draw_mode >= 7):
             self.create_circle(cache_pointer1, mypos, orbit_radius-max_r, 4,  colour, [0, 0, 0], 200, True, phase)
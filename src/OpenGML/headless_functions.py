@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created By  : Martin Timms
+# Created Date: 18th October 2026
+# License: BSD-3-Clause License
+# Organisation: OpenGML.org/
+# Project: https://github.com/Electro-resonance/OpenGML
+# Description: Helper functions for headless rendering without a display
+# Circles, lines, polygons and stars are rasterised into a NumPy RGBA
+# framebuffer which can be saved as PNG images (with Pillow) or written as
+# raw video frames. Coordinates follow the Kivy convention of the origin at
+# the bottom left of the screen. 3D trees are drawn as a plan view.
+# =============================================================================
+
+import math
+import numpy as np
+from graphics_helper import GraphicsHelperBaseClass
+
+
+class HeadlessGraphicsHelper(GraphicsHelperBaseClass):
+    """
+    Graphics helper drawing into an offscreen NumPy framebuffer
+    """
+    BACKGROUND = [0, 0, 0, 255]
+    sprite_background = [0, 0, 0, 0]
+    frame = None
+
+    def init(self, window1=None, size=(800, 800)):
+        """
+        Create the framebuffer
+        :param window1: Optional object with a size attribute, as passed by the apps
+        :param size: (width, height) in pixels when no window is given
+        """
+        self.window = window1
+        if (window1 is not None):
+            size = window1.size
+        self.screen_width = int(size[0])
+        self.screen_height = int(size[1])
+        self.image_cache = {}
+        self.frame = np.zeros((self.screen_height, self.screen_width, 4), dtype=np.float32)
+        self.screen_clear()
+
+    def screen_clear(self):
+        """
+        Clear the framebuffer to the background colour
+        """
+        self.frame[:, :] = np.array(self.BACKGROUND, dtype=np.float32)/255
+
+    # ---------------------------------------------------------------------
+    # Rasterising primitives. Each works on the bounding box of the shape.
+    # ---------------------------------------------------------------------
+
+    def bounding_box(self, target, x_min, y_min, x_max, y_max):
+        """
+        Clip a bounding box to a target array
+        :return: [x0, y0, x1, y1, xs, ys] with pixel centre coordinate grids,
+        or None if the box is outside the target
+        """
+        height, width = target.shape[0], target.shape[1]
+        x0 = max(int(math.floor(x_min)), 0)
+        y0 = max(int(math.floor(y_min)), 0)
+        x1 = min(int(math.ceil(x_max))+1, width)
+        y1 = min(int(math.ceil(y_max))+1, height)
+        if (x0 >= x1 or y0 >= y1):
+            return None
+        ys, xs = np.mgrid[y0:y1, x0:x1]
+        return [x0, y0, x1, y1, xs+0.5, ys+0.5]
+
+    def blend(self, target, x0, y0, mask, colour):
+        """
+        Composite a solid colour over the masked pixels of a target
+        :param colour: [r,g,b,a] in the range 0 to 1
+        """
+        if (not np.any(mask)):
+            return
+        region = target[y0:y0+mask.shape[0], x0:x0+mask.shape[1]]
+        alpha = colour[3]
+        pixels = region[mask]
+        pixels[:, 0:3] = np.array(colour[0:3], dtype=np.float32)*alpha+pixels[:, 0:3]*(1-alpha)
+        pixels[:, 3] = alpha+pixels[:, 3]*(1-alpha)
+        region[mask] = pixels
+
+    def draw_circle(self, target, cx, cy, r, width, colour):
+        """
+        Draw a circle outline of the given line width, or a filled disc if width is 0
+        """
+        r = abs(r)
+        reach = r+width/2+1
+        box = self.bounding_box(target, cx-reach, cy-reach, cx+reach, cy+reach)
+        if (box is None):
+            return
+        [x0, y0, x1, y1, xs, ys] = box
+        distance = np.hypot(xs-cx, ys-cy)
+        if (width <= 0):
+            mask = distance <= r
+        else:
+            mask = np.abs(distance-r) <= max(width/2, 0.5)
+        self.blend(target, x0, y0, mask, colour)
+
+    def draw_segment(self, target, xa, ya, xb, yb, width, colour):
+        """
+        Draw a straight line with round ends
+        """
+        half = max(width/2, 0.5)
+        box = self.bounding_box(target, min(xa, xb)-half, min(ya, yb)-half, max(xa, xb)+half, max(ya, yb)+half)
+        if (box is None):
+            return
+        [x0, y0, x1, y1, xs, ys] = box
+        dx = xb-xa
+        dy = yb-ya
+        length2 = dx*dx+dy*dy
+        if (length2 == 0):
+            t = 0
+        else:
+            t = np.clip(((xs-xa)*dx+(ys-ya)*dy)/length2, 0, 1)
+        distance = np.hypot(xs-(xa+t*dx), ys-(ya+t*dy))
+        self.blend(target, x0, y0, distance <= half, colour)
+
+    def draw_polyline(self, target, points, width, colour):
+        """
+        Draw connected line segments through a flat [x0,y0,x1,y1,...] list
+        """
+        for i in range(1, len(points)//2):
+            self.draw_segment(target, points[2*i-2], points[2*i-1], points[2*i], points[2*i+1], width, colour)
+
+    def draw_polygon(self, target, points, colour):
+        """
+        Fill a polygon given as a flat [x0,y0,x1,y1,...] list (even-odd rule)
+        """
+        xy = np.asarray(points, dtype=np.float64)[:2*(len(points)//2)].reshape(-1, 2)
+        if (len(xy) < 3):
+            return
+        box = self.bounding_box(target, xy[:, 0].min(), xy[:, 1].min(), xy[:, 0].max(), xy[:, 1].max())
+        if (box is None):
+            return
+        [x0, y0, x1, y1, xs, ys] = box
+        inside = np.zeros(xs.shape, dtype=bool)
+        xj, yj = xy[-1]
+        for xi, yi in xy:
+            if (yi != yj):
+                crosses = ((yi > ys) != (yj > ys)) & (xs < (xj-xi)*(ys-yi)/(yj-yi)+xi)
+                inside ^= crosses
+            xj, yj = xi, yi
+        self.blend(target, x0, y0, inside, colour)
+
+    def composite(self, sprite, cx, cy, angle=0):
+        """
+        Draw an RGBA sprite centred on cx,cy, rotated anticlockwise by angle degrees
+        """
+        sprite_height, sprite_width = sprite.shape[0], sprite.shape[1]
+        if (angle != 0):
+            reach = math.hypot(sprite_width, sprite_height)/2
+        else:
+            reach = max(sprite_width, sprite_height)/2
+        box = self.bounding_box(self.frame, cx-reach, cy-reach, cx+reach, cy+reach)
+        if (box is None):
+            return
+        [x0, y0, x1, y1, xs, ys] = box
+        dx = xs-cx
+        dy = ys-cy
+        if (angle != 0):
+            c = math.cos(math.radians(angle))
+            s = math.sin(math.radians(angle))
+            dx, dy = c*dx+s*dy, -s*dx+c*dy
+        u = np.floor(dx+sprite_width/2).astype(int)
+        v = np.floor(dy+sprite_height/2).astype(int)
+        valid = (u >= 0) & (u < sprite_width) & (v >= 0) & (v < sprite_height)
+        if (not np.any(valid)):
+            return
+        source = np.zeros(xs.shape+(4,), dtype=np.float32)
+        source[valid] = sprite[v[valid], u[valid]]
+        alpha = source[:, :, 3:4]
+        region = self.frame[y0:y1, x0:x1]
+        region[:, :, 0:3] = source[:, :, 0:3]*alpha+region[:, :, 0:3]*(1-alpha)
+        region[:, :, 3:4] = alpha+region[:, :, 3:4]*(1-alpha)
+
+    def new_sprite(self, r_over):
+        """
+        Create an empty sprite big enough for a circle of radius r_over
+        """
+        size = max(int(math.ceil(2*r_over)), 1)
+        sprite = np.zeros((size, size, 4), dtype=np.float32)
+        sprite[:, :] = np.array(self.sprite_background, dtype=np.float32)/255
+        return sprite
+
+    # ---------------------------------------------------------------------
+    # GraphicsHelperBaseClass interface
+    # ---------------------------------------------------------------------
+
+    def create_spiral_blit(self, pos, r, line_width, colour, transparent_colour, transparency, gears, phase, spiral_rate, spiral_mode, extra_angle):
+        """
+        Create blit with spiral
+        """
+        if(r < 1):
+            r = 1
+        r_over = r*1.4
+        sprite = self.new_sprite(r_over)
+        rgba = [colour[0]/256, colour[1]/256, colour[2]/256, 1.0]
+        if(line_width == 0):
+            self.draw_circle(sprite, r_over, r_over, r/2, r/2, rgba)
+        else:
+            points = []
+            for j in range(0, 722):
+                k = j/2
+                ph = k*spiral_rate
+                if(spiral_mode == 1):
+                    r1 = abs(k/180-1)*r
+                elif(spiral_mode == 2):
+                    r1 = (k/180-1)*r
+                    if(k >= 180):
+                        ph = -ph
+                elif(spiral_mode == 3):
+                    if(k >= 180):
+                        k2 = (360-k)*2
+                    else:
+                        k2 = k*2
+                    r1 = (k2/180-1)*r
+                    if(k2 >= 180):
+                        ph = -ph
+                else:
+                    r1 = k/360*r
+                if(extra_angle != 0):
+                    if(r1 > 0):
+                        ph = ph+extra_angle
+                points.extend((r1*math.cos(ph/180*math.pi)+r_over, r1*math.sin(ph/180*math.pi)+r_over))
+            self.draw_polyline(sprite, points, 2.0, rgba)
+        part = [r_over, r_over, sprite]
+        self.plot_centre_blit(part, pos)
+        return part
+
+    def create_circular_blit(self, pos, r, line_width, colour, transparent_colour, transparency, gears, phase):
+        """
+        Create blit with circle
+        """
+        if(r < 1):
+            r = 1
+        if(gears == True):
+            r = r*1.3
+            r_over = r
+        else:
+            r_over = r*1.4
+        sprite = self.new_sprite(r_over)
+        rgba = [colour[0]/256, colour[1]/256, colour[2]/256, 1.0]
+        if(line_width == 0):
+            self.draw_circle(sprite, r_over, r_over, r/2, r/2, rgba)
+        elif(gears == True):
+            self.draw_circle(sprite, r, r, r, line_width, rgba)
+            spokes = int((r/20)+3)
+            for k in range(1, spokes+3):
+                x1 = 0.48*r*math.cos(2*math.pi*k/spokes) + r
+                y1 = 0.48*r*math.sin(2*math.pi*k/spokes) + r
+                if(spokes > 6):
+                    x2 = 0.98*r*math.cos(2*math.pi*k/spokes) + r
+                    y2 = 0.98*r*math.sin(2*math.pi*k/spokes) + r
+                    self.draw_segment(sprite, r, r, x2, y2, 10, rgba)
+                    self.draw_circle(sprite, x1, y1, int(r/2), 4, rgba)
+        else:
+            self.draw_circle(sprite, r_over, r_over, r, 2.0, rgba)
+        part = [r_over, r_over, sprite]
+        if(gears == True):
+            self.plot_rotated_centre_blit(part, pos, phase)
+        else:
+            self.plot_centre_blit(part, pos)
+        return part
+
+    def create_star_blit(self, pos, r, thickness, colour, transparent_colour, transparency):
+        """
+        Create blit with star
+        create_star_blit(pos,100,5,[255,0,0],[0,0,0],1.0)
+        """
+        if(r < 1):
+            r = 1
+        sprite = self.new_sprite(r)
+        points = []
+        for k in range(6):
+            points.extend((r*math.cos(4*math.pi*k/5 + 0.5*math.pi) + r,
+                           r*math.sin(4*math.pi*k/5 + 0.5*math.pi) + r))
+        self.draw_polyline(sprite, points, thickness, [colour[0], colour[1], colour[2], transparency])
+        part = [r, r, sprite]
+        self.plot_centre_blit(part, pos)
+        return part
+
+    def create_sphere(self, cache_pointer, pos, diameter, line_width, colour, transparent_colour, transparency, gears, phase):
+        """
+        Spheres are drawn as circles by the plan view
+        """
+        return None
+
+    def plot_centre_blit(self, part, pos):
+        """
+        Plot an area preserving centre of the image
+        """
+        self.composite(part[2], pos[0], pos[1])
+        return [part[0], part[1], part]
+
+    def plot_rotated_blit(self, part, pos, angle, ellipse_mask=False, transparency=1.0):
+        """
+        Plot an area after rotating about its corner
+        """
+        self.composite(part[2], pos[0]+part[0], pos[1]+part[1], angle)
+        return [part[0], part[1], part]
+
+    def plot_rotated_centre_blit(self, part, pos, angle, ellipse_mask=False, transpareny=1.0):
+        """
+        Plot an area after rotating preserving centre of the image
+        """
+        self.composite(part[2], pos[0], pos[1], angle)
+        return [part[0], part[1], part]
+
+    def plot_lines(self, line_points, colour, transparency=0.5, line_width=1.0, avg_height=1.0, screen=None, stipple=False, polygons=False):
+        """
+        Plot a line, or a filled polygon
+        """
+        if(polygons == True and len(line_points) > 6):
+            self.draw_polygon(self.frame, line_points, [colour[0], colour[1], colour[2], transparency])
+        else:
+            self.draw_polyline(self.frame, line_points, line_width, [colour[0], colour[1], colour[2], 1.0])
+
+    def plot_lines_3D(self, line_points, colour, transparency, line_width=1.0, screen=None, stipple=False, polygons=False, edge_sequence=[], plot_mode=0):
+        """
+        Plot the plan view of a set of 3D lines. Edge sequences are used
+        when supplied (plot_mode 2), otherwise the points are joined in order.
+        """
+        xy = np.asarray(line_points, dtype=np.float64)[:3*(len(line_points)//3)].reshape(-1, 3)[:, 0:2]
+        rgba = [1.0, 1.0, 1.0, 0.7]
+        if (plot_mode == 2 and edge_sequence is not None and len(edge_sequence) > 0 and len(xy) > 3):
+            for edge in edge_sequence:
+                pairs = np.rint(np.asarray(edge, dtype=np.float64)).astype(int).reshape(-1, 2)
+                for [a, b] in pairs:
+                    if (a >= len(xy)):
+                        a -= len(xy)
+                    if (b >= len(xy)):
+                        b -= len(xy)
+                    if (a < len(xy) and b < len(xy)):
+                        self.draw_segment(self.frame, xy[a, 0], xy[a, 1], xy[b, 0], xy[b, 1], line_width, rgba)
+        elif (polygons == True):
+            self.draw_polygon(self.frame, xy.reshape(-1), [1.0, 1.0, 1.0, 0.3])
+        else:
+            self.draw_polyline(self.frame, xy.reshape(-1), line_width, rgba)
+
+    def frame_rgba(self):
+        """
+        Return the framebuffer as top-down 8 bit RGBA rows
+        """
+        return (np.clip(self.frame[::-1], 0, 1)*255+0.5).astype(np.uint8)
+
+    def save_png(self, path):
+        """
+        Save the framebuffer as a PNG image (requires Pillow)
+        """
+        from PIL import Image
+        Image.fromarray(self.frame_rgba(), "RGBA").save(path)
+
+    def write_raw(self, stream, pixel_format="rgb24"):
+        """
+        Append the framebuffer to a binary stream as a raw video frame
+        :param pixel_format: "rgb24" or "rgba"
+        """
+        pixels = self.frame_rgba()
+        if (pixel_format == "rgb24"):
+            pixels = pixels[:, :, 0:3]
+        stream.write(np.ascontiguousarray(pixels).tobytes())
@@ -17,6 +17,19 @@ import scipy.spatial
 #rom scipy.spatial import Delaunay
 #from scipy.spatial import HalfspaceIntersection
 
+# Number type used by pycddlib for the exact convex hull. "fraction" is exact
+# rational arithmetic, "float" is much faster and adequate for drawing
+cdd_number_type = "fraction"
+
+def set_cdd_number_type(number_type):
+    """
+    Select "fraction" or "float" arithmetic for vertices_to_edge_sequence
+    """
+    global cdd_number_type
+    if (number_type not in ("fraction", "float")):
+        raise ValueError("cdd number type must be 'fraction' or 'float'")
+    cdd_number_type = number_type
+
 def point_list_to_array(point_list):
     # Prepend a column of ones as required by convex hull with cdd
     edges_list = []
@@ -79,13 +92,16 @@ def pre_check_polytope(points,list_format=True,verbose=False):
         print("Process Points:", points)
     return [points3,vertice_count]
 
-def vertices_to_edge_sequence(points, list_format=True, verbose=False):
+def vertices_to_edge_sequence(points, list_format=True, verbose=False, number_type=None):
     """
     Calculate the sequence of edges for a given list of vertices
     See: https://stackoverflow.com/questions/27270477/3d-convex-hull-from-point-cloud
     :param vertices:
+    :param number_type: "fraction" or "float", defaults to cdd_number_type
     :return:
     """
+    if (number_type is None):
+        number_type = cdd_number_type
     [points,vertice_count] = pre_check_polytope(points, list_format, verbose)
     if (points is None):
         return None
@@ -94,7 +110,7 @@ def vertices_to_edge_sequence(points, list_format=True, verbose=False):
     vertices = np.hstack((np.ones((vertice_count, 1)), points))
 
     # Perform the convex hull on the polyhedron
-    mat = pcdd.Matrix(vertices, linear=False, number_type="fraction")
+    mat = pcdd.Matrix(vertices, linear=False, number_type=number_type)
     mat.rep_type = pcdd.RepType.GENERATOR
     poly = pcdd.Polyhedron(mat)
 
@@ -174,4 +190,4 @@ def basic_vertices_to_edge_sequence(points, list_format=True, verbose=False):
     if(verbose==True):
         # print the array of vertices without diagonals
         print("Basic poytope", vertices_no_diag, len(vertices_no_diag))
-    return vertices_no_diag
\ No newline at end of file
+    return vertices_no_diag
\ No newline at end of file
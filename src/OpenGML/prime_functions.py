@@ -73,6 +73,19 @@ def is_prime_cached(num):
             prime_cache[num] = True
     return prime_cache[num]
 
+def prime_sieve(n):
+    """
+    Sieve of Eratosthenes, a lookup table of the primes up to n
+    :param n: Largest number to include
+    :return: list where entry i is True if i is prime, for i from 0 to n
+    """
+    sieve = bytearray([1]) * (n + 1)
+    sieve[0:2] = bytearray(min(2, n + 1))
+    for i in range(2, int(n**0.5) + 1):
+        if sieve[i]:
+            sieve[i*i::i] = bytearray(len(range(i*i, n + 1, i)))
+    return [flag == 1 for flag in sieve]
+
 
 def generate_pattern_of_primes(n):
     """
@@ -9,6 +9,7 @@
 # =============================================================================
 
 import math
+import ctypes
 import trig_tables as trig
 
 import numpy as np
@@ -21,13 +22,135 @@ from pygame.locals import *
 from OpenGL.GL import *
 from OpenGL.GLUT import *
 from OpenGL.GLU import *
+from OpenGL.GL import shaders
 from PIL import *
 from PIL import Image
 import numpy
 
 import menu_functions as help_menu_text
 
+# Interleaved vertex layout of the retained buffers: x, y, z, r, g, b, a
+VERTEX_FLOATS = 7
+VERTEX_STRIDE = VERTEX_FLOATS * 4
+
+# Per instance layout of the sphere buffer: x, y, z, radius, r, g, b, a
+INSTANCE_FLOATS = 8
+INSTANCE_STRIDE = INSTANCE_FLOATS * 4
+
+SPHERE_VERTEX_SHADER = """
+#version 120
+attribute vec3 vertex;
+attribute vec4 instance_position;
+attribute vec4 instance_colour;
+varying vec4 colour;
+void main()
+{
+    colour = instance_colour;
+    gl_Position = gl_ModelViewProjectionMatrix * vec4(vertex * instance_position.w + instance_position.xyz, 1.0);
+}
+"""
+
+SPHERE_FRAGMENT_SHADER = """
+#version 120
+varying vec4 colour;
+void main()
+{
+    gl_FragColor = colour;
+}
+"""
+
+def unit_sphere_mesh(slices, stacks):
+    """
+    Triangle list for a sphere of radius 1 centred on the origin
+    :param slices: Subdivisions around the axis
+    :param stacks: Subdivisions along the axis
+    :return: float32 array of [x,y,z] rows, three rows per triangle
+    """
+    theta = np.linspace(0, math.pi, stacks+1)
+    phi = np.linspace(0, 2*math.pi, slices+1)
+    grid = np.empty((stacks+1, slices+1, 3), dtype=np.float64)
+    grid[:, :, 0] = np.outer(np.sin(theta), np.cos(phi))
+    grid[:, :, 1] = np.outer(np.sin(theta), np.sin(phi))
+    grid[:, :, 2] = np.cos(theta)[:, None]
+    corner00 = grid[:-1, :-1].reshape(-1, 3)
+    corner01 = grid[:-1, 1:].reshape(-1, 3)
+    corner10 = grid[1:, :-1].reshape(-1, 3)
+    corner11 = grid[1:, 1:].reshape(-1, 3)
+    triangles = np.stack((corner00, corner10, corner11, corner00, corner11, corner01), axis=1)
+    return np.ascontiguousarray(triangles.reshape(-1, 3), dtype=np.float32)
+
+def gl_vertices(line_points, height=None):
+    """
+    Convert a flat list of GML x,y,z positions into OpenGL scene coordinates
+    :param line_points: Flat list or array of positions
+    :param height: If given the points are x,y pairs drawn at this height
+    :return: Array of [x,y,z] rows
+    """
+    if (height is None):
+        points = np.asarray(line_points, dtype=np.float64).reshape(-1, 3)
+        z = points[:, 2]
+    else:
+        points = np.asarray(line_points, dtype=np.float64).reshape(-1, 2)
+        z = np.full(len(points), height, dtype=np.float64)
+    return np.column_stack((points[:, 0]*2/256, (z*2-400)/256, (points[:, 1]*2-400)/256))
+
+def edge_pairs(edge_sequence):
+    """
+    Flatten an edge sequence (a list of edges, or a list of faces holding
+    edges) into an array of vertex index pairs
+    :return: [pairs, edge_ids] where edge_ids gives the outer edge or face
+    index of each pair, used for the fading edge colours
+    """
+    try:
+        edges = np.rint(np.asarray(edge_sequence, dtype=np.float64)).astype(int)
+    except ValueError:
+        edges = None
+    if (edges is not None and edges.ndim >= 2 and edges.shape[-1] == 2):
+        per_edge = int(np.prod(edges.shape[1:-1]))
+        pairs = edges.reshape(-1, 2)
+        edge_ids = np.repeat(np.arange(len(edges)), per_edge)
+        return [pairs, edge_ids]
+    #Ragged faces are flattened one edge at a time
+    pairs = []
+    edge_ids = []
+    for edge_id in range(len(edge_sequence)):
+        edge = np.rint(np.asarray(edge_sequence[edge_id], dtype=np.float64)).astype(int).reshape(-1, 2)
+        pairs.append(edge)
+        edge_ids.append(np.full(len(edge), edge_id))
+    if (len(pairs) == 0):
+        return [np.zeros((0, 2), dtype=int), np.zeros(0, dtype=int)]
+    return [np.vstack(pairs), np.concatenate(edge_ids)]
+
+def fan_triangles(vertices):
+    """
+    Triangulate a polygon vertex sequence as a fan around its first vertex,
+    matching the filled area of GL_POLYGON
+    """
+    count = len(vertices)
+    if (count < 3):
+        return vertices[:0]
+    index = np.empty((count-2, 3), dtype=int)
+    index[:, 0] = 0
+    index[:, 1] = np.arange(1, count-1)
+    index[:, 2] = np.arange(2, count)
+    return vertices[index.reshape(-1)]
+
+
 class PygameGraphicsHelper(GraphicsHelperBaseClass):
+    """
+    OpenGL helper for Pygame. Lines and polygons are retained for the frame
+    and drawn from one vertex buffer object when flush is called.
+    """
+    vbo = None
+    batches = {}
+    sphere_instances = []
+    sphere_slices = 24
+    sphere_stacks = 16
+    sphere_program = None
+    sphere_mesh_vbo = None
+    sphere_mesh_count = 0
+    sphere_instance_vbo = None
+    instancing = None
 
     def init(self,window1):
         """
@@ -43,6 +166,152 @@ class PygameGraphicsHelper(GraphicsHelperBaseClass):
         #self.data=np.empty([256,256,3], dtype=int)
         self.data = np.empty([256,256,3], dtype=np.int)
         self.make_texture()
+        self.reset_batches()
+
+    def reset_batches(self):
+        """
+        Empty the retained geometry for the next frame
+        """
+        self.batches = {}
+        self.sphere_instances = []
+
+    def add_batch(self, primitive, line_width, stipple, vertices, colours):
+        """
+        Append vertices with per vertex colours to the retained geometry
+        :param primitive: GL_LINES or GL_TRIANGLES
+        :param vertices: Array of [x,y,z] rows in scene coordinates
+        :param colours: Array of [r,g,b,a] rows (or one row for all vertices)
+        """
+        if (len(vertices) == 0):
+            return
+        data = np.empty((len(vertices), VERTEX_FLOATS), dtype=np.float32)
+        data[:, 0:3] = vertices
+        data[:, 3:7] = colours
+        key = (primitive, line_width, stipple)
+        if (key not in self.batches):
+            self.batches[key] = []
+        self.batches[key].append(data)
+
+    def flush(self):
+        """
+        Upload all of the retained line and polygon vertices for this frame
+        into one interleaved vertex buffer and draw each batch with glDrawArrays,
+        then draw all of the singularity spheres
+        """
+        self.flush_lines()
+        self.flush_spheres()
+        self.reset_batches()
+
+    def flush_lines(self):
+        """
+        Draw the retained line and polygon batches
+        """
+        if (len(self.batches) == 0):
+            return
+        keys = list(self.batches.keys())
+        blocks = [np.concatenate(self.batches[key]) for key in keys]
+        data = np.ascontiguousarray(np.concatenate(blocks), dtype=np.float32)
+        if (self.vbo is None):
+            self.vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_STREAM_DRAW)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+        glVertexPointer(3, GL_FLOAT, VERTEX_STRIDE, ctypes.c_void_p(0))
+        glColorPointer(4, GL_FLOAT, VERTEX_STRIDE, ctypes.c_void_p(12))
+        first = 0
+        for index in range(len(keys)):
+            [primitive, line_width, stipple] = keys[index]
+            count = len(blocks[index])
+            if (primitive == GL_LINES):
+                glLineWidth(line_width)
+                if (stipple == True):
+                    glLineStipple(1, 0x3F07)
+                    glEnable(GL_LINE_STIPPLE)
+            else:
+                glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+            glDrawArrays(primitive, first, count)
+            if (stipple == True):
+                glDisable(GL_LINE_STIPPLE)
+            first += count
+        glDisableClientState(GL_COLOR_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def init_instancing(self):
+        """
+        Compile the sphere shader and upload the unit sphere mesh. Returns
+        False if the OpenGL context does not support instanced drawing.
+        """
+        if (self.instancing is not None):
+            return self.instancing
+        self.instancing = False
+        if (not bool(glDrawArraysInstanced) or not bool(glVertexAttribDivisor)):
+            return False
+        try:
+            self.sphere_program = shaders.compileProgram(
+                shaders.compileShader(SPHERE_VERTEX_SHADER, GL_VERTEX_SHADER),
+                shaders.compileShader(SPHERE_FRAGMENT_SHADER, GL_FRAGMENT_SHADER))
+        except Exception as e:
+            print("Sphere shader error, using quadric spheres: ", e)
+            return False
+        mesh = unit_sphere_mesh(self.sphere_slices, self.sphere_stacks)
+        self.sphere_mesh_count = len(mesh)
+        [self.sphere_mesh_vbo, self.sphere_instance_vbo] = glGenBuffers(2)
+        glBindBuffer(GL_ARRAY_BUFFER, self.sphere_mesh_vbo)
+        glBufferData(GL_ARRAY_BUFFER, mesh.nbytes, mesh, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.attribute_vertex = glGetAttribLocation(self.sphere_program, "vertex")
+        self.attribute_position = glGetAttribLocation(self.sphere_program, "instance_position")
+        self.attribute_colour = glGetAttribLocation(self.sphere_program, "instance_colour")
+        self.instancing = True
+        return True
+
+    def flush_spheres(self):
+        """
+        Draw every sphere added this frame with one instanced draw call,
+        falling back to one GLU quadric per sphere without instancing support
+        """
+        if (len(self.sphere_instances) == 0):
+            return
+        data = np.array(self.sphere_instances, dtype=np.float32)
+        if (self.init_instancing() == False):
+            self.draw_quadric_spheres(data)
+            return
+        glUseProgram(self.sphere_program)
+        glBindBuffer(GL_ARRAY_BUFFER, self.sphere_mesh_vbo)
+        glEnableVertexAttribArray(self.attribute_vertex)
+        glVertexAttribPointer(self.attribute_vertex, 3, GL_FLOAT, GL_FALSE, 12, ctypes.c_void_p(0))
+        glBindBuffer(GL_ARRAY_BUFFER, self.sphere_instance_vbo)
+        glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_STREAM_DRAW)
+        glEnableVertexAttribArray(self.attribute_position)
+        glVertexAttribPointer(self.attribute_position, 4, GL_FLOAT, GL_FALSE, INSTANCE_STRIDE, ctypes.c_void_p(0))
+        glVertexAttribDivisor(self.attribute_position, 1)
+        glEnableVertexAttribArray(self.attribute_colour)
+        glVertexAttribPointer(self.attribute_colour, 4, GL_FLOAT, GL_FALSE, INSTANCE_STRIDE, ctypes.c_void_p(16))
+        glVertexAttribDivisor(self.attribute_colour, 1)
+        glDrawArraysInstanced(GL_TRIANGLES, 0, self.sphere_mesh_count, len(data))
+        glVertexAttribDivisor(self.attribute_position, 0)
+        glVertexAttribDivisor(self.attribute_colour, 0)
+        glDisableVertexAttribArray(self.attribute_vertex)
+        glDisableVertexAttribArray(self.attribute_position)
+        glDisableVertexAttribArray(self.attribute_colour)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glUseProgram(0)
+
+    def draw_quadric_spheres(self, data):
+        """
+        Draw sphere instances one at a time with GLU quadrics
+        """
+        sphere = gluNewQuadric()
+        gluQuadricNormals(sphere, GLU_SMOOTH)
+        for instance in data:
+            glPushMatrix()
+            glTranslate(instance[0], instance[1], instance[2])
+            glColor4f(instance[4], instance[5], instance[6], instance[7])
+            gluSphere(sphere, instance[3], self.sphere_slices, self.sphere_stacks)
+            glPopMatrix()
+        gluDeleteQuadric(sphere)
 
     def add_canvas(self,canvas1, fbo1):
         """
@@ -120,47 +389,17 @@ class PygameGraphicsHelper(GraphicsHelperBaseClass):
 
     def create_sphere(self,cache_pointer, pos, r, line_width, colour, transparent_colour, transparency, gears, phase):
         """
-        Create a sphere
-        """
-        # glPushMatrix()
-        # glTranslate(-1, (pos[0]*2 - 400) / 25 + 30, (pos[1]*2 - 400) / 256)
-        # glColor4f(colour[0]*255, colour[1]*255, colour[2]*255, 1)
-        # sphere = gluNewQuadric()
-        # gluSphere(sphere, r * 1  / 256, 32, 16)  # Draw sphere
-        # glPopMatrix()
-
-        glPushMatrix()
-        #glEnable(GL_TEXTURE_2D);
-
-        mult = 2
-        #glTranslate((pos[0]*2 - 400), (pos[1]*2 - 400),-1)
-        #glTranslate((pos[0]*2 - 400) / 256, (pos[0]*2 - 400) / 256 /500, (pos[1]*2 - 400) / 256)
-        glTranslate((pos[0] * 2) / 256, (pos[2] * 2 - 400) / 256, (pos[1] * 2 - 400) / 256)
-        glColor4f(colour[0]*255, colour[1]*255*pos[1], colour[2]*255, 0.01)
-
-        #glRotatef(self.yRotated+phase, self.yRotated, 1.0, 0.0);
-
-        sphere = gluNewQuadric()
-        sphere1 = gluNewQuadric()
-        #gluQuadricDrawStyle(sphere, GLU_FILL);
-        #gluQuadricTexture(sphere, GL_TRUE);
-        gluQuadricNormals(sphere, GLU_SMOOTH);
-        gluQuadricNormals(sphere1, GLU_FILL);
-
-        #glRotatef(self.yRotated, self.yRotated, 1.0, 0.0);
-        gluSphere(sphere, r * 2 / 256,31, 43)  # Draw sphere
-
-        glColor4f(colour[0] * 255, colour[1] * 255 * pos[1], colour[2] * 255, 0.5)
-        gluSphere(sphere1, r * 2 / 256+0.014, 30, 47)  # Draw sphere
-
-        gluDeleteQuadric(sphere);
-        gluDeleteQuadric(sphere1);
-        glDisable(GL_TEXTURE_2D);
-
-        #self.yRotated += np.random.randint(-100,100)/100000.0;
-
-        glPopMatrix()
-
+        Create a sphere. The sphere is added to the instance buffer as a faint
+        inner shell and a brighter outer shell, and drawn by flush.
+        """
+        x = (pos[0] * 2) / 256
+        y = (pos[2] * 2 - 400) / 256
+        z = (pos[1] * 2 - 400) / 256
+        red = min(max(colour[0] * 255, 0.0), 1.0)
+        green = min(max(colour[1] * 255 * pos[1], 0.0), 1.0)
+        blue = min(max(colour[2] * 255, 0.0), 1.0)
+        self.sphere_instances.append((x, y, z, r * 2 / 256, red, green, blue, 0.01))
+        self.sphere_instances.append((x, y, z, r * 2 / 256 + 0.014, red, green, blue, 0.5))
         return None
 
     def grab_circular_colour(self,image1, r):
@@ -201,36 +440,26 @@ class PygameGraphicsHelper(GraphicsHelperBaseClass):
 
     def plot_lines(self,line_points, colour, transparency, line_width, avg_height, screen=None, stipple=False, polygons=False):
         """
-        Plot a line
-        """
-        glColor4f(255.0,255.0, 255.0, 0.7)
-        glPointSize(5.0)
-        glLineWidth(line_width)
-
-        glPushMatrix()
-        #glTranslate((400), (400) / 25, (400) / 256)
-        #print(line_points)
-        lasty=0
-        lastx=0
-        lastz=0
-        for i in range (0,int(len(line_points)/2)):
-            x = line_points[i * 2]
-            y = line_points[i * 2 + 1]
-            #print(x,y)
-            if(lastx!=0 and lasty!=0):
-                glBegin(GL_LINES)  # GL_POINTS -> GL_LINES
-                glVertex3f((lastx * 2 ) / 256, (lastz * 2 - 400) / 256, (lasty * 2 - 400) / 256)
-                glVertex3f((x * 2) / 256, (avg_height * 2 - 400) / 256, (y * 2 - 400) / 256)
-                glEnd()
-            lastx = x
-            lasty = y
-            lastz=avg_height
-        glFlush()
-        glPopMatrix()
+        Plot a line. The segments are retained and drawn by flush.
+        """
+        points = np.asarray(line_points, dtype=np.float64)
+        points = points[:2*(len(points)//2)].reshape(-1, 2)
+        if (len(points) < 2):
+            return
+        #Segments are skipped where the previous point is at zero
+        valid = (points[:-1, 0] != 0) & (points[:-1, 1] != 0)
+        starts = gl_vertices(points[:-1][valid], avg_height)
+        ends = gl_vertices(points[1:][valid], avg_height)
+        vertices = np.empty((2*len(starts), 3), dtype=np.float64)
+        vertices[0::2] = starts
+        vertices[1::2] = ends
+        self.add_batch(GL_LINES, line_width, False, vertices, [1.0, 1.0, 1.0, 0.7])
 
     def plot_lines_3D(self, line_points, colour, transparency, line_width=1.0, screen=None, stipple=False, polygons=False,edge_sequence=[], plot_mode=0):
         """
-        Plot a line
+        Plot a line. The geometry is retained and drawn by flush.
+        Colours are clamped to the 0 to 1 range exactly as glColor4f did for
+        the original immediate mode drawing, including the fading edge colours.
         """
         #print("line_points:",line_points)
         if (plot_mode == 0):
@@ -238,109 +467,54 @@ class PygameGraphicsHelper(GraphicsHelperBaseClass):
         if (plot_mode == 1):
             edge_sequence = basic_vertices_to_edge_sequence(line_points)
 
-        #glPointSize(5.0)
-        glPushMatrix()
-
-        glLineWidth(line_width)
-
-        if(stipple==True):
-            glLineStipple(1, 0x3F07);
-            glEnable(GL_LINE_STIPPLE);
-
-        lasty=0
-        lastx=0
-        lastz=0
-        polygon_detected=False
-
-        if(polygons==True):
-            if(edge_sequence is not None and len(edge_sequence)>0):
-                glColor4f(255.0, 255.0, 255.0, 0.8)
+        points = gl_vertices(line_points[:3*(len(line_points)//3)])
+        vertices = len(points)
+        polygon_detected = False
+        if (polygons == True):
+            if (edge_sequence is not None and len(edge_sequence) > 0):
+                base_colour = [1.0, 1.0, 1.0, 0.8]
                 polygon_detected = True
             else:
-                glColor4f(255.0, 255.0, 255.0, 0.3)
-
-            #glEnable(GL_POLYGON_SMOOTH)
-            #glHint(GL_POLYGON_SMOOTH_HINT, GL_NICEST)
-
-            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
-            glBegin(GL_POLYGON)
-            #glBegin(GL_TRIANGLES)
+                base_colour = [1.0, 1.0, 1.0, 0.3]
         else:
-            glColor4f(255.0, 255.0, 255.0, 0.7)
-            glBegin(GL_LINES)  # GL_POINTS -> GL_LINES
-
-        col=0.9
-        col_index=0
-        transparent_factor=0.05
-        colour_factor=10
-
-        if (edge_sequence is None or len(edge_sequence)==0):
-            #print("Len edge:", len(edge_sequence))
-            for i in range (0,int(len(line_points)/3)):
-                col-=transparent_factor
-                col_index+=colour_factor
-                if (polygon_detected == True):
-                    glColor4f(255.0, 255.0, 255.0 - col_index, col)
-                x = line_points[i * 3]
-                y = line_points[i * 3 + 1]
-                z = line_points[i * 3 + 2]
-                if(i>0):
-                    #print(x,y,z)
-                    #glBegin(GL_LINES)  # GL_POINTS -> GL_LINES
-                    glVertex3f((lastx * 2 ) / 256, (lastz * 2 - 400) / 256, (lasty * 2 - 400) / 256)
-                    glVertex3f((x * 2) / 256, (z * 2 - 400) / 256, (y * 2 - 400) / 256)
-                    #glEnd()
-                lastx = x
-                lasty = y
-                lastz = z
+            base_colour = [1.0, 1.0, 1.0, 0.7]
+
+        transparent_factor = 0.05
+        colour_factor = 10
+
+        if (edge_sequence is None or len(edge_sequence) == 0):
+            if (vertices < 2):
+                return
+            line_vertices = np.empty((2*(vertices-1), 3), dtype=np.float64)
+            line_vertices[0::2] = points[:-1]
+            line_vertices[1::2] = points[1:]
+            colours = base_colour
         else:
-            vertices=int(len(line_points)/3)
-            #print("Edge sequence",edge_sequence)
-            for edge in edge_sequence:
-                col-=transparent_factor
-                col_index+=colour_factor
-                if(polygon_detected==True):
-                    glColor4f(255.0, 255.0, 255.0-col_index, col)
-                #print("Edge:",edge, " points:",line_points, " vertices:", vertices)
-                i_edge = (np.rint(edge)).astype(int)
-                if(i_edge.ndim>1):
-                    #print("i_edge",i_edge)
-                    for int_edge in i_edge:
-                        if(int_edge[0] >= vertices):
-                            int_edge[0]-= vertices
-                        if (int_edge[1] >= vertices):
-                            int_edge[1] -= vertices
-                        #print(len(line_points),vertices)
-                        if(vertices>3):
-                            x1 = line_points[int_edge[0] * 3]
-                            y1 = line_points[int_edge[0] * 3 + 1]
-                            z1 = line_points[int_edge[0] * 3 + 2]
-                            x2 = line_points[int_edge[1] * 3]
-                            y2 = line_points[int_edge[1] * 3 + 1]
-                            z2 = line_points[int_edge[1] * 3 + 2]
-                            #glBegin(GL_LINES)  # GL_POINTS -> GL_LINES
-                            glVertex3f((x1 * 2) / 256, (z1 * 2 - 400) / 256, (y1 * 2 - 400) / 256)
-                            glVertex3f((x2 * 2) / 256, (z2 * 2 - 400) / 256, (y2 * 2 - 400) / 256)
-                else:
-                    int_edge=i_edge
-                    if (int_edge[0] >= vertices):
-                        int_edge[0] -= vertices
-                    if (int_edge[1] >= vertices):
-                        int_edge[1] -= vertices
-                    if (vertices > 3):
-                        x1 = line_points[int_edge[0] * 3]
-                        y1 = line_points[int_edge[0] * 3 + 1]
-                        z1 = line_points[int_edge[0] * 3 + 2]
-                        x2 = line_points[int_edge[1] * 3]
-                        y2 = line_points[int_edge[1] * 3 + 1]
-                        z2 = line_points[int_edge[1] * 3 + 2]
-                        # glBegin(GL_LINES)  # GL_POINTS -> GL_LINES
-                        glVertex3f((x1 * 2) / 256, (z1 * 2 - 400) / 256, (y1 * 2 - 400) / 256)
-                        glVertex3f((x2 * 2) / 256, (z2 * 2 - 400) / 256, (y2 * 2 - 400) / 256)
-                #glEnd()
-        glEnd()
-        #glFlush()
-        glPopMatrix()
+            if (vertices <= 3):
+                return
+            [pairs, edge_ids] = edge_pairs(edge_sequence)
+            pairs = np.where(pairs >= vertices, pairs-vertices, pairs)
+            valid = np.all((pairs >= 0) & (pairs < vertices), axis=1)
+            pairs = pairs[valid]
+            edge_ids = edge_ids[valid]
+            line_vertices = points[pairs.reshape(-1)]
+            if (polygon_detected == True):
+                steps = np.repeat(edge_ids+1, 2)
+                colours = np.empty((len(steps), 4), dtype=np.float64)
+                colours[:, 0] = 1.0
+                colours[:, 1] = 1.0
+                colours[:, 2] = 255.0-steps*colour_factor
+                colours[:, 3] = 0.9-steps*transparent_factor
+                colours = np.clip(colours, 0.0, 1.0)
+            else:
+                colours = base_colour
+
+        if (polygons == True):
+            if (len(np.shape(colours)) == 1):
+                colours = np.tile(colours, (len(line_vertices), 1))
+            self.add_batch(GL_TRIANGLES, 0, False, fan_triangles(line_vertices), fan_triangles(colours))
+        else:
+            self.add_batch(GL_LINES, line_width, stipple, line_vertices, colours)
 
     def drawText(self, x, y, text, pts):
         """
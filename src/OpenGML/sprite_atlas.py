@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# Created By  : Martin Timms
+# Created Date: 18th October 2026
+# License: BSD-3-Clause License
+# Organisation: OpenGML.org/
+# Project: https://github.com/Electro-resonance/OpenGML
+# Description: Content addressed sprite cache packed into a shared texture
+# atlas. Sprites are keyed by their quantised drawing parameters so that
+# singularities which look the same share one rendered image. Space in the
+# atlas is allocated on shelves and the least recently used sprites are
+# evicted when the atlas is full or the memory budget is exceeded. Sprites
+# used in the current frame are never evicted, since sprites already placed
+# in that frame still point at their regions.
+# This module has no graphics dependencies, the graphics helpers upload the
+# pixels into the regions it allocates.
+# =============================================================================
+
+from collections import OrderedDict
+
+# Sprite radii are rounded to this many pixels before being used as a key
+RADIUS_QUANTUM = 0.5
+
+
+def quantise(value, quantum):
+    """
+    Round a value to the nearest multiple of quantum
+    """
+    return round(value/quantum)*quantum
+
+def sprite_key(kind, radius, colour, line_width=0, gears=False, spiral_rate=0, spiral_mode=0, extra_angle=0):
+    """
+    Build the cache key describing how a sprite looks
+    :param kind: Name of the sprite type, e.g. "circle" or "spiral"
+    :param radius: Radius in pixels, quantised to RADIUS_QUANTUM
+    :param colour: RGB(A) colour, rounded to whole values
+    :return: Hashable tuple
+    """
+    return (kind, quantise(radius, RADIUS_QUANTUM), tuple(int(round(c)) for c in colour),
+            line_width, bool(gears), round(spiral_rate, 3), spiral_mode, round(extra_angle, 1))
+
+def key_radius(key):
+    """
+    Return the quantised radius held in a sprite key
+    """
+    return key[1]
+
+
+class AtlasSprite(object):
+    """
+    A sprite held in the atlas. Like an Fbo it has a texture attribute
+    so it can be used anywhere a blit part is expected.
+    """
+
+    def __init__(self, texture, region):
+        self.texture = texture
+        self.region = region
+
+
+class SpriteAtlas(object):
+    """
+    Shelf packed texture atlas allocator with LRU eviction
+    """
+
+    def __init__(self, width=2048, height=2048, budget_bytes=None, bytes_per_pixel=4):
+        """
+        :param width: Atlas width in pixels
+        :param height: Atlas height in pixels
+        :param budget_bytes: Maximum bytes of live sprites, defaults to the atlas size
+        :param bytes_per_pixel: 4 for RGBA textures
+        """
+        self.width = width
+        self.height = height
+        self.bytes_per_pixel = bytes_per_pixel
+        if (budget_bytes is None):
+            budget_bytes = width*height*bytes_per_pixel
+        self.budget_bytes = budget_bytes
+        self.clear()
+
+    def clear(self):
+        """
+        Forget every sprite and free the whole atlas
+        """
+        # Each shelf is [y, height, x_end, live_count, free_slots]
+        self.shelves = []
+        # key -> [[x, y, w, h], shelf_index, value, frame last used]
+        self.entries = OrderedDict()
+        self.used_bytes = 0
+        self.evictions = 0
+        self.frame = 0
+
+    def begin_frame(self):
+        """
+        Start a new frame, letting the sprites used so far be evicted
+        """
+        self.frame += 1
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        """
+        Return the value stored for key (marking it as recently used) or None
+        """
+        entry = self.entries.get(key)
+        if (entry is None):
+            return None
+        self.entries.move_to_end(key)
+        entry[3] = self.frame
+        return entry[2]
+
+    def region(self, key):
+        """
+        Return the [x, y, w, h] region allocated to key or None
+        """
+        entry = self.entries.get(key)
+        if (entry is None):
+            return None
+        return entry[0]
+
+    def set_value(self, key, value):
+        """
+        Attach a value (normally the texture region) to an allocated key
+        """
+        self.entries[key][2] = value
+
+    def can_hold(self, width, height):
+        """
+        Return True if a width x height sprite fits in the empty atlas and
+        within the memory budget
+        """
+        return (width <= self.width and height <= self.height and
+                width*height*self.bytes_per_pixel <= self.budget_bytes)
+
+    def allocate(self, width, height):
+        """
+        Find space for a width x height sprite without evicting
+        :return: [[x, y, w, h], shelf_index] or None
+        """
+        if (width > self.width or height > self.height):
+            return None
+        # Reuse a freed slot on a shelf of a similar height
+        for index in range(len(self.shelves)):
+            shelf = self.shelves[index]
+            if (shelf[1] >= height and shelf[1] <= 2*height):
+                free_slots = shelf[4]
+                for slot_index in range(len(free_slots)):
+                    [x, slot_width] = free_slots[slot_index]
+                    if (slot_width >= width):
+                        if (slot_width > width):
+                            free_slots[slot_index] = [x+width, slot_width-width]
+                        else:
+                            free_slots.pop(slot_index)
+                        return [[x, shelf[0], width, height], index]
+        # Append to the end of a shelf of a similar height
+        for index in range(len(self.shelves)):
+            shelf = self.shelves[index]
+            if (shelf[1] >= height and shelf[1] <= 2*height and shelf[2]+width <= self.width):
+                x = shelf[2]
+                shelf[2] += width
+                return [[x, shelf[0], width, height], index]
+        # Open a new shelf
+        top = 0
+        if (len(self.shelves) > 0):
+            top = self.shelves[-1][0]+self.shelves[-1][1]
+        if (top+height <= self.height):
+            self.shelves.append([top, height, width, 0, []])
+            return [[0, top, width, height], len(self.shelves)-1]
+        return None
+
+    def put(self, key, width, height, value=None):
+        """
+        Allocate a region for key, evicting least recently used sprites
+        until it fits in the atlas and the memory budget
+        :return: The [x, y, w, h] region or None if the sprite does not fit
+        without evicting a sprite used in this frame
+        """
+        if (key in self.entries):
+            self.remove(key)
+        size = width*height*self.bytes_per_pixel
+        if (self.can_hold(width, height) == False):
+            return None
+        while (self.used_bytes+size > self.budget_bytes):
+            if (self.evict_lru() is None):
+                return None
+        allocation = self.allocate(width, height)
+        while (allocation is None):
+            if (self.evict_lru() is None):
+                return None
+            allocation = self.allocate(width, height)
+        [region, shelf_index] = allocation
+        self.shelves[shelf_index][3] += 1
+        self.entries[key] = [region, shelf_index, value, self.frame]
+        self.used_bytes += size
+        return region
+
+    def evict_lru(self):
+        """
+        Remove the least recently used sprite
+        :return: Its key, or None if every sprite was used in this frame
+        """
+        if (len(self.entries) == 0):
+            return None
+        key = next(iter(self.entries))
+        if (self.entries[key][3] == self.frame):
+            return None
+        self.remove(key)
+        self.evictions += 1
+        return key
+
+    def remove(self, key):
+        """
+        Free the region of a sprite
+        """
+        [region, shelf_index, value, frame] = self.entries.pop(key)
+        [x, y, width, height] = region
+        self.used_bytes -= width*height*self.bytes_per_pixel
+        shelf = self.shelves[shelf_index]
+        shelf[3] -= 1
+        if (shelf[3] == 0):
+            # An empty shelf gets its whole width back. It keeps its height,
+            # as the shelves above it are stacked on top, unless it is at
+            # the top when it is released for a shelf of any height.
+            shelf[2] = 0
+            shelf[4] = []
+            while (len(self.shelves) > 0 and self.shelves[-1][3] == 0):
+                self.shelves.pop()
+            return
+        # Merge the freed slot with free slots either side of it
+        free_slots = shelf[4]
+        for slot in list(free_slots):
+            if (slot[0]+slot[1] == x):
+                x = slot[0]
+                width += slot[1]
+                free_slots.remove(slot)
+            elif (x+width == slot[0]):
+                width += slot[1]
+                free_slots.remove(slot)
+        if (x+width == shelf[2]):
+            shelf[2] = x
+        else:
+            free_slots.append([x, width])
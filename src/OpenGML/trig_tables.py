@@ -6,9 +6,12 @@
 # Organisation: OpenGML.org/
 # Project: https://github.com/Electro-resonance/OpenGML
 # Description: Speed up of trigonometry using sine and cosine tables
+# The tables are numpy arrays so every function accepts either a scalar or
+# an ndarray of angles. An optional linear interpolation mode trades a little
+# speed for accuracy between the table entries.
 # =============================================================================
 
-#import numpy as np
+import numpy as np
 import math
 
 
@@ -16,6 +19,12 @@ sin_array=[]
 cos_array=[]
 atan_array=[]
 
+# Plain list copies of the tables used by the scalar code paths,
+# indexing a list is quicker than indexing an ndarray for single values
+sin_list=[]
+cos_list=[]
+atan_list=[]
+
 TRIG_TABLE_SIZE=16382
 DEGREES_INC=TRIG_TABLE_SIZE/360
 TWO_PI=2*math.pi
@@ -28,6 +37,9 @@ atan_max=100
 atan_range=atan_max-atan_min
 atan_delta=atan_range/TRIG_TABLE_SIZE
 
+# Default for the interpolate argument of the fast functions
+interpolate_tables=False
+
 def frange(start, stop=None, step=None):
     """
     Floating point range s an alternative to numpy np.arange function
@@ -50,70 +62,103 @@ def frange(start, stop=None, step=None):
 
 def create_tables():
     """
-    Populate the trignometric tables
+    Populate the trignometric tables.
+    Each table has one extra entry at the end of the range so that
+    a wrapped angle of exactly 360 degrees and interpolation of the
+    last interval stay inside the table.
+    """
+    global sin_array, cos_array, atan_array, sin_list, cos_list, atan_list
+    x = np.linspace(x_min, x_max, TRIG_TABLE_SIZE+1)
+    sin_array = np.sin(x)
+    cos_array = np.cos(x)
+    atan_array = np.arctan(np.linspace(atan_min, atan_max, TRIG_TABLE_SIZE+1))
+    sin_list = sin_array.tolist()
+    cos_list = cos_array.tolist()
+    atan_list = atan_array.tolist()
+
+def set_interpolation(enable=True):
+    """
+    Select linear interpolation between table entries as the default
+    """
+    global interpolate_tables
+    interpolate_tables = enable
+
+def is_array(x):
+    """
+    Return True if x should take the ndarray code path
+    """
+    return isinstance(x, (np.ndarray, list, tuple))
+
+def table_lookup(table_list, table_array, position, interpolate):
+    """
+    Read a table at a fractional position in the range 0 to TRIG_TABLE_SIZE
+    """
+    if (interpolate is None):
+        interpolate = interpolate_tables
+    if (is_array(position)):
+        index = position.astype(np.int64)
+        if (interpolate == False):
+            return table_array[index]
+        index = np.minimum(index, TRIG_TABLE_SIZE-1)
+        low = table_array[index]
+        return low+(table_array[index+1]-low)*(position-index)
+    index = int(position)
+    if (interpolate == False):
+        return table_list[index]
+    if (index > TRIG_TABLE_SIZE-1):
+        index = TRIG_TABLE_SIZE-1
+    low = table_list[index]
+    return low+(table_list[index+1]-low)*(position-index)
+
+def wrap_position(x, period):
+    """
+    Wrap an angle into one period (O(1) for any magnitude) and
+    convert it into a fractional table position
     """
-    for x in frange(x_min,x_max,x_delta):
-        sin_array.append(math.sin(x))
-        cos_array.append(math.cos(x))
-    for x in frange(atan_min,atan_max,atan_delta):
-        atan_array.append(math.atan(x))
+    if (is_array(x)):
+        x = np.asarray(x, dtype=np.float64)
+    return (x % period)*(TRIG_TABLE_SIZE/period)
 
-def fast_sin(x):
+def fast_sin(x, interpolate=None):
     """
     Return the fast sine wave using tables
     """
-    while(x<0):
-        x+=TWO_PI
-    while(x>=TWO_PI):
-        x-=TWO_PI
-    index=int((x/TWO_PI)*TRIG_TABLE_SIZE)
-    return sin_array[index]
+    return table_lookup(sin_list, sin_array, wrap_position(x, TWO_PI), interpolate)
 
-def fast_cos(x):
+def fast_cos(x, interpolate=None):
     """
     Return the fast cosine wave using tables
     """
-    while(x<0):
-        x+=TWO_PI
-    while(x>=TWO_PI):
-        x-=TWO_PI
-    index=int((x/TWO_PI)*TRIG_TABLE_SIZE)
-    return cos_array[index]
+    return table_lookup(cos_list, cos_array, wrap_position(x, TWO_PI), interpolate)
 
-def fast_atan(x):
+def fast_atan(x, interpolate=None):
     """
     Return the fast atan using tables
     """
+    if (is_array(x)):
+        position = np.clip((np.asarray(x, dtype=np.float64)-atan_min)/atan_range*TRIG_TABLE_SIZE,
+                           0, TRIG_TABLE_SIZE-1)
+        return table_lookup(atan_list, atan_array, position, interpolate)
     x=x-atan_min
     if(x<0):
         x=0
-    index=int(x/atan_range*TRIG_TABLE_SIZE)
-    if(index>TRIG_TABLE_SIZE-1):
-        index=TRIG_TABLE_SIZE-1
-    return atan_array[index]
+    position=x/atan_range*TRIG_TABLE_SIZE
+    if(position>TRIG_TABLE_SIZE-1):
+        position=TRIG_TABLE_SIZE-1
+    return table_lookup(atan_list, atan_array, position, interpolate)
 
 
-def fast_sin_deg(x):
+def fast_sin_deg(x, interpolate=None):
     """
     Return the fast sine wave (degrees) using tables
     """
-    while(x<0):
-        x+=360
-    while(x>=360):
-        x-=360
-    index=int(x*DEGREES_INC)
-    return sin_array[index]
+    return table_lookup(sin_list, sin_array, wrap_position(x, 360), interpolate)
 
-def fast_cos_deg(x):
+def fast_cos_deg(x, interpolate=None):
     """
     Return the fast cosine wave (degrees) using tables
     """
-    while(x<0):
-        x+=360
-    while(x>=360):
-        x-=360
-    index=int(x*DEGREES_INC)
-    return cos_array[index]
+    return table_lookup(cos_list, cos_array, wrap_position(x, 360), interpolate)
 
 def fast_sqrt(x):
     """
@@ -121,12 +166,20 @@ def fast_sqrt(x):
     """
     pass
 
-def fast_atan2(y,x):
+def fast_atan2(y,x, interpolate=None):
     """
     Return the fast atan2 using tables
     """
     #return np.arctan2(y,x)
     #return math.atan2(y,x)
+    if (is_array(y) or is_array(x)):
+        y = np.asarray(y, dtype=np.float64)
+        x = np.asarray(x, dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            angle = fast_atan(np.where(x != 0, y/x, 0.0), interpolate)
+        angle = np.where(x < 0, angle+math.pi, angle)
+        axis = np.where(y > 0, math.pi/2, np.where(y < 0, -math.pi/2, 0.0))
+        return np.where(x == 0, axis, angle)
     if(x==0):
         if(y==0):
             return 0
@@ -135,8 +188,11 @@ def fast_atan2(y,x):
         else:
             return -math.pi/2
     elif (x>0):
-        return fast_atan(y/x)
+        return fast_atan(y/x, interpolate)
     elif (y>=0):
-        return fast_atan(y/x)+math.pi
+        return fast_atan(y/x, interpolate)+math.pi
     else:
-        return fast_atan(y/x)+math.pi
+        return fast_atan(y/x, interpolate)+math.pi
+
+# Build the tables on import so the fast functions are always usable
+create_tables()